@@ -0,0 +1,193 @@
+# Offline benchmarks for the expensive stages of mappificator, run against synthetic inputs
+# Results are saved as JSON, so runs can be compared between commits
+
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from typing import Dict, Callable, Any, Tuple
+
+import mappificator
+from parsing import tiny_parser
+from providers import parchmentmc
+from util import json_backend, mapping_downloader
+from util.hierarchy import ClassHierarchy
+from util.mappings import Mappings
+from util.synthetic import SyntheticMappings
+
+BENCHMARK_CACHE = 'benchmarks'
+
+Setup = Callable[[SyntheticMappings], Callable[[], Any]]  # Given inputs, returns a function to be timed
+
+
+def main():
+    parser = ArgumentParser(description='Benchmarks mappificator against synthetic, generated mappings.')
+    parser.add_argument('--scale', type=float, nargs='*', default=(1.0,), help='Scales of the generated inputs, relative to the number of classes in Minecraft.')
+    parser.add_argument('--repeat', type=int, default=3, help='The number of times each benchmark is run. The fastest time is reported.')
+    parser.add_argument('--seed', type=int, default=0, help='The seed used to generate inputs.')
+    parser.add_argument('--cases', type=str, nargs='*', default=None, choices=tuple(CASES.keys()), help='The benchmarks to run. Defaults to all.')
+    parser.add_argument('--output', type=str, default=None, help='The path to save results to. Defaults to a file in the build directory, named by the current commit.')
+    parser.add_argument('--json-backend', type=str, default='auto', choices=('auto',) + json_backend.BACKENDS, help='The library used by the decode cases. Run once with each to compare them.')
+    parser.add_argument('--compare', type=str, default=None, help='A previously saved result to compare against.')
+
+    args = parser.parse_args()
+    cases = args.cases if args.cases else list(CASES.keys())
+    commit = git_commit()
+    backend = json_backend.select(args.json_backend)
+    print('Using %s' % backend)
+
+    results: Dict[str, Dict[str, float]] = {}
+    for scale in args.scale:
+        print('Generating inputs at scale %s' % scale)
+        inputs = SyntheticMappings(scale, args.seed)
+        for case in cases:
+            best = run_case(CASES[case], inputs, args.repeat)
+            results.setdefault(case, {})[str(scale)] = best
+            print('  %-20s %8.3f s' % (case, best))
+
+    output = args.output
+    if output is None:
+        output = os.path.join(mapping_downloader.cache_path(), BENCHMARK_CACHE, 'benchmark-%s.json' % (commit or 'unknown')[:10])
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': commit,
+            'python': platform.python_version(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seed': args.seed,
+            'json_backend': backend.name,
+            'repeat': args.repeat,
+            'results': results
+        }, f, indent=2)
+    print('Saved results to %s' % output)
+
+    if args.compare is not None:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print_comparison(previous, results)
+
+
+def run_case(setup: Setup, inputs: SyntheticMappings, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        action = setup(inputs)  # Setup is not timed, and is re-run, as some stages modify their inputs
+        start = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def print_comparison(previous: Dict[str, Any], results: Dict[str, Dict[str, float]]):
+    print('Comparison against %s' % (previous['commit'] or 'unknown')[:10])
+    print('  %-20s %-6s %10s %10s %8s' % ('case', 'scale', 'before', 'after', 'change'))
+    for case, scales in results.items():
+        for scale, after in scales.items():
+            before = previous['results'].get(case, {}).get(scale)
+            if before is not None:
+                print('  %-20s %-6s %10.3f %10.3f %+7.1f%%' % (case, scale, before, after, 100 * (after - before) / before))
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+# Benchmark Cases
+
+def load_blackstone(inputs: SyntheticMappings) -> Tuple[Mappings, ClassHierarchy]:
+    obf_to_moj, hierarchy = Mappings(), ClassHierarchy()
+    parchmentmc.parse_blackstone(inputs.blackstone(), obf_to_moj, hierarchy)
+    return obf_to_moj, hierarchy
+
+
+def load_parchment(inputs: SyntheticMappings) -> Mappings:
+    parchment = Mappings()
+    parchmentmc.parse_parchment(inputs.parchment(), parchment)
+    return parchment
+
+
+def case_parse_tiny_v1(inputs: SyntheticMappings):
+    text = inputs.intermediary()
+    return lambda: tiny_parser.parse_tiny(text)
+
+
+def case_parse_tiny_v2(inputs: SyntheticMappings):
+    text = inputs.yarn()
+    return lambda: tiny_parser.parse_tiny(text)
+
+
+def case_decode_blackstone(inputs: SyntheticMappings):
+    text = json.dumps(inputs.blackstone())
+    return lambda: json_backend.loads(text)
+
+
+def case_decode_parchment(inputs: SyntheticMappings):
+    text = json.dumps(inputs.parchment())
+    return lambda: json_backend.loads(text)
+
+
+def case_parse_blackstone(inputs: SyntheticMappings):
+    blackstone = inputs.blackstone()
+    return lambda: parchmentmc.parse_blackstone(blackstone, Mappings(), ClassHierarchy())
+
+
+def case_parse_parchment(inputs: SyntheticMappings):
+    parchment = inputs.parchment()
+    return lambda: parchmentmc.parse_parchment(parchment, Mappings())
+
+
+def case_remap(inputs: SyntheticMappings):
+    obf_to_moj, _ = load_blackstone(inputs)
+    return lambda: obf_to_moj.remap()
+
+
+def case_compose(inputs: SyntheticMappings):
+    obf_to_moj, hierarchy = load_blackstone(inputs)
+    intermediary = tiny_parser.parse_tiny(inputs.intermediary())
+    yarn = tiny_parser.parse_tiny(inputs.yarn())
+    return lambda: mappificator.remap_yarn_onto_mojmap(obf_to_moj, hierarchy, intermediary, yarn)
+
+
+def case_add_merged_params(inputs: SyntheticMappings):
+    obf_to_moj, _ = load_blackstone(inputs)
+    merged = obf_to_moj.remap()
+    parchment = load_parchment(inputs)
+    crane = tiny_parser.parse_tiny(inputs.crane())
+    return lambda: mappificator.add_merged_params(merged, parchment, crane)
+
+
+def case_write_parchment(inputs: SyntheticMappings):
+    obf_to_moj, _ = load_blackstone(inputs)
+    merged = obf_to_moj.remap()
+    mappificator.create_merged_mappings(merged, load_parchment(inputs))
+
+    def action():
+        with tempfile.TemporaryDirectory() as temp, mapping_downloader.using(mapping_downloader.Settings(temp)):
+            parchmentmc.write_parchment(merged, 'synthetic', 'benchmark', True)
+
+    return action
+
+
+CASES: Dict[str, Setup] = {
+    'parse_tiny_v1': case_parse_tiny_v1,
+    'parse_tiny_v2': case_parse_tiny_v2,
+    'decode_blackstone': case_decode_blackstone,
+    'decode_parchment': case_decode_parchment,
+    'parse_blackstone': case_parse_blackstone,
+    'parse_parchment': case_parse_parchment,
+    'remap': case_remap,
+    'compose': case_compose,
+    'add_merged_params': case_add_merged_params,
+    'write_parchment': case_write_parchment,
+}
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# Exporters for formats other than parchment: tiny v2 (Fabric), TSRG2 (Forge) and ProGuard (Mojang)
+# Each joins the obfuscated names of the obf -> moj mappings with the moj names, parameters and docs of the merged mappings, so a single merge can produce any number of formats.
+
+import os
+
+from typing import Callable, Dict, Iterator, Optional, TextIO, Tuple
+
+from util import mapping_downloader, utils
+from util.docs import Docs
+from util.mappings import Mappings
+
+Exporter = Callable[[Mappings, Mappings, TextIO], None]  # (obf -> moj, merged (moj), output)
+
+
+class JoinedClass:
+    """ An obfuscated class, and the matching class of the merged mappings, if there is one """
+
+    obf: Mappings.Class
+    named: Optional[Mappings.Class]
+    class_mappings: Dict[str, str]
+
+    def __init__(self, obf: Mappings.Class, named: Optional[Mappings.Class], class_mappings: Dict[str, str]):
+        self.obf = obf
+        self.named = named
+        self.class_mappings = class_mappings
+
+    def fields(self) -> Iterator[Tuple[Mappings.Field, Optional[Mappings.Field]]]:
+        for _, field in sorted(self.obf.fields.items()):
+            if field.mapped:
+                named = None if self.named is None else self.named.fields.get((field.mapped, utils.remap_descriptor(field.desc, self.class_mappings)))
+                yield field, named
+
+    def methods(self) -> Iterator[Tuple[Mappings.Method, Optional[Mappings.Method]]]:
+        for _, method in sorted(self.obf.methods.items()):
+            if method.mapped:
+                named = None if self.named is None else self.named.methods.get((method.mapped, utils.remap_method_descriptor(method.desc, self.class_mappings)))
+                yield method, named
+
+
+def join(obf_to_moj: Mappings, named: Mappings) -> Iterator[JoinedClass]:
+    """ Iterates all mapped classes of the obf -> moj mappings which are present in the merged mappings (i.e. all of them, unless the build is scoped), sorted by obfuscated name """
+    class_mappings = obf_to_moj.class_mappings()
+    for _, clazz in sorted(obf_to_moj.classes.items()):
+        if clazz.mapped and clazz.mapped in named.classes:
+            yield JoinedClass(clazz, named.classes[clazz.mapped], class_mappings)
+
+
+def write_tiny_v2(obf_to_moj: Mappings, named: Mappings, f: TextIO):
+    """ Tiny v2, with namespaces 'official' and 'named', including parameters and docs """
+    f.write('tiny\t2\t0\tofficial\tnamed\n')
+    for joined in join(obf_to_moj, named):
+        f.write('c\t%s\t%s\n' % (joined.obf.name, joined.obf.mapped))
+        if joined.named is not None:
+            write_tiny_v2_comment(f, '\t', joined.named.docs)
+        for field, named_field in joined.fields():
+            f.write('\tf\t%s\t%s\t%s\n' % (field.desc, field.name, field.mapped))
+            if named_field is not None:
+                write_tiny_v2_comment(f, '\t\t', named_field.docs)
+        for method, named_method in joined.methods():
+            f.write('\tm\t%s\t%s\t%s\n' % (method.desc, method.name, method.mapped))
+            if named_method is not None:
+                write_tiny_v2_comment(f, '\t\t', named_method.docs)
+                for _, param in sorted(named_method.parameters.items()):
+                    if param.mapped:
+                        f.write('\t\tp\t%d\t\t%s\n' % (param.index, param.mapped))
+                        write_tiny_v2_comment(f, '\t\t\t', param.docs)
+
+
+def write_tiny_v2_comment(f: TextIO, indent: str, docs: Docs):
+    if any(docs):
+        f.write('%sc\t%s\n' % (indent, escape_tiny_v2('\n'.join(docs))))
+
+
+def escape_tiny_v2(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t').replace('\0', '\\0')
+
+
+def write_tsrg2(obf_to_moj: Mappings, named: Mappings, f: TextIO):
+    """ TSRG2, with namespaces 'obf' and 'moj', including parameters (without obfuscated names), and static markers where they are known (for methods with parameters read from a descriptor) """
+    f.write('tsrg2 obf moj\n')
+    for joined in join(obf_to_moj, named):
+        f.write('%s %s\n' % (joined.obf.name, joined.obf.mapped))
+        for field, _ in joined.fields():
+            f.write('\t%s %s\n' % (field.name, field.mapped))
+        for method, named_method in joined.methods():
+            f.write('\t%s %s %s\n' % (method.name, method.desc, method.mapped))
+            if method.is_static:
+                f.write('\t\tstatic\n')
+            if named_method is not None:
+                for _, param in sorted(named_method.parameters.items()):
+                    if param.mapped:
+                        f.write('\t\t%d o %s\n' % (param.index, param.mapped))
+
+
+def write_proguard(obf_to_moj: Mappings, named: Mappings, f: TextIO):
+    """ ProGuard, in the same direction as the official mappings (moj -> obf), without line numbers """
+    class_mappings = obf_to_moj.class_mappings()
+    for joined in join(obf_to_moj, named):
+        f.write('%s -> %s:\n' % (joined.obf.mapped.replace('/', '.'), joined.obf.name.replace('/', '.')))
+        for field, _ in joined.fields():
+            f.write('    %s %s -> %s\n' % (java_type(field.desc, class_mappings), field.mapped, field.name))
+        for method, _ in joined.methods():
+            return_type, param_types = utils.split_method_descriptor(method.desc)
+            f.write('    %s %s(%s) -> %s\n' % (java_type(return_type, class_mappings), method.mapped, ','.join(java_type(p, class_mappings) for p in param_types), method.name))
+
+
+def java_type(desc: str, class_mappings: Dict[str, str]) -> str:
+    name, arrays = utils.convert_descriptor_to_type(utils.remap_descriptor(desc, class_mappings))
+    return name.replace('/', '.') + '[]' * arrays
+
+
+FORMATS: Dict[str, Tuple[str, Exporter]] = {
+    'tiny': ('tiny', write_tiny_v2),
+    'tsrg': ('tsrg', write_tsrg2),
+    'proguard': ('txt', write_proguard)
+}
+
+
+def export_path(name: str, mc_version: str, version: str) -> str:
+    return os.path.join(mapping_downloader.cache_path(), '%s-%s-%s.%s' % (name, mc_version, version, FORMATS[name][0]))
+
+
+def export(name: str, obf_to_moj: Mappings, named: Mappings, mc_version: str, version: str) -> str:
+    """ Writes an export in the given format to the cache, and returns the path to it """
+    _, exporter = FORMATS[name]
+    file_path = export_path(name, mc_version, version)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8', newline='\n') as f:
+        exporter(obf_to_moj, named, f)
+    return file_path
@@ -1,15 +1,29 @@
 # This is why we can't have nice things
 
+import json
+import os
 import re
+import sys
+import time
 
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
 from collections import defaultdict
-from typing import Dict, Tuple, List, Set, Any
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Tuple, List, Set, Any, Optional, Callable, Sequence, Iterator
 
+from exporting import exporters
 from providers import fabricmc, parchmentmc, architectury
-from providers.parchmentmc import MethodInheritanceTree
-from util import utils
+from util import build_cache, bundle, daemon, diff, json_backend, mapping_downloader, memory, remote_cache, search, shards, utils
+from util.build_cache import BuildCache, ParsedCache
+from util.docs import DocsStore
+from util.hierarchy import ClassHierarchy
+from util.pipeline import Pipeline, THREAD, PROCESS
+from util.profiler import Profiler
+from util.provider_cache import ProviderCache
+from util.remote_cache import RemoteCache
 from util.mappings import Mappings, Mappable
+from util.scope import Scope, create_scope
 
 LAMBDA_PATTERN: re.Pattern = re.compile(r'^lambda$(\w+)$\d+$')
 
@@ -17,14 +31,48 @@ LAMBDA_PATTERN: re.Pattern = re.compile(r'^lambda$(\w+)$\d+$')
 def main():
     """ Entry point """
 
+    parser = create_argument_parser()
+    args = parser.parse_args()
+
+    if args.daemon:
+        run_daemon(args)
+    elif args.client or args.stop_daemon:
+        run_client(args)
+    elif args.batch is not None:
+        run_batch(args)
+    elif args.build_cache is not None:
+        run_build_cache_command(args)
+    elif args.export_bundle is not None or args.import_bundle is not None:
+        run_bundle_command(args)
+    elif args.remote_cache_server is not None:
+        remote_cache.serve(args.remote_cache_server, args.remote_cache_host, args.remote_cache_port)
+    elif args.search is not None:
+        run_search(args)
+    elif args.diff is not None:
+        run_diff(args)
+    else:
+        build(args)
+
+
+def create_argument_parser() -> ArgumentParser:
     parser = ArgumentParser(description='A collection of bodging scripts to work with Minecraft mappings and alleviate suffering.')
 
     parser.add_argument('-v', '--version', type=str, default=None, help='Sets the version of the exported mappings.')
     parser.add_argument('-p', '--publish', action='store_true', dest='publish', default=False, help='Publish the export to the user\'s maven local')
+    parser.add_argument('--force', action='store_true', default=False, help='Always rebuild, rewrite and publish the export, even if it is cached, or identical to the existing one.')
+    parser.add_argument('--no-build-cache', action='store_true', default=False, help='Disables the build cache. By default, a build with the same inputs (by content), options and version of mappificator as a previous build restores its outputs from the cache, instead of building them again.')
+    parser.add_argument('--build-cache', type=str, default=None, choices=('list', 'clean', 'prune'), help='Lists the entries in the build cache, removes all of them (clean), or removes those built by a different version of mappificator (prune).')
 
     # Options
     parser.add_argument('--providers', nargs='*', choices=('parchment', 'crane', 'yarn'), default=('parchment',), help='Providers to source mappings from.')
     parser.add_argument('--yarn-mapping-comments', action='store_true', default=False, dest='yarn_mapping_comments', help='Enables adding javadoc comments to classes, fields, and methods with their corresponding yarn name, if present.')
+    parser.add_argument('--formats', nargs='*', choices=tuple(exporters.FORMATS.keys()), default=(), help='Additional formats to export the merged mappings to, alongside parchment. These are written concurrently, from the same merged mappings.')
+    parser.add_argument('--shard-budget', type=int, default=None, metavar='MB', help='Merges and exports the mappings in shards of root classes, each estimated to use at most this much memory (in MB), instead of all at once. This reduces the peak memory of a build, at the cost of some speed.')
+    parser.add_argument('--json-backend', type=str, default='auto', choices=('auto',) + json_backend.BACKENDS, help='The library used to read JSON inputs. By default, the fastest one installed is used.')
+    parser.add_argument('--only-packages', type=str, nargs='+', default=None, metavar='PACKAGE', help='Only includes classes in these packages (or their subpackages), i.e. \'net.minecraft.world.item\'. Other classes are skipped while loading each provider, so the build is much faster. The export version is suffixed with \'-scoped\'.')
+    parser.add_argument('--only-classes', type=str, nargs='+', default=None, metavar='CLASS', help='Only includes these classes (and their inner classes), i.e. \'net.minecraft.world.item.ItemStack\'. May be combined with --only-packages.')
+    parser.add_argument('--docs-on-disk', action='store_true', default=False, help='Keeps the text of docs from each provider in a temporary file (in the build directory), rather than in memory, and only reads it back when exporting. This reduces the memory of a build, at the cost of some speed.')
+    parser.add_argument('--parallel', action='store_true', default=False, help='Runs independent stages of a build concurrently: downloads on threads, and parsing on worker processes.')
 
     # Individual versions
     parser.add_argument('--mc-version', type=str, default='1.20.1', help='The Minecraft version')
@@ -33,74 +81,540 @@ def main():
     parser.add_argument('--yarn-version', type=str, default='30', help='The fabric yarn mappings version')
     parser.add_argument('--crane-version', type=str, default='15', help='The architectury crane mappings version')
 
-    args = parser.parse_args()
-    version = args.version
-    if version is None:
-        version = 'mappificator'
-        if 'parchment' in args.providers:
-            version += '-p%s' % args.parchment_version.split('-')[0]
-        if 'crane' in args.providers:
-            version += '-c%s' % args.crane_version
-        if 'yarn' in args.providers:
-            version += '-y%s' % args.yarn_version
-
-    parchment_version = args.parchment_version
-    parchment_mc_version = args.mc_version
-    if '-' in parchment_version:
-        parchment_version, parchment_mc_version = parchment_version.split('-')
-
-    sources = []
+    # Offline builds
+    parser.add_argument('--offline', action='store_true', default=False, help='Never download anything. Any input which is not already cached is an error.')
+    parser.add_argument('--export-bundle', type=str, default=None, metavar='BUNDLE', help='Writes cached inputs to a single compressed and checksummed bundle (.tar.xz), which can be imported on another machine.')
+    parser.add_argument('--bundle-include', type=str, nargs='*', default=None, metavar='PATTERN', help='Patterns of files in the cache to include in an exported bundle, i.e. \'blackstone-1.20.1.json\' \'parchment-1.20.1-*\'. By default, all cached inputs are included.')
+    parser.add_argument('--import-bundle', type=str, default=None, metavar='BUNDLE', help='Imports all files from a bundle into the cache, after verifying their checksums.')
+
+    # Remote cache
+    parser.add_argument('--remote-cache', type=str, default=None, metavar='URL', help='A remote cache shared between machines (i.e. CI nodes), such as one run by --remote-cache-server. Inputs, parsed providers and build outputs which are not cached locally are fetched from it, before downloading or building them, and those which are downloaded or built are uploaded to it.')
+    parser.add_argument('--remote-cache-read-only', action='store_true', default=False, help='Only fetches from the remote cache, and never uploads to it.')
+    parser.add_argument('--remote-cache-server', type=str, default=None, metavar='DIR', help='Runs a remote cache server, storing files in the given directory, instead of building.')
+    parser.add_argument('--remote-cache-host', type=str, default=remote_cache.DEFAULT_HOST, help='The address the remote cache server listens on. By default, it is only reachable from this machine.')
+    parser.add_argument('--remote-cache-port', type=int, default=remote_cache.DEFAULT_PORT, help='The port the remote cache server listens on.')
+
+    # Profiling
+    parser.add_argument('--profile', type=str, default=None, metavar='REPORT', help='Records the wall time, cpu time, peak memory and mapping counts of each stage, and writes them as a JSON report to the given path. Note this makes the run slower.')
+    parser.add_argument('--memory-report', action='store_true', default=False, help='Prints the approximate memory used by each provider (by table, strings and docs) after it is loaded.')
+    parser.add_argument('--profile-stats', type=str, default=None, metavar='DIR', help='Dumps cProfile stats (.pstats) for each stage to the given directory. Implies profiling.')
+
+    # Search
+    parser.add_argument('--search', type=str, default=None, metavar='QUERY', help='Searches the names of all classes, fields, methods and parameters in the providers (and in every namespace, i.e. obfuscated, mojmap, intermediary and yarn), by prefix, substring, then approximately, instead of building.')
+    parser.add_argument('--search-limit', type=int, default=20, help='The maximum number of search results.')
+
+    # Diff
+    parser.add_argument('--diff', type=str, nargs=2, default=None, metavar=('OLD', 'NEW'), help='Compares two mappings, instead of building, and lists the entries which were added, removed, renamed, or had their docs changed. Each is a parchment JSON file (i.e. an export, or a parchment release), a zip of one, or a tiny v2 file.')
+    parser.add_argument('--diff-format', type=str, default='text', choices=('text', 'json'), help='The format of a diff.')
+    parser.add_argument('--diff-output', type=str, default=None, metavar='PATH', help='Writes a diff to a file, instead of printing it.')
+
+    # Batch builds
+    parser.add_argument('--batch', type=str, default=None, metavar='MATRIX', help='Runs a batch of builds, from a JSON file containing a list of objects. Each object overrides any of the above options (by name, i.e. {"mc_version": "1.20.1", "providers": ["parchment", "yarn"]}), and the command line options are used as defaults.')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='The number of worker processes used for a batch build. Builds for the same Minecraft version run in the same worker, so they can share loaded providers.')
+
+    # Daemon
+    parser.add_argument('--daemon', action='store_true', default=False, help='Runs a build server, which keeps loaded providers in memory between builds. Builds are sent to it with --client.')
+    parser.add_argument('--client', action='store_true', default=False, help='Sends this build (with all other options) to a running build server, instead of running it in this process. Paths are relative to the working directory of the server.')
+    parser.add_argument('--stop-daemon', action='store_true', default=False, help='Stops a running build server.')
+    parser.add_argument('--daemon-port', type=int, default=daemon.DEFAULT_PORT, help='The localhost port the build server listens on, or 0 for any free port. Clients connect to the port recorded in the token file.')
+    parser.add_argument('--daemon-token-file', type=str, default=None, metavar='PATH', help='The file the build server writes its port and access token to, which only the current user can read. Clients must read the same file. By default, ~/.mappificator/daemon-<port>.json.')
+    parser.add_argument('--daemon-cache-size', type=int, default=8, help='The maximum number of loaded providers the build server keeps in memory. The least recently used are evicted first.')
+
+    return parser
+
+
+def build(args: Namespace, providers: Optional[ProviderCache] = None, log: Callable[[str], None] = print, keep_merged: bool = False, cache_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Runs a single build, from the (parsed) command line arguments.
+    Loaded providers are shared via the provider cache, if present. These are never modified by the build, so they can be reused by other builds.
+    If keep_merged is true, the merged mappings are included in the summary (as 'merged'). This means the build cannot be restored from the build cache, and is not available for sharded builds.
+    Returns a summary of the build.
+    Inputs and outputs are in the cache path, if given, otherwise the default of the current context (see mapping_downloader.Settings). The build binds its own settings, so several builds may run at once, on different threads.
+    """
+    remote = RemoteCache(args.remote_cache, args.remote_cache_read_only, log=log) if args.remote_cache is not None else None
+    with mapping_downloader.using(mapping_downloader.Settings(cache_path if cache_path is not None else mapping_downloader.cache_path(), args.offline, remote, args.json_backend)):
+        return build_with_settings(args, providers, log, keep_merged)
+
+
+def build_with_settings(args: Namespace, providers: Optional[ProviderCache], log: Callable[[str], None], keep_merged: bool) -> Dict[str, Any]:
+    if keep_merged and args.shard_budget is not None:
+        raise ValueError('Merged mappings cannot be kept by a sharded build')
+
+    share_providers = providers is not None
+    if providers is None:
+        providers = ProviderCache()
+
+    start = time.perf_counter()
+    version = export_version(args)
+    backend = json_backend.current()
+    remote = mapping_downloader.current_settings().remote_cache
+
+    parchment_mc_version, parchment_version = split_parchment_version(args)
+
+    profiler = Profiler(args.profile is not None, args.profile_stats, log)
+    scope = create_scope(args.only_packages, args.only_classes)
+    if scope is not None:
+        log('Building %s' % scope)
+
+    # Parsed providers are only cached with a remote cache, as locally, they are usually kept in memory instead (by the provider cache)
+    parsed_cache = ParsedCache(remote=remote) if remote is not None and scope is None else None
+
+    pipeline = Pipeline()
+    initial: Dict[str, Any] = {}
+    loaded: Dict[Tuple, Tuple[str, ...]] = {}  # Providers which are loaded by this build, and the values they are loaded into
+    inputs: Dict[str, mapping_downloader.Source] = {}  # The input file of each provider
+
+    docs_store: Optional[DocsStore] = None
+    if args.docs_on_disk:
+        os.makedirs(mapping_downloader.cache_path(), exist_ok=True)
+        docs_store = DocsStore(mapping_downloader.cache_path())
+
+    def add_provider(key: Tuple, values: Tuple[str, ...], source: mapping_downloader.Source, read: Callable[..., Any], read_inputs: Tuple[str, ...] = (), has_docs: bool = False) -> bool:
+        """
+        Adds the stages to download and load a provider, unless it is cached, and returns if it is loaded by this build. If scoped, the read function is given the build scope, or its own scope (from the read inputs) if it has any.
+        If the provider has docs, and they are kept on disk, they are moved to the docs store once loaded (on the main process, as it owns the store).
+        """
+        inputs[key[0]] = source
+        if scope is not None:
+            key += (scope.key(),)  # Scoped providers are only shared with builds of the same scope
+            read = partial(read, scope=scope) if not read_inputs else read
+        if key in providers:
+            cached = providers.get(key, read)
+            initial.update(zip(values, cached if len(values) > 1 else (cached,)))
+            return False
+        else:
+            name = key[0]
+            if parsed_cache is not None:
+                read = partial(parsed_cache.read, name, source, read)
+            read = mapping_downloader.bind(read)  # Worker processes may not share the settings of this process
+            # Files which are not cached are parsed as they are downloaded (see mapping_downloader.stream())
+            stage = ('Loading %s' if mapping_downloader.is_cached(source[0]) else 'Downloading and loading %s') % name
+            if docs_store is not None and has_docs:
+                pipeline.add(stage, read, inputs=read_inputs, outputs=tuple(value + '_in_memory' for value in values), kind=PROCESS)
+                pipeline.add('Storing docs of %s' % name, partial(store_docs, docs_store), inputs=tuple(value + '_in_memory' for value in values), outputs=values)
+            else:
+                pipeline.add(stage, read, inputs=read_inputs, outputs=values, kind=PROCESS)
+            loaded[key] = values
+            if args.memory_report:
+                pipeline.add('Measuring memory of %s' % name, partial(log_memory_report, values, log), inputs=values)
+            return True
 
-    print('Loading blackstone')
-    obf_to_moj, method_inheritance = parchmentmc.read_blackstone(args.mc_version)
+    sources: List[str] = []
+    add_provider(('blackstone', args.mc_version), ('obf_to_moj', 'hierarchy'), mapping_downloader.blackstone_source(args.mc_version), partial(parchmentmc.read_blackstone, args.mc_version))
 
     if 'parchment' in args.providers:
-        print('Loading parchment')
-        parchment = parchmentmc.read_parchment(parchment_mc_version, parchment_version)
-        sources.append(parchment)
+        add_provider(('parchment', parchment_mc_version, parchment_version), ('parchment',), mapping_downloader.parchment_source(parchment_mc_version, parchment_version), partial(parchmentmc.read_parchment, parchment_mc_version, parchment_version), has_docs=True)
+        sources.append('parchment')
 
     if 'crane' in args.providers:
-        print('Loading crane')
-        crane = architectury.read_crane(args.mc_version, args.crane_version)
-        sources.append(crane)
+        add_provider(('crane', args.mc_version, args.crane_version), ('crane',), mapping_downloader.crane_source(args.mc_version, args.crane_version), partial(architectury.read_crane, args.mc_version, args.crane_version), has_docs=True)
+        sources.append('crane')
 
     if 'yarn' in args.providers or args.yarn_mapping_comments:
-        print('Loading intermediary and yarn')
-        intermediary = fabricmc.read_intermediary(args.mc_version)
-        yarn = fabricmc.read_yarn(args.mc_version, args.yarn_version)
-        moj_to_yarn = remap_yarn_onto_mojmap(obf_to_moj, method_inheritance, intermediary, yarn)
-        if args.yarn_mapping_comments:
-            append_mapping_javadoc(moj_to_yarn, 'Yarn: ')
+        # Intermediary is modified when remapping yarn, but only by adding entries derived from the blackstone of the same version, so it is safe to share
+        # Intermediary and yarn are not named by mojmap, so when scoped, they are scoped by the obfuscated and then intermediary names of the classes selected from blackstone
+        loaded_intermediary = add_provider(('intermediary', args.mc_version), ('intermediary',), mapping_downloader.fabric_intermediary_source(args.mc_version), partial(fabricmc.read_intermediary, args.mc_version), ('intermediary_scope',) if scope else ())
+        loaded_yarn = add_provider(('yarn', args.mc_version, args.yarn_version), ('yarn',), mapping_downloader.yarn_source(args.mc_version, args.yarn_version), partial(fabricmc.read_yarn, args.mc_version, args.yarn_version), ('yarn_scope',) if scope else (), has_docs=True)
+        if scope is not None and (loaded_intermediary or loaded_yarn):
+            pipeline.add('Scoping intermediary', partial(create_intermediary_scope, scope), ('obf_to_moj', 'hierarchy'), ('intermediary_scope',))
+            if loaded_yarn:
+                pipeline.add('Scoping yarn', create_yarn_scope, ('intermediary', 'intermediary_scope'), ('yarn_scope',))
+
+        def remap_yarn(obf_to_moj: Mappings, hierarchy: ClassHierarchy, intermediary: Mappings, yarn: Mappings) -> Mappings:
+            moj_to_yarn = remap_yarn_onto_mojmap(obf_to_moj, hierarchy, intermediary, yarn)
+            if args.yarn_mapping_comments:
+                append_mapping_javadoc(moj_to_yarn, 'Yarn: ')
+                if docs_store is not None:
+                    moj_to_yarn.store_docs(docs_store)
+            return moj_to_yarn
+
+        pipeline.add('Remapping yarn onto mojmap', remap_yarn, ('obf_to_moj', 'hierarchy', 'intermediary', 'yarn'), ('moj_to_yarn',))
         if 'yarn' in args.providers:
-            sources.append(moj_to_yarn)
-
-    print('Creating merged mappings')
-    merged = obf_to_moj.remap()
-    create_merged_mappings(merged, *sources)
+            sources.append('moj_to_yarn')
 
-    print('Writing merged mappings')
     output_mc_version = args.publish_mc_version if args.publish_mc_version is not None else args.mc_version
-    parchmentmc.write_parchment(merged, output_mc_version, version, True)
+
+    def written(output: str, changed: bool) -> Tuple[str, bool]:
+        log('Wrote export' if changed else 'Export unchanged, skipped writing')
+        return output, changed
+
+    if args.shard_budget is None:
+        def merge(obf_to_moj: Mappings, *source_mappings: Mappings) -> Mappings:
+            if scope is None:
+                merged = obf_to_moj.remap()
+            else:  # Classes outside the scope are only loaded by name, so are excluded from the output
+                merged = obf_to_moj.extract(scoped_classes(obf_to_moj, scope)).remap(class_mappings=obf_to_moj.class_mappings())
+            create_merged_mappings(merged, *source_mappings)
+            return merged
+
+        def write(merged: Mappings) -> Tuple[str, bool]:
+            return written(*parchmentmc.write_parchment(merged, output_mc_version, version, True, args.force))
+
+        pipeline.add('Creating merged mappings', merge, ['obf_to_moj'] + sources, ('merged',))
+        pipeline.add('Writing merged mappings', write, ('merged',), ('output', 'changed'))
+        for name in args.formats:
+            # Exports only read the merged mappings, so they can run concurrently with each other, and with the parchment export
+            pipeline.add('Exporting %s' % name, partial(exporters.export, name, mc_version=output_mc_version, version=version), ('obf_to_moj', 'merged'), ('export_' + name,), kind=THREAD)
+    else:
+        if args.formats:
+            raise ValueError('Additional export formats cannot be written by a sharded build')
+        def merge_and_write(obf_to_moj: Mappings, *source_mappings: Mappings) -> Tuple[str, bool]:
+            # Providers which are not shared with other builds are consumed as each shard is merged, so they shrink as the build progresses
+            classes = create_merged_mappings_in_shards(obf_to_moj, source_mappings, args.shard_budget * 1024 * 1024, not share_providers, log)
+            if scope is not None:
+                classes = (c for c in classes if scope.includes(c.name))
+            return written(*parchmentmc.write_parchment_stream((), classes, output_mc_version, version, True, args.force))  # Merged mappings never contain packages, as remapping drops them
+
+        pipeline.add('Creating and writing merged mappings in shards', merge_and_write, ['obf_to_moj'] + sources, ('output', 'changed'))
+
+    def publish() -> bool:
+        published = bool(parchmentmc.publish_parchment(output_mc_version, version, force=args.force, log=log))
+        log('Published to channel: \'parchment\' version: \'%s-%s\'' % (version, output_mc_version))
+        return published
 
     if args.publish:
-        print('Publishing to maven local')
-        parchmentmc.publish_parchment(output_mc_version, version)
+        pipeline.add('Publishing to maven local', publish, outputs=('published',), after=('output',))
+
+    # The build cache stores every output file, so a build with identical inputs and options can restore them, without loading anything
+    output_path, plain_path = parchmentmc.export_paths(output_mc_version, version)
+    output_files = {'output': output_path, 'output_hash': output_path + '.sha256', 'plain': plain_path}
+    output_files.update(('export_' + name, exporters.export_path(name, output_mc_version, version)) for name in args.formats)
+
+    # Inputs in the remote cache are fetched first, as that is faster than streaming them from upstream
+    for source in inputs.values():
+        mapping_downloader.sync_remote(source)
+
+    # If any input is not downloaded yet, the build cache is only checked once it is, as downloading it ahead of the build would prevent streaming it
+    cache = None if args.no_build_cache else BuildCache(remote=remote)
+    cache_key: Optional[str] = None
+    if cache is not None and all(mapping_downloader.is_cached(path) for path, _, _ in inputs.values()):
+        cache_key, manifest = build_cache_key(cache, inputs, args)
+        entry = None if args.force or keep_merged else cache.lookup(cache_key)
+        if entry is not None:
+            log('Restoring outputs from build cache %s' % cache_key[:12])
+            changed = cache.restore(cache_key, entry, output_files)['output']
+            log('Restored export' if changed else 'Export unchanged, skipped writing')
+            return {
+                'version': version,
+                'mc_version': output_mc_version,
+                'output': output_path,
+                'changed': changed,
+                'published': publish() if args.publish else False,
+                'exports': dict((name, output_files['export_' + name]) for name in args.formats),
+                'cached': True,
+                'merged': None,
+                'time': time.perf_counter() - start
+            }
+
+    # Only keep loaded providers if they are going to be shared with other builds
+    keep = {'output', 'changed', 'published'} | set('export_' + name for name in args.formats)
+    if keep_merged:
+        keep.add('merged')
+    if share_providers:
+        keep.update(value for values in loaded.values() for value in values)
+
+    jobs = 1
+    if args.parallel:
+        if profiler.enabled:
+            log('Profiling runs stages sequentially, ignoring --parallel')
+        else:
+            jobs = os.cpu_count() or 1
+
+    try:
+        results = pipeline.run(initial, keep, jobs, profiler)
+    finally:
+        profiler.close()
+    if share_providers:
+        for key, values in loaded.items():
+            providers.put(key, results[values[0]] if len(values) == 1 else tuple(results[value] for value in values))
+
+    output, changed, published = results['output'], results['changed'], results.get('published', False)
+    for name in args.formats:
+        log('Wrote %s export to %s' % (name, results['export_' + name]))
+
+    if cache is not None:
+        if cache_key is None:
+            cache_key, manifest = build_cache_key(cache, inputs, args)
+        cache.store(cache_key, manifest, output_files)
+
+    if args.profile is not None:
+        profiler.write_report(args.profile, version=version, json_backend=backend.name, mc_version=args.mc_version, providers=list(args.providers), parchment_version=args.parchment_version, crane_version=args.crane_version, yarn_version=args.yarn_version)
+        log('Wrote profile report to %s' % args.profile)
+
+    return {
+        'version': version,
+        'mc_version': output_mc_version,
+        'output': output,
+        'changed': changed,
+        'published': published,
+        'exports': dict((name, results['export_' + name]) for name in args.formats),
+        'cached': False,
+        'merged': results.get('merged'),
+        'time': time.perf_counter() - start
+    }
+
+
+def create_intermediary_scope(scope: Scope, obf_to_moj: Mappings, hierarchy: ClassHierarchy) -> Scope:
+    """ The obfuscated names of all classes in the scope, and any classes which they override methods of, as remapping yarn needs to find inherited methods """
+    return Scope.of_classes(set(k for k, c in obf_to_moj.classes.items() if scope.includes(c.mapped)) | set(hierarchy.names))
+
+
+def create_yarn_scope(intermediary: Mappings, intermediary_scope: Scope) -> Scope:
+    """ The intermediary names of the same classes as the intermediary scope """
+    return Scope.of_classes(intermediary.classes[k].mapped for k in intermediary_scope.classes if k in intermediary.classes and intermediary.classes[k].mapped)
+
+
+def scoped_classes(obf_to_moj: Mappings, scope: Scope) -> List[str]:
+    """ The obfuscated names of all classes in the scope """
+    return [k for k, c in obf_to_moj.classes.items() if c.mapped and scope.includes(c.mapped)]
+
+
+def store_docs(store: DocsStore, *values: Any) -> Any:
+    """ Moves the docs of any loaded mappings into the docs store, and returns the values """
+    for value in values:
+        if isinstance(value, Mappings):
+            value.store_docs(store)
+    return values[0] if len(values) == 1 else values
+
+
+def log_memory_report(names: Tuple[str, ...], log: Callable[[str], None], *values: Any):
+    for name, value in zip(names, values):
+        if isinstance(value, Mappings):
+            for line in memory.format_report(name, value.memory_report()):
+                log(line)
+
+
+def build_cache_key(cache: BuildCache, inputs: Dict[str, mapping_downloader.Source], args: Namespace) -> Tuple[str, Dict[str, Any]]:
+    return cache.key(dict((name, os.path.join(mapping_downloader.cache_path(), mapping_downloader.fetch(source))) for name, source in inputs.items()), output_options(args))
+
+
+def output_options(args: Namespace) -> Dict[str, Any]:
+    """ The options which affect the output of a build, used as part of the build cache key. The content of each input file is also part of the key. """
+    yarn = 'yarn' in args.providers or args.yarn_mapping_comments
+    return {
+        'version': export_version(args),
+        'mc_version': args.mc_version,
+        'publish_mc_version': args.publish_mc_version,
+        'providers': sorted(args.providers),
+        'parchment_version': args.parchment_version if 'parchment' in args.providers else None,
+        'crane_version': args.crane_version if 'crane' in args.providers else None,
+        'yarn_version': args.yarn_version if yarn else None,
+        'yarn_mapping_comments': args.yarn_mapping_comments,
+        'formats': sorted(args.formats),
+        'only_packages': sorted(args.only_packages) if args.only_packages is not None else None,
+        'only_classes': sorted(args.only_classes) if args.only_classes is not None else None
+    }
+
+
+def run_build_cache_command(args: Namespace):
+    cache = BuildCache()
+    if args.build_cache == 'list':
+        stamp = build_cache.source_stamp()
+        rows = [('Key', 'Version', 'Minecraft', 'Created', 'Size', '')]
+        for entry in cache.entries():
+            options = entry['manifest']['options']
+            rows.append((entry['key'][:12], options['version'], options['mc_version'], time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['created'])), '%.1f MB' % (entry['size'] / (1024 * 1024)), '' if entry['manifest']['stamp'] == stamp else 'stale'))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        for row in rows:
+            print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+        print('%d entries in %s' % (len(rows) - 1, cache.path))
+    else:
+        removed = cache.clean(args.build_cache == 'prune')
+        print('Removed %d entries from %s' % (removed, cache.path))
+        parsed_cache = ParsedCache()
+        print('Removed %d parsed providers from %s' % (parsed_cache.clean(), parsed_cache.path))
+
+
+def run_bundle_command(args: Namespace):
+    if args.export_bundle is not None:
+        files = bundle.cached_inputs(args.bundle_include)
+        if not files:
+            raise SystemExit('No cached files match %s' % ', '.join(args.bundle_include or mapping_downloader.INPUT_PATTERNS))
+        bundle.export_bundle(args.export_bundle, files)
+        print('Exported %d files to %s (%.1f MB)' % (len(files), args.export_bundle, os.path.getsize(args.export_bundle) / (1024 * 1024)))
+    if args.import_bundle is not None:
+        files = bundle.import_bundle(args.import_bundle)
+        print('Imported %d files from %s' % (len(files), args.import_bundle))
+
+
+def split_parchment_version(args: Namespace) -> Tuple[str, str]:
+    """ The Minecraft version and parchment version, from a parchment version which may include a Minecraft version, i.e. '2023.06.26-1.20.1' """
+    if '-' in args.parchment_version:
+        parchment_version, parchment_mc_version = args.parchment_version.split('-')
+        return parchment_mc_version, parchment_version
+    return args.mc_version, args.parchment_version
+
+
+def create_search_index(args: Namespace, providers: Optional[ProviderCache] = None, cache_path: Optional[str] = None) -> search.SearchIndex:
+    """ Loads the providers of a build (sharing them via the provider cache, if present), and indexes the names in each of their namespaces. Scopes are ignored, so all classes are indexed. """
+    if providers is None:
+        providers = ProviderCache()
+    remote = RemoteCache(args.remote_cache, args.remote_cache_read_only) if args.remote_cache is not None else None
+    with mapping_downloader.using(mapping_downloader.Settings(cache_path if cache_path is not None else mapping_downloader.cache_path(), args.offline, remote, args.json_backend)):
+        return create_search_index_with_settings(args, providers)
+
+
+def create_search_index_with_settings(args: Namespace, providers: ProviderCache) -> search.SearchIndex:
+
+    index = search.SearchIndex()
+    obf_to_moj, _ = providers.get(('blackstone', args.mc_version), partial(parchmentmc.read_blackstone, args.mc_version))
+    index.add(obf_to_moj, 'mojmap', 'obf')
+
+    if 'parchment' in args.providers:
+        parchment_mc_version, parchment_version = split_parchment_version(args)
+        index.add(providers.get(('parchment', parchment_mc_version, parchment_version), partial(parchmentmc.read_parchment, parchment_mc_version, parchment_version)), 'parchment')
+
+    if 'crane' in args.providers:
+        index.add(providers.get(('crane', args.mc_version, args.crane_version), partial(architectury.read_crane, args.mc_version, args.crane_version)), 'crane')
+
+    if 'yarn' in args.providers:
+        index.add(providers.get(('intermediary', args.mc_version), partial(fabricmc.read_intermediary, args.mc_version)), 'intermediary')
+        index.add(providers.get(('yarn', args.mc_version, args.yarn_version), partial(fabricmc.read_yarn, args.mc_version, args.yarn_version)), 'yarn')
+
+    return index
 
-        print('Published to channel: \'parchment\' version: \'%s-%s\'' % (version, output_mc_version))
 
+def run_search(args: Namespace):
+    start = time.perf_counter()
+    index = create_search_index(args)
+    index.build()  # So the query is timed on its own
+    built = time.perf_counter()
+    results = index.search(args.search, args.search_limit)
+    queried = time.perf_counter()
 
-def remap_yarn_onto_mojmap(obf_to_moj: Mappings, method_inheritance: MethodInheritanceTree, intermediary: Mappings, yarn: Mappings) -> Mappings:
+    rows = search.format_results(results)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+    print('%d results for \'%s\' in %.3f ms (indexed %d entries in %.1f s)' % (len(results), args.search, (queried - built) * 1000, len(index), built - start))
+
+
+def run_diff(args: Namespace):
+    json_backend.select(args.json_backend)
+    old, new = (diff.read_mappings(path) for path in args.diff)
+    write = diff.write_json if args.diff_format == 'json' else diff.write_text
+    if args.diff_output is None:
+        write(diff.diff(old, new), sys.stdout)
+    else:
+        with open(args.diff_output, 'w', encoding='utf-8') as f:
+            counts = write(diff.diff(old, new), f)
+        print('Wrote diff to %s: %s' % (args.diff_output, diff.summary(counts)))
+
+
+def export_version(args: Namespace) -> str:
+    version = args.version
+    if version is None:
+        version = 'mappificator'
+        if 'parchment' in args.providers:
+            version += '-p%s' % args.parchment_version.split('-')[0]
+        if 'crane' in args.providers:
+            version += '-c%s' % args.crane_version
+        if 'yarn' in args.providers:
+            version += '-y%s' % args.yarn_version
+        if args.only_packages is not None or args.only_classes is not None:
+            version += '-scoped'
+    return version
+
+
+def run_batch(args: Namespace):
+    """
+    Runs a batch of builds, described by a JSON file of option overrides.
+    Builds are grouped by Minecraft version, as that is what providers are keyed by (i.e. one blackstone can be shared by several parchment versions).
+    Each group runs in a worker process with its own provider cache, and a summary table is printed at the end.
+    """
+    with open(args.batch, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    groups: Dict[str, List[Namespace]] = {}
+    for entry in entries:
+        entry_args = Namespace(**vars(args))
+        entry_args.batch = None
+        for key, value in entry.items():
+            key = key.replace('-', '_')
+            if not hasattr(entry_args, key):
+                raise ValueError('Unknown option in batch entry: %s' % repr(key))
+            setattr(entry_args, key, value)
+        groups.setdefault(entry_args.mc_version, []).append(entry_args)
+
+    print('Running %d builds for %d Minecraft version(s)' % (len(entries), len(groups)))
+    start = time.perf_counter()
+    results = []
+    jobs = max(1, min(args.jobs or 1, len(groups)))
+    if jobs == 1:
+        for group in groups.values():
+            results += run_batch_group(group)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for group_results in executor.map(mapping_downloader.bind(run_batch_group), groups.values()):
+                results += group_results
+
+    print_batch_summary(results)
+    print('Finished %d builds in %.1f s' % (len(results), time.perf_counter() - start))
+    errors = sum('error' in result for result in results)
+    if errors:
+        raise SystemExit('Batch build failed: %d build(s) had errors' % errors)
+
+
+def run_batch_group(group: List[Namespace]) -> List[Dict[str, Any]]:
+    """ Runs a group of builds sequentially, sharing loaded providers. Errors are recorded, so the rest of the batch can continue """
+    providers = ProviderCache()
+    results = []
+    for args in group:
+        label = '%s %s' % (export_version(args), args.mc_version)
+        start = time.perf_counter()
+        try:
+            results.append(build(args, providers, lambda message: print('[%s] %s' % (label, message), flush=True)))
+        except Exception as e:
+            results.append({'version': export_version(args), 'mc_version': args.mc_version, 'time': time.perf_counter() - start, 'error': '%s: %s' % (type(e).__name__, e)})
+    return results
+
+
+def run_daemon(args: Namespace):
+    providers = ProviderCache(args.daemon_cache_size)
+
+    def handle_build(argv: List[str], log: Callable[[str], None]) -> Dict[str, Any]:
+        build_args = create_argument_parser().parse_args(argv)
+        if build_args.daemon or build_args.client or build_args.batch is not None:
+            raise ValueError('Only single builds can be run by the build server')
+        return build(build_args, providers, log)
+
+    def handle_status() -> Dict[str, Any]:
+        return {'providers': [list(key) for key in providers.entries.keys()], 'hits': providers.hits, 'misses': providers.misses}
+
+    daemon.serve(handle_build, handle_status, port=args.daemon_port, token_file=args.daemon_token_file)
+
+
+def run_client(args: Namespace, argv: Optional[List[str]] = None):
+    """ Sends a build (from the command line arguments, by default), or a stop request, to a running build server """
+    if args.stop_daemon:
+        daemon.request({'command': 'stop'}, port=args.daemon_port, token_file=args.daemon_token_file)
+        print('Stopped build server')
+        return
+
+    argv = [arg for arg in (argv if argv is not None else sys.argv[1:]) if arg != '--client']
+    result = daemon.request({'command': 'build', 'argv': argv}, port=args.daemon_port, token_file=args.daemon_token_file)
+    print('Finished build of %s in %.1f s' % (result['output'], result['time']))
+
+
+def print_batch_summary(results: List[Dict[str, Any]]):
+    rows = [('Version', 'Minecraft', 'Time', 'Result')]
+    for result in results:
+        rows.append((str(result['version']), result['mc_version'], '%.1f s' % result['time'], 'ERROR %s' % result['error'] if 'error' in result else result['output']))
+    widths = [max(len(row[i]) for row in rows) for i in range(3)]
+    for row in rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)) + '  ' + row[3])
+
+
+def remap_yarn_onto_mojmap(obf_to_moj: Mappings, hierarchy: ClassHierarchy, intermediary: Mappings, yarn: Mappings) -> Mappings:
     # First - fix issues with intermediary
-    # intermediary does not include inherited methods - use the method inheritance tree to fill them out (mostly)
+    # intermediary does not include inherited methods - use the class hierarchy to fill them out from the nearest overridden method (mostly)
     for method in obf_to_moj.methods.keys():
-        if method not in intermediary.methods and method in method_inheritance:
-            obf_class, obf_method, obf_desc = method
-            for override_obf_class in method_inheritance[method]:
-                key = override_obf_class, obf_method, obf_desc
-                if key in intermediary.methods:
-                    new_method = intermediary.add_method(intermediary.add_class(obf_class), obf_method, obf_desc)
-                    new_method.mapped = intermediary.methods[key].mapped
-                    break
+        if method not in intermediary.methods and method in hierarchy:
+            override = hierarchy.nearest_override(method, intermediary.methods)
+            if override is not None:
+                obf_class, obf_method, obf_desc = method
+                new_method = intermediary.add_method(intermediary.add_class(obf_class), obf_method, obf_desc)
+                new_method.mapped = override.mapped
 
     # Inherit mojmap (un-obf) mappings, and then compose obf -> moj -> intermediary (inherited moj) -> yarn
     intermediary.inherit_domain(obf_to_moj)
@@ -120,6 +634,23 @@ def append_mapping_javadoc(mappings: Mappings, prefix: str):
     apply(dict((k, v) for k, v in mappings.methods.items() if v.mapped != '<init>' and not v.is_lambda))  # exclude constructors and lambda methods
 
 
+def create_merged_mappings_in_shards(obf_to_moj: Mappings, sources: Sequence[Mappings], budget: int, consume: bool, log: Callable[[str], None] = print) -> Iterator[Mappings.Class]:
+    """
+    Merges mappings one shard (of root class families) at a time, and yields the merged classes in sorted order, identical to a sorted, non-sharded merge.
+    Each shard is released once all its classes have been consumed. If consume is true, each shard is also removed from the obf -> moj and source mappings as it is merged.
+    """
+    class_mappings = obf_to_moj.class_mappings()
+    planned = shards.plan_shards(obf_to_moj, budget, len(sources))
+    log('Merging in %d shard(s)' % len(planned))
+    for i, shard in enumerate(planned):
+        log('Merging shard %d / %d (%d classes)' % (i + 1, len(planned), len(shard)))
+        mapped_names = [class_mappings[name] for name in shard]
+        named = obf_to_moj.extract(shard, consume).remap(class_mappings=class_mappings)
+        create_merged_mappings(named, *(source.extract(mapped_names, consume) for source in sources))
+        for _, named_class in sorted(named.classes.items()):
+            yield named_class
+
+
 def create_merged_mappings(named: Mappings, *sources: Mappings):
     # Copy package level docs from parchment
     for key, named_package in named.packages.items():
@@ -2,91 +2,140 @@
 
 import re
 
+from typing import Iterable, Optional
+
 from util.mappings import Mappings, Mappable
 from util.parser import Parser
-
-
-def parse_tiny(text: str) -> Mappings:
-    parser = Parser(text + '\n')  # Hack for now, ensure that tiny has a trailing newline
-
-    if parser.accept('tiny\t2\t0\t'):
-        return parse_tiny_v2(parser)
-    elif parser.accept('v1\t'):
-        return parse_tiny_v1(parser)
-    else:
-        raise ValueError('Unknown tiny format')
-
-
-def parse_tiny_v2(parser: Parser) -> Mappings:
+from util.scope import Scope
+
+
+def parse_tiny(text: str, scope: Optional[Scope] = None) -> Mappings:
+    """ Parses tiny v1 or v2. If a scope is given, only classes (of the source namespace) in the scope include their members and docs. All other classes are included by name only. """
+    return parse_tiny_stream((text,), scope)
+
+
+def parse_tiny_stream(chunks: Iterable[str], scope: Optional[Scope] = None) -> Mappings:
+    """ Parses tiny from chunks of text, i.e. as they are downloaded. Each complete line is parsed as soon as it arrives. """
+    reader = TinyReader(scope)
+    pending = ''
+    for chunk in chunks:
+        pending += chunk
+        end = pending.rfind('\n') + 1
+        if end > 0:
+            reader.feed(pending[:end])
+            pending = pending[end:]
+    reader.feed(pending + '\n')  # Hack for now, ensure that tiny has a trailing newline
+    return reader.mappings
+
+
+class TinyReader:
+    """
+    An incremental parser for tiny v1 and v2, which is fed text one or more complete lines at a time.
+    The state between lines (the current class, member, etc.) is kept between each feed.
+    """
+
+    mappings: Mappings
+    scope: Optional[Scope]
+    version: Optional[int]
+    named_class: Optional[Mappings.Class]
+    named_member: Optional[Mappable]
+    named_method: Optional[Mappings.Method]
+    named_parameter: Optional[Mappings.Parameter]
+    skipping: bool  # If the current class is outside the scope, all of its (indented) lines are skipped
+    line_count: int  # Lines fed so far, so errors report the line in the whole input
+
+    def __init__(self, scope: Optional[Scope] = None):
+        self.mappings = Mappings()
+        self.scope = scope
+        self.version = None
+        self.named_class = self.named_member = self.named_method = self.named_parameter = None
+        self.skipping = False
+        self.line_count = 0
+
+    def feed(self, text: str):
+        parser = Parser(text, self.line_count)
+        if self.version is None:
+            if parser.accept('tiny\t2\t0\t'):
+                self.version = 2
+            elif parser.accept('v1\t'):
+                self.version = 1
+            else:
+                raise ValueError('Unknown tiny format')
+            parse_tiny_header(parser)
+
+        if self.version == 2:
+            self.parse_v2(parser)
+        else:
+            self.parse_v1(parser)
+        self.line_count += text.count('\n')
+
+    def parse_v2(self, parser: Parser):
+        mappings, scope = self.mappings, self.scope
+        while not parser.end():
+            if self.skipping and parser.peek() == '\t':
+                parser.skip_line()
+            elif parser.accept('c\t'):
+                self.named_class = parse_tiny_class(parser, mappings)
+                self.skipping = scope is not None and not scope.includes(self.named_class.name)
+            elif parser.accept('\tm\t'):
+                if self.named_class is None:
+                    parser.error('Expected class before method')
+                self.named_member = self.named_method = parse_tiny_method(parser, mappings, self.named_class)
+            elif parser.accept('\tf\t'):
+                if self.named_class is None:
+                    parser.error('Expected class before field')
+                self.named_member = parse_tiny_field(parser, mappings, self.named_class)
+            elif parser.accept('\t\tp\t'):
+                if self.named_method is None:
+                    parser.error('Expected method before parameter')
+                self.named_parameter = parse_tiny_v2_parameter(parser, mappings, self.named_class, self.named_method)
+            elif parser.accept('\tc\t'):
+                if self.named_class is None:
+                    parser.error('Expected class before class comment')
+                parse_tiny_v2_comment(parser, self.named_class)
+            elif parser.accept('\t\tc\t'):
+                if self.named_member is None:
+                    parser.error('Expected method or field before member comment')
+                parse_tiny_v2_comment(parser, self.named_member)
+            elif parser.accept('\t\t\tc\t'):
+                if self.named_parameter is None:
+                    parser.error('Expected parameter before parameter comment')
+                parse_tiny_v2_comment(parser, self.named_parameter)
+            else:
+                parser.accept_until_including('\n')  # Tiny spec says to skip unrecognized lines
+
+    def parse_v1(self, parser: Parser):
+        mappings, scope = self.mappings, self.scope
+        while not parser.end():
+            if parser.accept('CLASS\t'):
+                parse_tiny_class(parser, mappings)
+            elif parser.accept('FIELD\t'):
+                clazz = parser.accept_identifier()
+                parser.expect('\t')
+                if scope is not None and not scope.includes(clazz):
+                    parser.skip_line()
+                else:
+                    parse_tiny_field(parser, mappings, mappings.add_class(clazz))
+            elif parser.accept('METHOD\t'):
+                clazz = parser.accept_identifier()
+                parser.expect('\t')
+                if scope is not None and not scope.includes(clazz):
+                    parser.skip_line()
+                else:
+                    parse_tiny_method(parser, mappings, mappings.add_class(clazz))
+            else:
+                parser.accept_until_including('\n')  # Tiny spec says to skip unrecognized lines
+
+
+def parse_tiny_header(parser: Parser):
     # tiny can technically represent a map from a source set to any number of named namespaces
     # with current tech, this would be rather difficult (and also unnecessary) to handle, so we don't try
-    mappings = Mappings()
-
-    parser.accept_identifier()  # the origin namespace
-    if parser.peek() == '\t':  # optional mapped namespace
-        parser.expect('\t')
-        parser.accept_identifier()
-    parser.expect('\n')
-
-    named_class = named_member = named_method = named_parameter = None
-    while not parser.end():
-        if parser.accept('c\t'):
-            named_class = parse_tiny_class(parser, mappings)
-        elif parser.accept('\tm\t'):
-            if named_class is None:
-                parser.error('Expected class before method')
-            named_member = named_method = parse_tiny_method(parser, mappings, named_class)
-        elif parser.accept('\tf\t'):
-            if named_class is None:
-                parser.error('Expected class before field')
-            named_member = parse_tiny_field(parser, mappings, named_class)
-        elif parser.accept('\t\tp\t'):
-            if named_method is None:
-                parser.error('Expected method before parameter')
-            named_parameter = parse_tiny_v2_parameter(parser, mappings, named_class, named_method)
-        elif parser.accept('\tc\t'):
-            if named_class is None:
-                parser.error('Expected class before class comment')
-            parse_tiny_v2_comment(parser, named_class)
-        elif parser.accept('\t\tc\t'):
-            if named_member is None:
-                parser.error('Expected method or field before member comment')
-            parse_tiny_v2_comment(parser, named_member)
-        elif parser.accept('\t\t\tc\t'):
-            if named_parameter is None:
-                parser.error('Expected parameter before parameter comment')
-            parse_tiny_v2_comment(parser, named_parameter)
-        else:
-            parser.accept_until_including('\n')  # Tiny spec says to skip unrecognized lines
-
-    return mappings
-
-
-def parse_tiny_v1(parser: Parser) -> Mappings:
-    mappings = Mappings()
-
     parser.accept_identifier()  # the origin namespace
     if parser.peek() == '\t':  # optional mapped namespace
         parser.expect('\t')
         parser.accept_identifier()
     parser.expect('\n')
 
-    while not parser.end():
-        if parser.accept('CLASS\t'):
-            parse_tiny_class(parser, mappings)
-        elif parser.accept('FIELD\t'):
-            clazz = parser.accept_identifier()
-            parser.expect('\t')
-            parse_tiny_field(parser, mappings, mappings.add_class(clazz))
-        elif parser.accept('METHOD\t'):
-            clazz = parser.accept_identifier()
-            parser.expect('\t')
-            parse_tiny_method(parser, mappings, mappings.add_class(clazz))
-        else:
-            parser.accept_until_including('\n')  # Tiny spec says to skip unrecognized lines
-
-    return mappings
-
 
 def parse_tiny_class(parser: Parser, mappings: Mappings) -> Mappings.Class:
     src_class = parser.accept_identifier()
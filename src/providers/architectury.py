@@ -2,14 +2,16 @@
 # Produces a mojmap-named mappings project
 # https://github.com/Architectury/Crane
 
+from typing import Optional
+
 from parsing import tiny_parser
 from util import mapping_downloader
 from util.mappings import Mappings
+from util.scope import Scope
 
 
-def read_crane(mc_version: str, crane_version: str) -> Mappings:
+def read_crane(mc_version: str, crane_version: str, scope: Optional[Scope] = None) -> Mappings:
     """
     Source set is mojmap, mappings are parameters and javadocs only
     """
-    text = mapping_downloader.load_crane(mc_version, crane_version)
-    return tiny_parser.parse_tiny(text)
+    return tiny_parser.parse_tiny_stream(mapping_downloader.stream_crane(mc_version, crane_version), scope)
@@ -2,19 +2,23 @@
 # Produces Intermediary (unique mappings) and Yarn (named mappings)
 # https://github.com/FabricMC/
 
+from typing import Optional
+
 from parsing import tiny_parser
 from util import mapping_downloader
 from util.mappings import Mappings
+from util.scope import Scope
 
 
-def read_intermediary(mc_version: str) -> Mappings:
-    intermediary = mapping_downloader.load_fabric_intermediary(mc_version)
-    return tiny_parser.parse_tiny(intermediary)
+def read_intermediary(mc_version: str, scope: Optional[Scope] = None) -> Mappings:
+    """
+    Source set is official (obfuscated), Mappings are intermediary
+    """
+    return tiny_parser.parse_tiny_stream(mapping_downloader.stream_fabric_intermediary(mc_version), scope)
 
 
-def read_yarn(mc_version: str, yarn_version: str) -> Mappings:
+def read_yarn(mc_version: str, yarn_version: str, scope: Optional[Scope] = None) -> Mappings:
     """
     Source set is intermediary, Mappings are yarn
     """
-    yarn = mapping_downloader.load_yarn(mc_version, yarn_version)
-    return tiny_parser.parse_tiny(yarn)
+    return tiny_parser.parse_tiny_stream(mapping_downloader.stream_yarn(mc_version, yarn_version), scope)
@@ -2,106 +2,200 @@
 # Produces Parchment (mappings) and Blackstone (metadata)
 # https://github.com/ParchmentMC/
 
-import json
+import contextlib
+import io
 import os
-import subprocess
 import zipfile
-from typing import Dict, Tuple, Any, Set
+from typing import Dict, Tuple, Any, List, Iterable, Callable, Optional
 
-from util import mapping_downloader, utils
+from util import mapping_downloader, maven_local, utils
+from util.hierarchy import ClassHierarchy
+from util.docs import Docs
+from util.json_stream import JsonStreamWriter
 from util.mappings import Mappings
+from util.scope import Scope
 
-MethodInheritanceTree = Dict[Tuple[str, str, str], Set[str]]  # (obf class, obf method, obf desc) -> { overriding obf classes }
+ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)  # The earliest timestamp a zip file supports, used so exports are reproducible
+MAVEN_GROUP = 'org.parchmentmc.data'
 
 
-def read_parchment(mc_version: str, parchment_version: str) -> Mappings:
+def read_parchment(mc_version: str, parchment_version: str, scope: Optional[Scope] = None) -> Mappings:
     parchment = mapping_downloader.load_parchment(mc_version, parchment_version)
     named = Mappings()
-    parse_parchment(parchment, named)
+    parse_parchment(parchment, named, scope)
     return named
 
 
-def write_parchment(data: Mappings, mc_version: str, version: str, write_plain: bool = False):
+def write_parchment(data: Mappings, mc_version: str, version: str, write_plain: bool = False, force: bool = False) -> Tuple[str, bool]:
     """
     Writes a parchment mappings object to a parchment formatted JSON file
     The source set is assumed to be mojmap, with named parameters and javadocs
+    Entries are written sorted by name, so the output is deterministic.
     """
-    # Write directly to a zip file
-    file_path = os.path.join(mapping_downloader.CACHE_PATH, 'parchment-%s-%s-checked.zip' % (mc_version, version))
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    json_data = utils.filter_none({
-        'version': '1.0.0',
-        'packages': [{
-            'name': p.name,
-            'javadoc': p.docs
-        } for p in data.packages.values() if p.docs is not None],
-        'classes': [{
-            'name': c.name,
-            'javadoc': c.docs if c.docs else None,
-            'fields': [{
-                'name': f.name,
-                'descriptor': f.desc,
-                'javadoc': f.docs
-            } for f in c.fields.values() if f.docs],
-            'methods': [{
-                'name': m.name,
-                'descriptor': m.desc,
-                'javadoc': m.docs if m.docs else None,
-                'parameters': [{
-                    'index': p.index,
-                    'name': p.mapped,
-                    'javadoc': '\n'.join(p.docs) if p.docs else None
-                } for p in m.parameters.values() if p.mapped or p.docs]
-            } for m in c.methods.values() if m.docs or any(p.mapped or p.docs for p in m.parameters.values())]
-        } for c in data.classes.values()]
-    })
-
-    with zipfile.ZipFile(file_path, 'w') as f:
-        f.writestr('parchment.json', json.dumps(json_data))
+    packages = [p for _, p in sorted(data.packages.items())]
+    classes = (c for _, c in sorted(data.classes.items()))
+    return write_parchment_stream(packages, classes, mc_version, version, write_plain, force)
 
-    if write_plain:
-        plain_path = os.path.join(mapping_downloader.CACHE_PATH, 'parchment-%s-%s-checked.json' % (mc_version, version))
-        mapping_downloader.save_text(plain_path, json.dumps(json_data, indent=2))
 
+def write_parchment_stream(packages: Iterable[Mappings.Package], classes: Iterable[Mappings.Class], mc_version: str, version: str, write_plain: bool = False, force: bool = False) -> Tuple[str, bool]:
+    """
+    Writes packages and classes, in the given order, to a parchment formatted JSON file
+    The JSON is streamed directly into the zip file, one class at a time, and the plain (pretty-printed) copy, if requested, is written in the same pass.
+    Classes may be produced lazily, i.e. one shard of a build at a time.
 
-def publish_parchment(mc_version: str, version: str):
-    file_path = os.path.join(mapping_downloader.CACHE_PATH, 'parchment-%s-%s-checked.zip' % (mc_version, version))
-    if not os.path.isfile(file_path):
-        raise ValueError('Must first build export before publishing to maven local')
+    The output is deterministic (as long as the order is), and a hash of it is stored alongside.
+    If the new output is identical to the existing one, the existing files are left untouched, unless forced.
+    Returns the path to the zip file, and if it changed.
+    """
+    file_path, plain_path = export_paths(mc_version, version)
+    hash_name = os.path.basename(file_path) + '.sha256'
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
-    print('Publishing export to maven local...')
-    proc = subprocess.Popen('mvn install:install-file -Dfile=%s -DgroupId=org.parchmentmc.data -DartifactId=parchment-%s -Dversion=%s -Dpackaging=zip -Dclassifier=checked' % (file_path, mc_version, version), shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    while proc.poll() is None:
-        output = proc.stdout.readline().decode('utf-8').replace('\r', '').replace('\n', '')
-        if output != '':
-            print(output)
-    mvn_ret_code = proc.wait()  # catch return code
-    if mvn_ret_code != 0:
-        raise ValueError('Maven install returned error code %s' % str(mvn_ret_code))
-    print('Maven install finished successfully!')
+    with contextlib.ExitStack() as stack:
+        zip_file = stack.enter_context(zipfile.ZipFile(file_path + '.tmp', 'w'))
+        compact = stack.enter_context(io.TextIOWrapper(zip_file.open(zipfile.ZipInfo('parchment.json', ZIP_TIMESTAMP), 'w'), encoding='utf-8'))
+        plain = stack.enter_context(open(plain_path + '.tmp', 'w', encoding='utf-8')) if write_plain else None
+        write_parchment_json(packages, classes, JsonStreamWriter(compact, plain))
+
+    content_hash = mapping_downloader.sha256_file(file_path + '.tmp')
+    unchanged = os.path.isfile(file_path) and mapping_downloader.is_cached(hash_name) and mapping_downloader.load_text(hash_name).strip() == content_hash and (not write_plain or os.path.isfile(plain_path))
+    if unchanged and not force:
+        os.remove(file_path + '.tmp')
+        if write_plain:
+            os.remove(plain_path + '.tmp')
+        return file_path, False
+
+    os.replace(file_path + '.tmp', file_path)
+    if write_plain:
+        os.replace(plain_path + '.tmp', plain_path)
+    mapping_downloader.save_text(hash_name, content_hash + '\n')
+    return file_path, True
+
+
+def export_paths(mc_version: str, version: str) -> Tuple[str, str]:
+    """ The paths to the zip and plain JSON exports. The hash of the zip is stored alongside it, with an additional .sha256 extension """
+    file_path = os.path.join(mapping_downloader.cache_path(), 'parchment-%s-%s-checked.zip' % (mc_version, version))
+    return file_path, file_path[:-len('.zip')] + '.json'
+
+
+def write_parchment_json(packages: Iterable[Mappings.Package], classes: Iterable[Mappings.Class], writer: JsonStreamWriter):
+    writer.begin_object()
+    writer.field('version', '1.0.0')
+
+    writer.key('packages')
+    writer.begin_array()
+    for p in packages:
+        writer.begin_object()
+        writer.field('name', p.name)
+        writer.key('javadoc')
+        writer.string_array(p.docs)
+        writer.end_object()
+    writer.end_array()
+    writer.flush()
+
+    writer.key('classes')
+    writer.begin_array()
+    for c in classes:
+        write_parchment_class(c, writer)
+        writer.flush()
+    writer.end_array()
+
+    writer.end_object()
+    writer.flush()
+
+
+def write_parchment_class(c: Mappings.Class, writer: JsonStreamWriter):
+    writer.begin_object()
+    writer.field('name', c.name)
+    if c.docs:
+        writer.key('javadoc')
+        writer.string_array(c.docs)
+
+    writer.key('fields')
+    writer.begin_array()
+    for _, f in sorted(c.fields.items()):
+        if f.docs:
+            writer.begin_object()
+            writer.field('name', f.name)
+            writer.field('descriptor', f.desc)
+            writer.key('javadoc')
+            writer.string_array(f.docs)
+            writer.end_object()
+    writer.end_array()
+
+    writer.key('methods')
+    writer.begin_array()
+    for _, m in sorted(c.methods.items()):
+        if m.docs or any(p.mapped or p.docs for p in m.parameters.values()):
+            writer.begin_object()
+            writer.field('name', m.name)
+            writer.field('descriptor', m.desc)
+            if m.docs:
+                writer.key('javadoc')
+                writer.string_array(m.docs)
+
+            writer.key('parameters')
+            writer.begin_array()
+            for _, p in sorted(m.parameters.items()):
+                if p.mapped or p.docs:
+                    writer.begin_object()
+                    writer.field('index', p.index)
+                    writer.field('name', p.mapped)
+                    if p.docs:
+                        writer.field('javadoc', '\n'.join(p.docs))
+                    writer.end_object()
+            writer.end_array()
+            writer.end_object()
+    writer.end_array()
+    writer.end_object()
+
+
+def publish_parchment(mc_version: str, *versions: str, force: bool = False, log: Callable[[str], None] = print, repository: str = maven_local.MAVEN_LOCAL_PATH) -> List[str]:
+    """
+    Publishes previously written exports to maven local, as org.parchmentmc.data:parchment-<mc version>:<version>:checked@zip
+    Exports which are already published (with identical content) are skipped, unless forced. Returns the versions which were published.
+    """
+    published = []
+    for version in versions:
+        file_path, _ = export_paths(mc_version, version)
+        if not os.path.isfile(file_path):
+            raise ValueError('Must first build export before publishing to maven local')
+
+        installed_path = maven_local.artifact_path(MAVEN_GROUP, 'parchment-%s' % mc_version, version, 'zip', 'checked', repository)
+        if not force and os.path.isfile(installed_path) and mapping_downloader.sha256_file(installed_path) == mapping_downloader.sha256_file(file_path):
+            log('Export %s is already published to maven local' % version)
+            continue
+
+        maven_local.install(file_path, MAVEN_GROUP, 'parchment-%s' % mc_version, version, 'zip', 'checked', repository)
+        published.append(version)
+    return published
 
 
-def read_blackstone(mc_version: str) -> Tuple[Mappings, MethodInheritanceTree]:
+def read_blackstone(mc_version: str, scope: Optional[Scope] = None) -> Tuple[Mappings, ClassHierarchy]:
     blackstone = mapping_downloader.load_blackstone(mc_version)
 
     obf_to_moj = Mappings()
-    method_inheritance = {}
+    hierarchy = ClassHierarchy()
 
-    parse_blackstone(blackstone, obf_to_moj, method_inheritance)
+    parse_blackstone(blackstone, obf_to_moj, hierarchy, scope)
 
-    return obf_to_moj, method_inheritance
+    return obf_to_moj, hierarchy
 
 
-def parse_parchment(parchment: Dict[str, Any], named: Mappings):
+def parse_parchment(parchment: Dict[str, Any], named: Mappings, scope: Optional[Scope] = None):
     # Packages
     p_packages = utils.or_else(parchment, 'packages', [])
     for p_package in p_packages:
+        if scope is not None and not scope.includes_package(p_package['name']):
+            continue
         named_package = named.add_package(p_package['name'])
         named_package.docs += utils.or_else(p_package, 'javadoc', [])
 
     # Classes
     p_classes = utils.or_else(parchment, 'classes', [])
     for p_class in p_classes:
+        if scope is not None and not scope.includes(p_class['name']):
+            continue
         named_class = named.add_class(p_class['name'])
         named_class.docs += utils.or_else(p_class, 'javadoc', [])
 
@@ -121,16 +215,16 @@ def parse_parchment(parchment: Dict[str, Any], named: Mappings):
             for p_parameter in p_parameters:
                 named_parameter = named.add_parameter(named_class, named_method, p_parameter['index'])
                 named_parameter.mapped = utils.or_else(p_parameter, 'name')
-                named_parameter.docs = utils.or_else(p_parameter, 'javadoc', '').split('\n')
+                named_parameter.docs = Docs(utils.or_else(p_parameter, 'javadoc', '').split('\n'))
 
 
-def parse_blackstone(blackstone: Dict[str, Any], obf_to_moj: Mappings, method_inheritance: MethodInheritanceTree):
+def parse_blackstone(blackstone: Dict[str, Any], obf_to_moj: Mappings, hierarchy: ClassHierarchy, scope: Optional[Scope] = None):
     b_classes = utils.or_else(blackstone, 'classes', [])
     for b_class in b_classes:
-        parse_blackstone_class(b_class, obf_to_moj, method_inheritance)
+        parse_blackstone_class(b_class, obf_to_moj, hierarchy, scope)
 
 
-def parse_blackstone_class(b_class: Dict[str, Any], obf_to_moj: Mappings, method_inheritance: MethodInheritanceTree):
+def parse_blackstone_class(b_class: Dict[str, Any], obf_to_moj: Mappings, hierarchy: ClassHierarchy, scope: Optional[Scope] = None):
     # Class and package
     obf_class = b_class['name']['obf']
     moj_class = b_class['name']['moj']
@@ -138,6 +232,12 @@ def parse_blackstone_class(b_class: Dict[str, Any], obf_to_moj: Mappings, method
     named_class = obf_to_moj.add_class(obf_class)
     named_class.mapped = moj_class
 
+    # Classes outside the scope are kept, so descriptors can still be remapped, but without any members. Their inner classes may still be in the scope.
+    if scope is not None and not scope.includes(moj_class):
+        for b_inner in utils.or_else(b_class, 'inner', []):
+            parse_blackstone_class(b_inner, obf_to_moj, hierarchy, scope)
+        return
+
     # Record flag
     # If the class is a record, we include it for class remapping but we need to ignore it's canonical constructor.
     named_class.record = utils.or_else(b_class, 'record', False)
@@ -145,7 +245,7 @@ def parse_blackstone_class(b_class: Dict[str, Any], obf_to_moj: Mappings, method
     # Inner classes
     b_inners = utils.or_else(b_class, 'inner', [])
     for b_inner in b_inners:
-        parse_blackstone_class(b_inner, obf_to_moj, method_inheritance)
+        parse_blackstone_class(b_inner, obf_to_moj, hierarchy, scope)
 
     # Fields
     b_fields = utils.or_else(b_class, 'fields', [])
@@ -196,4 +296,4 @@ def parse_blackstone_class(b_class: Dict[str, Any], obf_to_moj: Mappings, method
         named_method.mapped = moj_method
 
         if 'overrides' in b_method:
-            method_inheritance[(obf_class, obf_method, obf_desc)] = set(b_override['owner']['obf'] for b_override in b_method['overrides'])
+            hierarchy.add_override(obf_class, obf_method, obf_desc, (b_override['owner']['obf'] for b_override in b_method['overrides']))
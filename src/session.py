@@ -0,0 +1,138 @@
+# A programmatic API for running builds in-process, for tools which embed mappificator
+# A session keeps loaded providers in memory between builds, and reports progress through callbacks, rather than printing it.
+
+from argparse import Namespace
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import mappificator
+
+from util.mappings import Mappings
+from util.provider_cache import ProviderCache
+from util.search import SearchIndex
+
+
+class BuildOptions:
+    """
+    The options of a single build. Each mirrors the command line option of the same name (see mappificator.py --help), and has the same default.
+    """
+
+    version: Optional[str]
+    mc_version: str
+    publish_mc_version: Optional[str]
+    providers: Sequence[str]
+    parchment_version: str
+    yarn_version: str
+    crane_version: str
+    yarn_mapping_comments: bool
+    formats: Sequence[str]
+    publish: bool
+    force: bool
+    parallel: bool
+    docs_on_disk: bool
+    shard_budget: Optional[int]
+    only_packages: Optional[Sequence[str]]
+    only_classes: Optional[Sequence[str]]
+    json_backend: str
+    offline: bool
+    use_build_cache: bool
+    remote_cache: Optional[str]
+    remote_cache_read_only: bool
+
+    def __init__(self, **options: Any):
+        defaults = vars(mappificator.create_argument_parser().parse_args([]))
+        defaults['use_build_cache'] = not defaults['no_build_cache']
+        for key in options:
+            if key not in BuildOptions.__annotations__:
+                raise ValueError('Unknown build option: %s' % repr(key))
+        for key in BuildOptions.__annotations__:
+            setattr(self, key, options.get(key, defaults[key]))
+
+    def __str__(self):
+        return 'BuildOptions {%s}' % ', '.join('%s=%r' % (key, getattr(self, key)) for key in BuildOptions.__annotations__)
+
+    def replace(self, **options: Any) -> 'BuildOptions':
+        """ Returns a copy of these options, with some replaced """
+        return BuildOptions(**{**dict((key, getattr(self, key)) for key in BuildOptions.__annotations__), **options})
+
+    def to_args(self) -> Namespace:
+        """ The equivalent parsed command line arguments """
+        args = mappificator.create_argument_parser().parse_args([])
+        for key in BuildOptions.__annotations__:
+            if key != 'use_build_cache':
+                setattr(args, key, getattr(self, key))
+        args.providers = tuple(self.providers)
+        args.formats = tuple(self.formats)
+        args.no_build_cache = not self.use_build_cache
+        return args
+
+
+class BuildResult:
+    version: str
+    mc_version: str
+    output: str  # The path to the parchment export (zip)
+    exports: Dict[str, str]  # The paths to any additional formats, by name
+    changed: bool
+    published: bool
+    cached: bool  # If the outputs were restored from the build cache
+    time: float
+    merged: Optional[Mappings]  # The merged mappings, if they were kept
+
+    def __init__(self, summary: Dict[str, Any]):
+        self.version = summary['version']
+        self.mc_version = summary['mc_version']
+        self.output = summary['output']
+        self.exports = summary['exports']
+        self.changed = summary['changed']
+        self.published = summary['published']
+        self.cached = summary['cached']
+        self.time = summary['time']
+        self.merged = summary['merged']
+
+    def __str__(self):
+        return 'BuildResult {Version=%s, Output=%s, Changed=%s, Cached=%s, Time=%.1f s}' % (self.version, self.output, self.changed, self.cached, self.time)
+
+
+class Session:
+    """
+    Runs builds in this process, sharing loaded providers between them. Providers are cached until evicted, or until more than the capacity are loaded (least recently used first).
+    Progress is reported to the log callback, which by default discards it.
+    If a cache path is given, it is used instead of the project's build/ directory, for both inputs and outputs.
+    """
+
+    providers: ProviderCache
+    log: Callable[[str], None]
+    cache_path: Optional[str]
+
+    def __init__(self, capacity: Optional[int] = None, log: Optional[Callable[[str], None]] = None, cache_path: Optional[str] = None):
+        self.providers = ProviderCache(capacity)
+        self.log = log if log is not None else (lambda _: None)
+        self.cache_path = cache_path
+
+    def build(self, options: Optional[BuildOptions] = None, log: Optional[Callable[[str], None]] = None, keep_merged: bool = True, **overrides: Any) -> BuildResult:
+        """
+        Runs a build, with the given options, and any overrides (by name, as in BuildOptions).
+        If keep_merged is true (the default), the merged mappings are returned, which means the outputs are always rebuilt rather than restored from the build cache.
+        """
+        options = (options if options is not None else BuildOptions()).replace(**overrides)
+        summary = mappificator.build(options.to_args(), self.providers, log if log is not None else self.log, keep_merged and options.shard_budget is None, self.cache_path)
+        return BuildResult(summary)
+
+    def search_index(self, options: Optional[BuildOptions] = None, **overrides: Any) -> SearchIndex:
+        """ An index of the names in the providers of a build (see util/search.py), which loads them into this session if they are not already """
+        options = (options if options is not None else BuildOptions()).replace(**overrides)
+        return mappificator.create_search_index(options.to_args(), self.providers, self.cache_path)
+
+    def loaded(self) -> List[Tuple]:
+        """ The keys of all loaded providers, i.e. ('blackstone', '1.20.1'), least recently used first """
+        return list(self.providers.entries.keys())
+
+    def evict(self, name: str, *versions: str) -> int:
+        """ Evicts loaded providers by name, and optionally versions (i.e. evict('parchment', '1.20.1')). Returns the number evicted. """
+        keys = [key for key in self.providers.entries if key[0] == name and key[1:1 + len(versions)] == versions]
+        for key in keys:
+            self.providers.evict(key)
+        return len(keys)
+
+    def clear(self):
+        self.providers.clear()
@@ -0,0 +1,54 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+
+from unittest import TestCase
+
+import mappificator
+from util import mapping_downloader
+from util.synthetic import SyntheticMappings
+
+
+class BatchTests(TestCase):
+
+    def test_batch(self):
+        inputs = SyntheticMappings(0.01, 1)
+        cache_path = mapping_downloader.CACHE_PATH
+        with tempfile.TemporaryDirectory() as temp:
+            files = [(mapping_downloader.PARCHMENT_BLACKSTONE_CACHE % 'syn', inputs.blackstone())]
+            files += [(mapping_downloader.PARCHMENT_CACHE % ('syn', version), inputs.parchment()) for version in ('2023.01.01', '2023.02.02')]
+            for name, data in files:
+                with open(os.path.join(temp, name), 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+
+            matrix = os.path.join(temp, 'matrix.json')
+            with open(matrix, 'w', encoding='utf-8') as f:
+                json.dump([
+                    {'parchment_version': '2023.01.01', 'version': 'first'},
+                    {'parchment_version': '2023.02.02', 'version': 'second'},
+                    {'mc_version': 'missing', 'parchment_version': '2023.01.01', 'version': 'missing'}  # Not cached, and offline
+                ], f)
+
+            args = mappificator.create_argument_parser().parse_args(['--batch', matrix, '--jobs', '1', '--mc-version', 'syn', '--offline', '--no-build-cache'])
+            try:
+                mapping_downloader.CACHE_PATH = temp
+                with contextlib.redirect_stdout(io.StringIO()) as output, self.assertRaises(SystemExit) as e:
+                    mappificator.run_batch(args)
+            finally:
+                mapping_downloader.CACHE_PATH = cache_path
+
+            self.assertNotEqual(e.exception.code, 0)
+            self.assertEqual(str(e.exception), 'Batch build failed: 1 build(s) had errors')
+
+            lines = output.getvalue().splitlines()
+            self.assertIn('[first syn] Loading blackstone', lines)
+            self.assertNotIn('[second syn] Loading blackstone', lines)  # Shared with the first build of the same Minecraft version
+            self.assertIn('[second syn] Loading parchment', lines)
+
+            rows = dict((line.split()[0], line) for line in lines if line.split() and line.split()[0] in ('first', 'second', 'missing'))
+            self.assertTrue(rows['first'].endswith(os.path.join(temp, 'parchment-syn-first-checked.zip')))
+            self.assertTrue(rows['second'].endswith(os.path.join(temp, 'parchment-syn-second-checked.zip')))
+            self.assertIn('ERROR', rows['missing'])
+            self.assertIn('offline mode', rows['missing'])
@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+from unittest import TestCase
+
+from util.build_cache import BuildCache
+
+
+class BuildCacheTests(TestCase):
+
+    def test_store_and_restore(self):
+        with tempfile.TemporaryDirectory() as temp:
+            def write(name: str, text: str) -> str:
+                path = os.path.join(temp, name)
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                return path
+
+            def read(path: str) -> str:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return f.read()
+
+            cache = BuildCache(os.path.join(temp, 'cache'))
+            inputs = {'blackstone': write('blackstone.json', '{}')}
+            key, manifest = cache.key(inputs, {'version': 'v1'})
+            self.assertEqual(key, cache.key(inputs, {'version': 'v1'})[0])
+            self.assertNotEqual(key, cache.key(inputs, {'version': 'v2'})[0])
+            self.assertIsNone(cache.lookup(key))
+
+            output = write('export.zip', 'export')
+            cache.store(key, manifest, {'output': output})
+            entry = cache.lookup(key)
+            self.assertEqual(entry['manifest'], manifest)
+            self.assertEqual([e['key'] for e in cache.entries()], [key])
+
+            self.assertEqual(cache.restore(key, entry, {'output': output}), {'output': False})
+            write('export.zip', 'modified')
+            self.assertEqual(cache.restore(key, entry, {'output': output}), {'output': True})
+            self.assertEqual(read(output), 'export')
+
+            os.utime(write('blackstone.json', '{"classes": []}'), ns=(0, 0))  # Inputs are keyed by content, not path
+            self.assertNotEqual(key, cache.key(inputs, {'version': 'v1'})[0])
+
+            self.assertEqual(cache.clean(stale_only=True), 0)
+            self.assertEqual(cache.clean(), 1)
+            self.assertEqual(cache.entries(), [])
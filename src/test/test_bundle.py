@@ -0,0 +1,49 @@
+import os
+import tarfile
+import tempfile
+
+from unittest import TestCase
+
+from util import bundle
+
+
+class BundleTests(TestCase):
+
+    def test_export_and_import(self):
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as target:
+            for name in ('blackstone-1.20.1.json', 'parchment-1.20.1-2023.06.26.json', 'parchment-1.20.1-v1-checked.json', 'official-1.20.1/client.txt', 'build-cache/key/entry.json'):
+                os.makedirs(os.path.dirname(os.path.join(source, name)), exist_ok=True)
+                with open(os.path.join(source, name), 'w', encoding='utf-8') as f:
+                    f.write(name)
+
+            files = bundle.cached_inputs(cache_path=source)
+            self.assertEqual(files, ['blackstone-1.20.1.json', 'official-1.20.1/client.txt', 'parchment-1.20.1-2023.06.26.json'])
+            self.assertEqual(bundle.cached_inputs(['blackstone-*'], source), ['blackstone-1.20.1.json'])
+
+            bundle_path = os.path.join(target, 'inputs.tar.xz')
+            bundle.export_bundle(bundle_path, files, source)
+            self.assertEqual(sorted(bundle.import_bundle(bundle_path, target)), files)
+            with open(os.path.join(target, 'official-1.20.1', 'client.txt'), 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), 'official-1.20.1/client.txt')
+
+    def test_import_corrupt(self):
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as target:
+            with open(os.path.join(source, 'crane-1.20.1-15.tiny'), 'w', encoding='utf-8') as f:
+                f.write('original')
+            bundle_path = os.path.join(source, 'inputs.tar.xz')
+            manifest = bundle.export_bundle(bundle_path, ['crane-1.20.1-15.tiny'], source)
+
+            # Rewrite the bundle with the same manifest, but different content
+            with open(os.path.join(source, 'crane-1.20.1-15.tiny'), 'w', encoding='utf-8') as f:
+                f.write('tampered')
+            with tarfile.open(bundle_path, 'r:xz') as tar:
+                manifest_data = tar.extractfile(bundle.MANIFEST).read()
+            with open(os.path.join(source, bundle.MANIFEST), 'wb') as f:
+                f.write(manifest_data)
+            with tarfile.open(bundle_path, 'w:xz') as tar:
+                tar.add(os.path.join(source, bundle.MANIFEST), arcname=bundle.MANIFEST)
+                tar.add(os.path.join(source, 'crane-1.20.1-15.tiny'), arcname='crane-1.20.1-15.tiny')
+
+            self.assertIn('crane-1.20.1-15.tiny', manifest)
+            self.assertRaisesRegex(ValueError, 'does not match its checksum', bundle.import_bundle, bundle_path, target)
+            self.assertEqual(os.listdir(target), [])
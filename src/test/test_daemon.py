@@ -0,0 +1,67 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+from unittest import TestCase
+
+import mappificator
+from util import daemon, mapping_downloader
+from util.synthetic import SyntheticMappings
+
+
+class DaemonTests(TestCase):
+
+    def test_build_and_stop(self):
+        inputs = SyntheticMappings(0.01, 1)
+        cache_path = mapping_downloader.CACHE_PATH
+        with tempfile.TemporaryDirectory() as temp:
+            for name, data in ((mapping_downloader.PARCHMENT_BLACKSTONE_CACHE % 'syn', inputs.blackstone()), (mapping_downloader.PARCHMENT_CACHE % ('syn', '2023.01.01'), inputs.parchment())):
+                with open(os.path.join(temp, name), 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+
+            token_file = os.path.join(temp, 'daemon.json')
+            parser = mappificator.create_argument_parser()
+            try:
+                mapping_downloader.CACHE_PATH = temp
+                server = threading.Thread(target=mappificator.run_daemon, args=(parser.parse_args(['--daemon', '--daemon-port', '0', '--daemon-token-file', token_file]),), daemon=True)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    server.start()
+                    for _ in range(100):
+                        if os.path.isfile(token_file):
+                            break
+                        time.sleep(0.05)
+                self.assertEqual(os.stat(token_file).st_mode & 0o777, 0o600)
+                client = ['--client', '--daemon-port', '0', '--daemon-token-file', token_file]  # The port the server is listening on is read from the token file
+
+                # Two builds, where the second reuses the providers loaded by the first
+                build = client + ['--mc-version', 'syn', '--parchment-version', '2023.01.01', '--version', 'test', '--offline', '--no-build-cache']
+                for _ in range(2):
+                    with contextlib.redirect_stdout(io.StringIO()) as output:
+                        mappificator.run_client(parser.parse_args(build), build)
+                    self.assertIn('Finished build of %s' % os.path.join(temp, 'parchment-syn-test-checked.zip'), output.getvalue())
+                status = daemon.request({'command': 'status'}, token_file=token_file)
+                self.assertEqual((status['hits'], status['misses']), (2, 0))  # Loaded providers are put directly into the cache
+
+                # Errors are sent back to the client, without stopping the server
+                with self.assertRaises(daemon.DaemonError) as e:
+                    mappificator.run_client(parser.parse_args(client), client + ['--batch', 'matrix.json'])
+                self.assertIn('Only single builds can be run by the build server', str(e.exception))
+
+                # Requests without the token are rejected
+                with open(os.path.join(temp, 'wrong.json'), 'w', encoding='utf-8') as f:
+                    json.dump({'port': daemon.read_token_file(token_file)['port'], 'token': 'wrong'}, f)
+                with self.assertRaises(daemon.DaemonError) as e:
+                    daemon.request({'command': 'stop'}, token_file=os.path.join(temp, 'wrong.json'))
+                self.assertIn('Unauthorized', str(e.exception))
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    mappificator.run_client(parser.parse_args(client + ['--stop-daemon']))
+                    server.join(10)
+                self.assertFalse(server.is_alive())
+                self.assertFalse(os.path.isfile(token_file))
+            finally:
+                mapping_downloader.CACHE_PATH = cache_path
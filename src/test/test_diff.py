@@ -0,0 +1,78 @@
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+from unittest import TestCase
+
+from providers import parchmentmc
+from util import diff
+from util.diff import Change
+from util.mappings import Mappings
+
+OLD = {
+    'version': '1.0.0',
+    'packages': [{'name': 'net/minecraft', 'javadoc': ['Minecraft']}],
+    'classes': [
+        {'name': 'net/Apple', 'javadoc': ['An apple'], 'fields': [{'name': 'count', 'descriptor': 'I', 'javadoc': ['How many']}], 'methods': [
+            {'name': 'plant', 'descriptor': '(IJ)V', 'parameters': [{'index': 1, 'name': 'seed'}, {'index': 2, 'name': 'time'}]}
+        ]},
+        {'name': 'net/Banana', 'fields': [], 'methods': []}
+    ]
+}
+
+NEW = {
+    'version': '1.0.0',
+    'packages': [{'name': 'net/minecraft', 'javadoc': ['Minecraft']}],
+    'classes': [
+        {'name': 'net/Apple', 'javadoc': ['A red apple'], 'fields': [], 'methods': [
+            {'name': 'plant', 'descriptor': '(IJ)V', 'parameters': [{'index': 1, 'name': 'seeds'}]},
+            {'name': 'eat', 'descriptor': '()V', 'javadoc': ['Eats the apple'], 'parameters': []}
+        ]},
+        {'name': 'net/Cherry', 'fields': [], 'methods': []}
+    ]
+}
+
+
+def parse(parchment) -> Mappings:
+    mappings = Mappings()
+    parchmentmc.parse_parchment(parchment, mappings)
+    return mappings
+
+
+class DiffTests(TestCase):
+
+    def test_diff(self):
+        self.assertEqual(list(diff.diff(parse(OLD), parse(NEW))), [
+            Change(diff.DOCS_CHANGED, 'class', 'net/Apple', 'An apple', 'A red apple'),
+            Change(diff.REMOVED, 'field', 'net/Apple.count:I'),
+            Change(diff.ADDED, 'method', 'net/Apple.eat()V'),
+            Change(diff.RENAMED, 'parameter', 'net/Apple.plant(IJ)V #1', 'seed', 'seeds'),
+            Change(diff.REMOVED, 'parameter', 'net/Apple.plant(IJ)V #2', 'time'),
+            Change(diff.REMOVED, 'class', 'net/Banana'),
+            Change(diff.ADDED, 'class', 'net/Cherry'),
+        ])
+        self.assertEqual(list(diff.diff(parse(OLD), parse(OLD))), [])
+
+    def test_write(self):
+        changes = list(diff.diff(parse(OLD), parse(NEW)))
+        f = io.StringIO()
+        counts = diff.write_json(iter(changes), f)
+        self.assertEqual(json.loads(f.getvalue()), {'changes': [c.to_json() for c in changes], 'summary': counts})
+        self.assertEqual(counts, {diff.ADDED: 2, diff.REMOVED: 3, diff.RENAMED: 1, diff.DOCS_CHANGED: 1})
+
+        f = io.StringIO()
+        diff.write_text(changes, f)
+        lines = f.getvalue().splitlines()
+        self.assertEqual(lines[3], '~ parameter net/Apple.plant(IJ)V #1: seed -> seeds')
+        self.assertEqual(lines[-1], '7 changes (2 added, 3 removed, 1 renamed, 1 docs changed)')
+
+    def test_read_mappings(self):
+        with tempfile.TemporaryDirectory() as path:
+            json_path, zip_path = os.path.join(path, 'parchment.json'), os.path.join(path, 'parchment.zip')
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(NEW, f)
+            with zipfile.ZipFile(zip_path, 'w') as z:
+                z.writestr('parchment.json', json.dumps(OLD))
+            self.assertEqual(len(list(diff.diff(diff.read_mappings(zip_path), diff.read_mappings(json_path)))), 7)
@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+from util.docs import Docs, DocsStore, StoredLines
+from util.mappings import Mappings
+
+
+class DocsTests(TestCase):
+
+    def test_append_by_reference(self):
+        source = Docs(['An apple', 'Red or green'])
+        docs = Docs(['A fruit'])
+        docs.append('<p>')
+        docs += source
+
+        self.assertEqual(docs, ['A fruit', '<p>', 'An apple', 'Red or green'])
+        self.assertEqual(len(docs), 4)
+        self.assertIs(docs.parts[-1][0], source)  # Not copied
+
+        source.append('Or yellow')  # Views only see the lines present when they were added
+        self.assertEqual(docs, ['A fruit', '<p>', 'An apple', 'Red or green'])
+        self.assertEqual(source, ['An apple', 'Red or green', 'Or yellow'])
+
+    def test_empty_and_single_line(self):
+        docs = Docs()
+        docs += Docs()
+        self.assertFalse(docs)
+        self.assertEqual(docs.parts, [])
+
+        docs += Docs(['One line'])
+        self.assertEqual(docs.parts, ['One line'])
+        self.assertTrue(Docs(['']))  # A single empty line is still a line
+
+    def test_nested_views(self):
+        a = Docs(['a1', 'a2'])
+        b = Docs(['b1'])
+        b += a
+        c = Docs()
+        c += b
+        c.append('')
+        c += a
+        self.assertEqual(c.flatten(), ['b1', 'a1', 'a2', '', 'a1', 'a2'])
+        self.assertEqual(Docs(['x']), Docs(['x']))
+        self.assertNotEqual(Docs(['x']), ['x', 'y'])
+
+    def test_compose_shares_docs(self):
+        obf = Mappings()
+        obf.add_class('a').mapped = 'Apple'
+        named = Mappings()
+        apple = named.add_class('Apple')
+        apple.mapped = 'Apple'
+        apple.docs += ['An apple', 'A fruit']
+
+        composed = obf.compose(named)
+        self.assertEqual(composed.classes['a'].docs, ['An apple', 'A fruit'])
+        self.assertIs(composed.classes['a'].docs.parts[0][0], apple.docs)
+
+    def test_store_on_disk(self):
+        mappings = Mappings()
+        apple = mappings.add_class('Apple')
+        apple.docs += ['An apple, which is a fruit that grows on trees', 'It is usually red or green, and sometimes yellow', '<p>', 'Apples are eaten raw, or cooked']
+        pear = mappings.add_class('Pear')
+        pear.docs.append('A pear')  # Too short to be worth storing
+        pear.docs += apple.docs
+        fingerprint = mappings.root_fingerprint()
+
+        store = DocsStore()
+        try:
+            mappings.store_docs(store)
+            self.assertIsInstance(apple.docs.parts[0], StoredLines)
+            self.assertEqual(apple.docs, ['An apple, which is a fruit that grows on trees', 'It is usually red or green, and sometimes yellow', '<p>', 'Apples are eaten raw, or cooked'])
+            self.assertEqual(pear.docs.flatten(), ['A pear'] + apple.docs.flatten())
+            self.assertEqual(mappings.root_fingerprint(), fingerprint)
+            self.assertEqual(mappings.memory_report()['docs']['stored'], store.size)
+        finally:
+            store.close()
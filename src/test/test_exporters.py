@@ -0,0 +1,59 @@
+import io
+
+from unittest import TestCase
+
+from exporting import exporters
+from parsing import tiny_parser
+from util.mappings import Mappings
+
+
+class ExportersTests(TestCase):
+
+    def setUp(self):
+        self.obf_to_moj = m = Mappings()
+        a, b = m.add_class('a'), m.add_class('b')
+        a.mapped, b.mapped = 'net/Apple', 'net/Apple$Seed'
+        m.add_field(a, 'c', 'Lb;').mapped = 'seed'
+        method = m.add_method(a, 'd', '(ILb;)[Lb;')
+        method.mapped = 'plant'
+        m.add_parameters_from_method(a, method, True)
+
+        self.named = named = self.obf_to_moj.remap()
+        apple = named.classes['net/Apple']
+        apple.docs += ['An apple', 'With\ttabs']
+        plant = named.methods[('net/Apple', 'plant', '(ILnet/Apple$Seed;)[Lnet/Apple$Seed;')]
+        plant.docs.append('Plants seeds')
+        plant.parameters[0].mapped = 'count_'
+        plant.parameters[1].mapped = 'seed_'
+        plant.parameters[1].docs.append('The seed')
+
+    def export(self, name: str) -> str:
+        f = io.StringIO()
+        exporters.FORMATS[name][1](self.obf_to_moj, self.named, f)
+        return f.getvalue()
+
+    def test_tiny_v2_round_trip(self):
+        parsed = tiny_parser.parse_tiny(self.export('tiny'))
+        self.assertEqual(parsed.classes['a'].mapped, 'net/Apple')
+        self.assertEqual(parsed.classes['a'].docs, ['An apple With\ttabs'])  # Single newlines are read as spaces, following yarn's conventions
+        self.assertEqual(parsed.fields[('a', 'c', 'Lb;')].mapped, 'seed')
+        method = parsed.methods[('a', 'd', '(ILb;)[Lb;')]
+        self.assertEqual((method.mapped, method.docs), ('plant', ['Plants seeds']))
+        self.assertEqual([(p.index, p.mapped, p.docs) for p in method.parameters.values()], [(0, 'count_', []), (1, 'seed_', ['The seed'])])
+
+    def test_tsrg2(self):
+        self.assertEqual(self.export('tsrg'), 'tsrg2 obf moj\na net/Apple\n\tc seed\n\td (ILb;)[Lb; plant\n\t\tstatic\n\t\t0 o count_\n\t\t1 o seed_\nb net/Apple$Seed\n')
+
+    def test_tsrg2_static(self):
+        # Static markers come from the source mappings, so are kept for static methods without parameters, or without any named parameters
+        a = self.obf_to_moj.classes['a']
+        for name, desc, mapped, is_static in (('e', '()V', 'reset', True), ('f', '(I)V', 'grow', True), ('g', '(I)V', 'ripen', False)):
+            method = self.obf_to_moj.add_method(a, name, desc)
+            method.mapped = mapped
+            self.obf_to_moj.add_parameters_from_method(a, method, is_static)
+        self.named = self.obf_to_moj.remap()
+        self.named.methods[('net/Apple', 'ripen', '(I)V')].parameters[1].mapped = 'days'
+        self.assertEqual(self.export('tsrg'), 'tsrg2 obf moj\na net/Apple\n\tc seed\n\td (ILb;)[Lb; plant\n\t\tstatic\n\te ()V reset\n\t\tstatic\n\tf (I)V grow\n\t\tstatic\n\tg (I)V ripen\n\t\t1 o days\nb net/Apple$Seed\n')
+
+    def test_proguard(self):
+        self.assertEqual(self.export('proguard'), 'net.Apple -> a:\n    net.Apple$Seed seed -> c\n    net.Apple$Seed[] plant(int,net.Apple$Seed) -> d\nnet.Apple$Seed -> b:\n')
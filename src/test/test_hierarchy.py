@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from util.hierarchy import ClassHierarchy
+
+
+class ClassHierarchyTests(TestCase):
+
+    def test_ancestors_and_descendants(self):
+        h = ClassHierarchy()
+        h.add_parent('c', 'b')
+        h.add_parent('b', 'a')
+        h.add_parent('d', 'a')
+        self.assertEqual(h.ancestors('c'), {'a', 'b'})
+        self.assertEqual(h.ancestors('a'), set())
+        self.assertEqual(h.descendants('a'), {'b', 'c', 'd'})
+        self.assertEqual(h.descendants('nope'), set())
+
+    def test_transitive_overrides(self):
+        h = ClassHierarchy()
+        h.add_override('c', 'm', '()V', ['b'])
+        h.add_override('b', 'm', '()V', ['a'])
+        self.assertIn(('c', 'm', '()V'), h)
+        self.assertNotIn(('a', 'm', '()V'), h)
+        self.assertEqual(h.overridden_owners(('c', 'm', '()V')), ('b', 'a'))
+        self.assertEqual(h.overridden_owners(('c', 'n', '()V')), ())
+
+    def test_nearest_override_with_shortcut_edges(self):
+        h = ClassHierarchy()
+        h.add_override('c', 'm', '()V', ['a', 'b'])  # blackstone lists all overridden owners, not just the direct one
+        h.add_override('b', 'm', '()V', ['a'])
+        methods = {('a', 'm', '()V'): 'from a', ('b', 'm', '()V'): 'from b'}
+        self.assertEqual(h.nearest_override(('c', 'm', '()V'), methods), 'from b')
+        del methods[('b', 'm', '()V')]
+        self.assertEqual(h.nearest_override(('c', 'm', '()V'), methods), 'from a')
+        self.assertIsNone(h.nearest_override(('c', 'm', '()V'), {}))
@@ -0,0 +1,55 @@
+import json
+import multiprocessing
+import os
+
+from unittest import TestCase
+
+from util import json_backend, mapping_downloader
+from util.pipeline import Pipeline, PROCESS
+
+
+class JsonBackendTests(TestCase):
+
+    def tearDown(self):
+        json_backend.select()
+
+    def test_backends_decode_equally(self):
+        text = json.dumps({'classes': [{'name': 'a/B', 'javadoc': ['é', '"quoted"'], 'index': 1, 'record': False, 'missing': None}]})
+        for name in json_backend.available():
+            backend = json_backend.select(name)
+            self.assertEqual(backend.name, name)
+            self.assertEqual(json_backend.loads(text), json.loads(text))
+            self.assertEqual(json.loads(json_backend.dumps(json.loads(text))), json.loads(text))
+
+    def test_select(self):
+        self.assertEqual(json_backend.select('auto').name, json_backend.available()[0])
+        self.assertIn('json', json_backend.available())
+        self.assertRaises(ValueError, json_backend.select, 'yaml')
+
+    def test_environment_default(self):
+        environ = dict(os.environ)
+        json_backend.select('json')
+        self.assertEqual(dict(os.environ), environ)  # Selecting a backend does not leak into the environment
+        try:
+            os.environ[json_backend.BACKEND_ENV], json_backend._backend = 'json', None
+            self.assertEqual(json_backend.current().name, 'json')
+        finally:
+            os.environ.pop(json_backend.BACKEND_ENV)
+        self.assertRaises(ValueError, json_backend.select, 'yaml')
+        self.assertEqual(json_backend.current().name, 'json')  # Unchanged by a failed selection
+
+    def test_using(self):
+        json_backend.select('json')
+        for name in json_backend.available():
+            with json_backend.using(name) as backend:
+                self.assertEqual((backend.name, json_backend.current().name), (name, name))
+            self.assertEqual(json_backend.current().name, 'json')  # The selected backend is unchanged
+
+    def test_spawned_workers(self):
+        # The backend of a build is passed to process stages with its settings, so spawned workers use it, rather than their own default
+        value = {'classes': [{'name': 'a/B'}]}
+        for name in json_backend.available():
+            with mapping_downloader.using(mapping_downloader.Settings(mapping_downloader.cache_path(), json_backend=name)):
+                p = Pipeline()
+                p.add('Encoding', mapping_downloader.bind(json_backend.dumps), ('value',), ('text',), kind=PROCESS)
+                self.assertEqual(p.run({'value': value}, keep=('text',), jobs=2, mp_context=multiprocessing.get_context('spawn')), {'text': json_backend.resolve(name).dumps(value)})
@@ -0,0 +1,63 @@
+import io
+import json
+
+from typing import Any
+from unittest import TestCase
+
+from util.json_stream import JsonStreamWriter
+
+
+class JsonStreamWriterTests(TestCase):
+
+    def test_empty(self):
+        self.assertSameAsDumps({})
+        self.assertSameAsDumps([])
+        self.assertSameAsDumps({'a': [], 'b': {}})
+
+    def test_values(self):
+        self.assertSameAsDumps({'string': 'text with "quotes" and ☃', 'int': 3, 'float': 1.5, 'bool': True, 'none': None})
+
+    def test_nested(self):
+        self.assertSameAsDumps({'version': '1.0.0', 'classes': [{'name': 'a', 'fields': [], 'methods': [{'name': 'b', 'parameters': [{'index': 1}, {'index': 2}]}]}, {'name': 'c'}]})
+        self.assertSameAsDumps([[1, [2, []]], {'a': {'b': {}}}])
+
+    def test_string_array(self):
+        self.assertSameAsDumps({'javadoc': ['one', 'two'], 'empty': []}, string_arrays=True)
+        self.assertSameAsDumps([['a'], [], ['b', 'c']], string_arrays=True)
+
+    def test_field_skips_none(self):
+        compact = io.StringIO()
+        writer = JsonStreamWriter(compact)
+        writer.begin_object()
+        writer.field('a', None)
+        writer.field('b', 1)
+        writer.end_object()
+        writer.flush()
+        self.assertEqual(compact.getvalue(), '{"b": 1}')
+
+    def assertSameAsDumps(self, data: Any, string_arrays: bool = False):
+        compact, pretty = io.StringIO(), io.StringIO()
+        writer = JsonStreamWriter(compact, pretty)
+        write(writer, data, string_arrays)
+        writer.flush()
+        self.assertEqual(compact.getvalue(), json.dumps(data))
+        self.assertEqual(pretty.getvalue(), json.dumps(data, indent=2))
+
+
+def write(writer: JsonStreamWriter, data: Any, string_arrays: bool):
+    if isinstance(data, dict):
+        writer.begin_object()
+        for key, value in data.items():
+            writer.key(key)
+            write(writer, value, string_arrays)
+        writer.end_object()
+    elif isinstance(data, list):
+        if string_arrays and all(isinstance(v, str) for v in data):
+            writer.string_array(data)
+        else:
+            writer.begin_array()
+            for value in data:
+                write(writer, value, string_arrays)
+            writer.end_array()
+    else:
+        writer.value(data)
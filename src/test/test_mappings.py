@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from util.mappings import Mappings
+
+
+class MappingsTests(TestCase):
+
+    def create(self, reverse: bool = False) -> Mappings:
+        m = Mappings()
+        names = ['a', 'b'] if not reverse else ['b', 'a']
+        for name in names:
+            c = m.add_class(name)
+            c.mapped = 'net/' + name.upper()
+            c.docs.append('Class %s' % name)
+            fields = [('x', 'I'), ('y', 'J')]
+            for field_name, desc in (fields if not reverse else fields[::-1]):
+                m.add_field(c, field_name, desc).mapped = field_name + 'Field'
+            method = m.add_method(c, 'm', '(IJ)V')
+            m.add_parameters_from_method(c, method, True)
+            method.parameters[0].mapped = 'count_'
+        return m
+
+    def test_fingerprints_ignore_order(self):
+        a, b = self.create(), self.create(True)
+        self.assertEqual(a.fingerprints(), b.fingerprints())
+        self.assertEqual(a.root_fingerprint(), b.root_fingerprint())
+        self.assertEqual(a.changed_classes(b), set())
+
+    def test_fingerprints_change(self):
+        a, b = self.create(), self.create()
+        root = b.root_fingerprint()
+        fingerprint = b.fingerprint('b')
+
+        b.add_field(b.classes['b'], 'z', 'F')  # Adding members invalidates the class
+        self.assertNotEqual(b.fingerprint('b'), fingerprint)
+        self.assertNotEqual(b.root_fingerprint(), root)
+        self.assertEqual(b.fingerprint('a'), a.fingerprint('a'))
+        self.assertEqual(a.changed_classes(b), {'b'})
+
+        b.classes['a'].docs.append('More docs')  # Entries modified in place change the fingerprint too
+        self.assertEqual(a.changed_classes(b), {'a', 'b'})
+        b.classes['a'].docs = a.classes['a'].docs
+        b.methods[('b', 'm', '(IJ)V')].mapped = 'grow'
+        self.assertEqual(a.changed_classes(b), {'b'})
+
+        b.add_class('c')
+        b.extract(['b'], remove=True)
+        self.assertEqual(a.changed_classes(b), {'b', 'c'})
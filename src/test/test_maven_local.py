@@ -0,0 +1,33 @@
+import hashlib
+import os
+import tempfile
+import xml.etree.ElementTree as ElementTree
+
+from unittest import TestCase
+
+from util import maven_local
+
+
+class MavenLocalTests(TestCase):
+
+    def test_install(self):
+        with tempfile.TemporaryDirectory() as repository:
+            artifact = os.path.join(repository, 'export.zip')
+            with open(artifact, 'wb') as f:
+                f.write(b'export')
+
+            path = maven_local.install(artifact, 'org.parchmentmc.data', 'parchment-1.20.1', 'v1', 'zip', 'checked', repository)
+            directory = os.path.join(repository, 'org', 'parchmentmc', 'data', 'parchment-1.20.1', 'v1')
+            self.assertEqual(path, os.path.join(directory, 'parchment-1.20.1-v1-checked.zip'))
+            self.assertEqual(path, maven_local.artifact_path('org.parchmentmc.data', 'parchment-1.20.1', 'v1', 'zip', 'checked', repository))
+            self.assertTrue(os.path.isfile(os.path.join(directory, 'parchment-1.20.1-v1.pom')))
+            with open(path + '.sha1', 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), hashlib.sha1(b'export').hexdigest())
+
+            maven_local.install(artifact, 'org.parchmentmc.data', 'parchment-1.20.1', 'v2', 'zip', 'checked', repository)
+            maven_local.install(artifact, 'org.parchmentmc.data', 'parchment-1.20.1', 'v1', 'zip', 'checked', repository)
+
+            metadata = ElementTree.parse(os.path.join(repository, 'org', 'parchmentmc', 'data', 'parchment-1.20.1', 'maven-metadata-local.xml')).getroot()
+            self.assertEqual(metadata.findtext('artifactId'), 'parchment-1.20.1')
+            self.assertEqual([v.text for v in metadata.iterfind('versioning/versions/version')], ['v1', 'v2'])
+            self.assertEqual(metadata.findtext('versioning/release'), 'v1')
@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from util import memory
+from util.mappings import Mappings
+
+
+class MemoryTests(TestCase):
+
+    def test_memory_report(self):
+        m = Mappings()
+        c = m.add_class('a')
+        c.mapped = 'Apple'
+        c.docs += ['An apple', ''.join(['An ', 'apple'])]  # Equal, but distinct strings
+        f = m.add_field(c, 'b', 'I')
+        f.mapped = 'count'
+        m.add_parameters_from_method(c, m.add_method(c, 'c', '(ILa;)V'), False)
+
+        report = m.memory_report()
+        self.assertEqual(report['counts'], {'packages': 0, 'classes': 1, 'fields': 1, 'methods': 1, 'parameters': 2, 'docs': 2})
+        self.assertEqual(report['docs'], {'lines': 2, 'bytes': 16, 'stored': 0})
+        self.assertEqual(report['total'], sum(report['tables'].values()))
+        self.assertTrue(all(size > 0 for size in report['tables'].values()))
+        self.assertEqual(report['strings']['duplicates'], 1)
+        self.assertGreater(report['strings']['shared'], 0)  # Class names are shared by keys and entries
+
+        lines = memory.format_report('test', report)
+        self.assertEqual(lines[0], 'Memory of test: %s' % memory.format_bytes(report['total']))
+
+    def test_format_bytes(self):
+        self.assertEqual(memory.format_bytes(12), '12 B')
+        self.assertEqual(memory.format_bytes(1536), '1.5 KB')
+        self.assertEqual(memory.format_bytes(3 * 1024 ** 3), '3.0 GB')
@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+from unittest import TestCase
+
+from providers import parchmentmc
+from util import mapping_downloader
+from util.mappings import Mappings
+
+
+class ParchmentExportTests(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.cache_path = mapping_downloader.CACHE_PATH
+        mapping_downloader.CACHE_PATH = self.temp.name
+
+    def tearDown(self):
+        mapping_downloader.CACHE_PATH = self.cache_path
+        self.temp.cleanup()
+
+    def write(self, docs: str, force: bool = False) -> bool:
+        mappings = Mappings()
+        mappings.add_class('net/Apple').docs.append(docs)
+        return parchmentmc.write_parchment(mappings, 'syn', 'test', True, force)[1]
+
+    def test_skip_unchanged_writes(self):
+        file_path, plain_path = parchmentmc.export_paths('syn', 'test')
+        self.assertTrue(self.write('An apple'))
+        modified = os.stat(file_path).st_mtime_ns
+        self.assertFalse(self.write('An apple'))  # Identical, so left untouched
+        self.assertEqual(os.stat(file_path).st_mtime_ns, modified)
+        self.assertTrue(self.write('An apple', force=True))
+
+        self.assertTrue(self.write('A red apple'))  # Changed content
+        with open(plain_path, 'r', encoding='utf-8') as f:
+            self.assertIn('A red apple', f.read())
+
+        mapping_downloader.save_text(os.path.basename(file_path) + '.sha256', 'corrupt\n')
+        self.assertTrue(self.write('A red apple'))
+        os.remove(file_path + '.sha256')
+        self.assertTrue(self.write('A red apple'))  # Missing hash
+        self.assertFalse(self.write('A red apple'))
+        os.remove(plain_path)
+        self.assertTrue(self.write('A red apple'))  # Missing plain export
+        self.assertEqual(sorted(os.listdir(self.temp.name)), sorted(os.path.basename(p) for p in (file_path, file_path + '.sha256', plain_path)))  # No temporary files are left behind
+
+    def test_skip_unchanged_publishes(self):
+        repository = os.path.join(self.temp.name, 'repository')
+        self.write('An apple')
+        self.assertEqual(parchmentmc.publish_parchment('syn', 'test', log=lambda message: None, repository=repository), ['test'])
+        self.assertEqual(parchmentmc.publish_parchment('syn', 'test', log=lambda message: None, repository=repository), [])
+        self.assertEqual(parchmentmc.publish_parchment('syn', 'test', force=True, log=lambda message: None, repository=repository), ['test'])
+        self.write('A red apple')
+        self.assertEqual(parchmentmc.publish_parchment('syn', 'test', log=lambda message: None, repository=repository), ['test'])
+        self.assertRaises(ValueError, parchmentmc.publish_parchment, 'syn', 'missing', repository=repository)
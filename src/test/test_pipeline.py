@@ -0,0 +1,82 @@
+import multiprocessing
+import tempfile
+
+from unittest import TestCase
+
+from util import mapping_downloader
+from util.pipeline import Pipeline, PROCESS, THREAD
+
+
+class PipelineTests(TestCase):
+
+    def test_run_in_dependency_order(self):
+        order = []
+
+        def stage(name: str, result):
+            def apply(*args):
+                order.append((name, args))
+                return result
+            return apply
+
+        p = Pipeline()
+        p.add('c', stage('c', 'done'), ('a', 'b'), ('c',))
+        p.add('b', stage('b', 2), ('a',), ('b',))
+        p.add('a', stage('a', (1, 'unused')), (), ('a', 'unused'))
+        results = p.run(keep=('c',))
+
+        self.assertEqual(order, [('a', ()), ('b', (1,)), ('c', (1, 2))])
+        self.assertEqual(results, {'c': 'done'})
+
+    def test_release_values(self):
+        released = []
+
+        class Value:
+            def __init__(self, name: str):
+                self.name = name
+
+            def __del__(self):
+                released.append(self.name)
+
+        p = Pipeline()
+        p.add('a', lambda: Value('a'), (), ('a',))
+        p.add('b', lambda a: released.append('before b') or Value('b'), ('a',), ('b',))
+        p.add('c', lambda b: released.append('before c'), ('b',), ())
+        p.run()
+
+        self.assertEqual(released, ['before b', 'a', 'before c', 'b'])
+
+    def test_concurrent(self):
+        p = Pipeline()
+        p.add('a', lambda: 1, (), ('a',), kind=THREAD)
+        p.add('b', lambda: 2, (), ('b',), kind=THREAD)
+        p.add('sum', lambda a, b: a + b, ('a', 'b'), ('sum',))
+        self.assertEqual(p.run(keep=('sum',), jobs=2), {'sum': 3})
+
+    def test_settings_in_spawned_workers(self):
+        # Spawned workers share nothing with this process, so process stages are given their settings explicitly, and thread stages inherit them
+        spawn = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory() as temp, mapping_downloader.using(mapping_downloader.Settings(temp, offline=True)):
+            mapping_downloader.save_text('apple.txt', 'apple')
+            p = Pipeline()
+            p.add('load', mapping_downloader.bind(mapping_downloader.load_text), ('name',), ('text',), kind=PROCESS)
+            p.add('path', mapping_downloader.cache_path, (), ('path',), kind=THREAD)
+            self.assertEqual(p.run({'name': 'apple.txt'}, keep=('text', 'path'), jobs=2, mp_context=spawn), {'text': 'apple', 'path': temp})
+
+            p = Pipeline()
+            p.add('download', mapping_downloader.bind(mapping_downloader.download), ('url',), ('data',), kind=PROCESS)
+            self.assertRaisesRegex(Exception, 'offline mode', p.run, {'url': 'https://example.invalid/apple.txt'}, jobs=2, mp_context=spawn)
+
+    def test_validate(self):
+        p = Pipeline()
+        p.add('a', lambda b: b, ('b',), ('a',))
+        p.add('b', lambda a: a, ('a',), ('b',))
+        self.assertRaisesRegex(ValueError, 'Cycle', p.run)
+
+        p = Pipeline()
+        p.add('a', lambda b: b, ('b',), ('a',))
+        self.assertRaisesRegex(ValueError, 'Missing values: b', p.run)
+
+        p = Pipeline()
+        p.add('a', lambda: 1, (), ('a',))
+        p.add('b', lambda: 1, (), ('a',))
+        self.assertRaisesRegex(ValueError, 'more than once', p.run)
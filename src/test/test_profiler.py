@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import tracemalloc
+
+from unittest import TestCase
+
+from util.mappings import Mappings
+from util.profiler import Profiler
+
+
+class ProfilerTests(TestCase):
+
+    def test_stages_and_report(self):
+        with tempfile.TemporaryDirectory() as temp:
+            messages = []
+            profiler = Profiler(True, os.path.join(temp, 'stats'), messages.append)
+            with profiler.stage('Loading apples') as stage:
+                mappings = Mappings()
+                mappings.add_method(mappings.add_class('Apple'), 'grow', '()V')
+                stage.record('apples', mappings)
+                stage.record('count', 1)  # Not mappings, so ignored
+            with profiler.stage('Writing apples'):
+                pass
+            profiler.close()
+            self.assertFalse(tracemalloc.is_tracing())
+
+            self.assertEqual(messages, ['Loading apples', 'Writing apples'])
+            self.assertEqual([s['name'] for s in profiler.stages], ['Loading apples', 'Writing apples'])
+            self.assertEqual(profiler.stages[0]['counts'], {'apples': {'packages': 0, 'classes': 1, 'fields': 0, 'methods': 1, 'parameters': 0}})
+            self.assertEqual(profiler.stages[1]['counts'], {})
+            self.assertTrue(all(s['wall_time'] >= 0 and s['peak_memory'] > 0 for s in profiler.stages))
+            self.assertEqual(sorted(os.listdir(os.path.join(temp, 'stats'))), ['01-loading-apples.pstats', '02-writing-apples.pstats'])
+
+            path = os.path.join(temp, 'report', 'profile.json')
+            profiler.write_report(path, version='test')
+            with open(path, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+            self.assertEqual(report['version'], 'test')
+            self.assertEqual(report['stages'], profiler.stages)
+            self.assertEqual(report['total']['peak_memory'], max(s['peak_memory'] for s in profiler.stages))
+
+    def test_tracing_started_elsewhere(self):
+        tracemalloc.start()
+        try:
+            profiler = Profiler(True, log=lambda message: None)
+            with profiler.stage('Stage'):
+                pass
+            profiler.close()
+            self.assertTrue(tracemalloc.is_tracing())  # Only stopped by whoever started it
+        finally:
+            tracemalloc.stop()
+
+    def test_disabled(self):
+        profiler = Profiler(log=lambda message: None)
+        with profiler.stage('Stage'):
+            pass
+        self.assertEqual(profiler.stages, [])
+        self.assertFalse(tracemalloc.is_tracing())
@@ -0,0 +1,115 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+from unittest import TestCase
+
+from parsing import tiny_parser
+from util import mapping_downloader
+from util.build_cache import BuildCache, ParsedCache
+from util.pipeline import Pipeline, PROCESS
+from util.remote_cache import RemoteCache, create_server, record_key
+from util.synthetic import SyntheticMappings
+
+
+class RemoteCacheTests(TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.server = create_server(os.path.join(self.temp.name, 'server'), port=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.remote = RemoteCache(self.url, log=lambda message: None)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp.cleanup()
+
+    def write(self, name: str, text: str) -> str:
+        path = os.path.join(self.temp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_files_and_records(self):
+        digest = self.remote.put_file(self.write('apple.txt', 'apple'))
+        self.assertEqual(digest, hashlib.sha256(b'apple').hexdigest())
+        self.assertTrue(self.remote.get_file(digest, os.path.join(self.temp.name, 'copy', 'apple.txt')))
+        self.assertFalse(self.remote.get_file(hashlib.sha256(b'pear').hexdigest(), os.path.join(self.temp.name, 'pear.txt')))
+
+        key = record_key('test', 'apple')
+        self.assertIsNone(self.remote.get_record(key))
+        self.remote.put_record(key, {'files': {'apple': {'sha256': digest}}})
+        self.assertEqual(self.remote.get_record(key), {'files': {'apple': {'sha256': digest}}})
+
+        # The server only accepts files which match their hash, at valid paths
+        for path, data, code in (('/cas/' + digest, b'pear', 400), ('/../apple.txt', b'apple', 404)):
+            with self.assertRaises(urllib.error.HTTPError) as e:
+                urllib.request.urlopen(urllib.request.Request(self.url + path, data=data, method='PUT'))
+            self.assertEqual(e.exception.code, code)
+        self.assertTrue(self.remote.available)
+
+    def test_unavailable(self):
+        self.server.shutdown()
+        self.server.server_close()
+        remote = RemoteCache(self.url, log=lambda message: None)
+        self.assertIsNone(remote.get_record(record_key('test')))
+        self.assertFalse(remote.available)
+
+        read_only = RemoteCache(self.url, read_only=True)
+        read_only.put_record(record_key('test'), {})  # Never attempted
+        self.assertTrue(read_only.available)
+
+    def test_build_cache(self):
+        output = self.write('export.zip', 'export')
+        node = BuildCache(os.path.join(self.temp.name, 'node'), self.remote)
+        key, manifest = node.key({'blackstone': self.write('blackstone.json', '{}')}, {'version': 'v1'})
+        node.store(key, manifest, {'output': output})
+
+        other_node = BuildCache(os.path.join(self.temp.name, 'other_node'), self.remote)
+        entry = other_node.lookup(key)
+        self.assertEqual(entry['manifest'], manifest)
+        self.assertEqual(os.listdir(other_node.path), [key])  # Copied locally
+        self.write('export.zip', 'modified')
+        self.assertEqual(other_node.restore(key, entry, {'output': output}), {'output': True})
+        with open(output, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'export')
+
+    def test_inputs_and_parsed_providers(self):
+        cache_path, remote_cache = mapping_downloader.CACHE_PATH, mapping_downloader.REMOTE_CACHE
+        source = ('yarn_v2-test.tiny', 'https://example.invalid/yarn.jar', 'mappings/mappings.tiny')
+        text = SyntheticMappings(0.01).yarn()
+        mappings = tiny_parser.parse_tiny(text)
+        try:
+            mapping_downloader.CACHE_PATH = os.path.join(self.temp.name, 'node')
+            mapping_downloader.REMOTE_CACHE = self.remote
+            mapping_downloader.save_text(source[0], text)
+            mapping_downloader.sync_remote(source)  # Uploaded, as the remote cache does not have it
+            ParsedCache(remote=self.remote).read('yarn', source, lambda: mappings)
+
+            mapping_downloader.CACHE_PATH = os.path.join(self.temp.name, 'other_node')
+            self.assertEqual(mapping_downloader.fetch(source), source[0])  # From the remote cache, as the url is unreachable
+            self.assertEqual(mapping_downloader.load_text(source[0]), text)
+
+            parsed = ParsedCache(remote=self.remote).read('yarn', source, lambda: self.fail('Should not be parsed again'))
+            self.assertEqual(parsed.root_fingerprint(), mappings.root_fingerprint())
+        finally:
+            mapping_downloader.CACHE_PATH, mapping_downloader.REMOTE_CACHE = cache_path, remote_cache
+
+    def test_spawned_workers(self):
+        # The remote cache is passed to process stages with the rest of their settings, so spawned workers use it as well
+        source = ('yarn_intermediary-test.tiny', 'https://example.invalid/intermediary.tiny', None)
+        with mapping_downloader.using(mapping_downloader.Settings(os.path.join(self.temp.name, 'node'), remote_cache=self.remote)):
+            mapping_downloader.save_text(source[0], 'apple')
+            mapping_downloader.sync_remote(source)
+
+        with mapping_downloader.using(mapping_downloader.Settings(os.path.join(self.temp.name, 'other_node'), offline=True, remote_cache=self.remote)):
+            p = Pipeline()
+            p.add('Fetching', mapping_downloader.bind(mapping_downloader.fetch), ('source',), ('path',), kind=PROCESS)
+            self.assertEqual(p.run({'source': source}, keep=('path',), jobs=2, mp_context=multiprocessing.get_context('spawn')), {'path': source[0]})
+            self.assertEqual(mapping_downloader.load_text(source[0]), 'apple')
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+
+from unittest import TestCase
+
+from session import BuildOptions, Session
+from util import mapping_downloader
+from parsing import tiny_parser
+from providers import parchmentmc
+from util.hierarchy import ClassHierarchy
+from util.mappings import Mappings
+from util.scope import Scope
+from util.synthetic import SyntheticMappings
+
+
+class ScopeTests(TestCase):
+
+    def test_includes(self):
+        scope = Scope(['net.minecraft.world'], ['net/minecraft/client/Minecraft'])
+        self.assertTrue(scope.includes('net/minecraft/world/Item'))
+        self.assertTrue(scope.includes('net/minecraft/world/entity/Entity$1'))
+        self.assertFalse(scope.includes('net/minecraft/worldgen/Feature'))
+        self.assertTrue(scope.includes('net/minecraft/client/Minecraft'))
+        self.assertTrue(scope.includes('net/minecraft/client/Minecraft$Inner$1'))
+        self.assertFalse(scope.includes('net/minecraft/client/MinecraftServer'))
+        self.assertTrue(scope.includes_package('net/minecraft/world/entity'))
+        self.assertFalse(scope.includes_package('net/minecraft/client'))
+        self.assertEqual(scope.key(), Scope(['net/minecraft/world/'], ['net.minecraft.client.Minecraft']).key())
+
+        inner = Scope(classes=['net.minecraft.client.Minecraft$Inner'])  # Widened to the outermost class
+        self.assertTrue(inner.includes('net/minecraft/client/Minecraft'))
+        self.assertTrue(inner.includes('net/minecraft/client/Minecraft$1'))
+        self.assertEqual(inner.key(), Scope(classes=['net/minecraft/client/Minecraft']).key())
+
+    def test_tiny(self):
+        text = 'tiny\t2\t0\tofficial\tnamed\nc\ta\tnet/Apple\n\tc\tAn apple\n\tf\tI\tb\tcount\n\tm\t()V\tc\tplant\n\t\tp\t1\t\tseed\nc\tb\tnet/Banana\n\tf\tI\td\tlength\n'
+        parsed = tiny_parser.parse_tiny(text, Scope.of_classes(['b']))
+        self.assertEqual(set(parsed.classes), {'a', 'b'})  # Classes outside the scope are kept by name only
+        self.assertEqual((parsed.classes['a'].mapped, parsed.classes['a'].docs), ('net/Apple', []))
+        self.assertEqual(list(parsed.fields), [('b', 'd', 'I')])
+        self.assertEqual((parsed.methods, parsed.parameters), ({}, {}))
+
+    def test_blackstone(self):
+        blackstone = SyntheticMappings(0.02, 1).blackstone()
+        full = Mappings()
+        parchmentmc.parse_blackstone(blackstone, full, ClassHierarchy())
+
+        scope = Scope(['net/minecraft/world'])
+        scoped, hierarchy = Mappings(), ClassHierarchy()
+        parchmentmc.parse_blackstone(blackstone, scoped, hierarchy, scope)
+
+        self.assertEqual(scoped.class_mappings(), full.class_mappings())
+        self.assertEqual(set(scoped.methods), set(k for k in full.methods if scope.includes(full.classes[k[0]].mapped)))
+        self.assertTrue(0 < len(scoped.fields) < len(full.fields))
+
+    def test_build_inner_class(self):
+        inputs = SyntheticMappings(0.01, 1)
+        with tempfile.TemporaryDirectory() as cache_path:
+            for name, data in ((mapping_downloader.PARCHMENT_BLACKSTONE_CACHE % 'syn', inputs.blackstone()), (mapping_downloader.PARCHMENT_CACHE % ('syn', '2023.01.01'), inputs.parchment())):
+                with open(os.path.join(cache_path, name), 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+
+            session = Session(log=lambda message: None, cache_path=cache_path)
+            options = BuildOptions(mc_version='syn', parchment_version='2023.01.01', version='test', offline=True, use_build_cache=False)
+            full = session.build(options, keep_merged=True).merged
+
+            inner = next(name for name in full.classes if '$' in name and not name.rsplit('$', 1)[1].isnumeric())  # Merged mappings are named by mojmap
+            root = inner.split('$')[0]
+            scoped = session.build(options, only_classes=[inner.replace('/', '.')], keep_merged=True).merged
+
+            family = set(name for name in full.classes if name == root or name.startswith(root + '$'))
+            self.assertEqual(set(scoped.classes), family)
+            for name in family:
+                self.assertEqual(sorted((k, p.mapped) for k, p in scoped.parameters.items() if k[0] == name), sorted((k, p.mapped) for k, p in full.parameters.items() if k[0] == name))
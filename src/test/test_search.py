@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+from parsing import tiny_parser
+from util import search
+from util.search import SearchIndex
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        obf_to_moj = tiny_parser.parse_tiny('tiny\t2\t0\tofficial\tnamed\nc\ta\tnet/minecraft/world/item/ItemStack\n\tf\tI\tb\tcount\n\tm\t()V\tc\tgetItem\nc\tb\tnet/minecraft/world/entity/Entity\n\tm\t(I)V\td\ttickEntity\n\t\tp\t1\t\tdelta\n')
+        yarn = tiny_parser.parse_tiny('tiny\t2\t0\tintermediary\tnamed\nc\tclass_1799\tnet/minecraft/item/ItemStack\n\tm\t()V\tmethod_7909\tgetItemInstance\n')
+        self.index = SearchIndex()
+        self.index.add(obf_to_moj, 'mojmap', 'obf')
+        self.index.add(yarn, 'yarn')
+
+    def test_prefix(self):
+        results = self.index.prefix('itemst')
+        self.assertEqual([(e.kind, e.namespace, e.name) for e in results], [('class', 'mojmap', 'net/minecraft/world/item/ItemStack'), ('class', 'yarn', 'net/minecraft/item/ItemStack')])
+        self.assertEqual(results[0].mapping, 'a')
+        self.assertEqual([e.mapping for e in self.index.prefix('a')], ['net/minecraft/world/item/ItemStack'])
+        self.assertEqual([e.name for e in self.index.prefix('getItem')], ['getItem', 'getItemInstance'])
+
+    def test_substring(self):
+        self.assertEqual([e.name for e in self.index.substring('Item')], ['getItem', 'net/minecraft/world/item/ItemStack', 'net/minecraft/item/ItemStack', 'getItemInstance'])
+        self.assertEqual([(e.kind, e.owner) for e in self.index.substring('elt')], [('parameter', 'b.d #1')])
+        self.assertEqual(self.index.substring('xyz'), [])
+
+    def test_fuzzy(self):
+        self.assertEqual(self.index.fuzzy('tickEnitty', 1)[0].name, 'tickEntity')
+        self.assertEqual([e.name for e in self.index.search('getItm', 2)], ['getItem', 'getItemInstance'])
+
+    def test_updates(self):
+        self.assertEqual(self.index.prefix('count')[0].desc, 'I')
+        self.index.add_entry(search.Entry(search.FIELD, 'yarn', 'counter', owner='net/minecraft/item/ItemStack', desc='I'))
+        self.assertEqual([e.name for e in self.index.prefix('count')], ['count', 'counter'])
+        self.assertEqual(len(self.index), 14)
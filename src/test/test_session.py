@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import threading
+
+from unittest import TestCase
+
+from session import BuildOptions, Session
+from util import mapping_downloader
+from util.synthetic import SyntheticMappings
+
+
+class SessionTests(TestCase):
+
+    def test_build(self):
+        inputs = SyntheticMappings(0.01, 1)
+        with tempfile.TemporaryDirectory() as cache_path:
+            for name, data in ((mapping_downloader.PARCHMENT_BLACKSTONE_CACHE % 'syn', inputs.blackstone()), (mapping_downloader.PARCHMENT_CACHE % ('syn', '2023.01.01'), inputs.parchment())):
+                with open(os.path.join(cache_path, name), 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+
+            messages = []
+            session = Session(log=messages.append, cache_path=cache_path)
+            options = BuildOptions(mc_version='syn', parchment_version='2023.01.01', version='test', offline=True)
+            result = session.build(options)
+
+            self.assertEqual(result.output, os.path.join(cache_path, 'parchment-syn-test-checked.zip'))
+            self.assertTrue(os.path.isfile(result.output))
+            self.assertTrue(result.changed)
+            self.assertFalse(result.cached)
+            self.assertEqual(len(result.merged.classes), len(session.providers.entries[('blackstone', 'syn')][0].classes))
+            self.assertIn('Creating merged mappings', messages)
+            self.assertEqual(session.loaded(), [('blackstone', 'syn'), ('parchment', 'syn', '2023.01.01')])
+
+            result = session.build(options, keep_merged=False)
+            self.assertTrue(result.cached)
+            self.assertIsNone(result.merged)
+            self.assertFalse(result.changed)
+
+            session.build(options, force=True)
+            self.assertEqual((session.providers.hits, session.providers.misses), (4, 0))  # Loaded providers are put directly into the cache
+            self.assertNotEqual(mapping_downloader.CACHE_PATH, cache_path)
+
+            self.assertEqual(session.evict('parchment'), 1)
+            self.assertEqual(session.loaded(), [('blackstone', 'syn')])
+            self.assertRaises(ValueError, BuildOptions, mc_verison='1.20.1')
+
+    def test_concurrent_sessions(self):
+        # Each session builds with its own cache path, which is never shared through a global, so sessions on different threads do not see each other's inputs
+        inputs = SyntheticMappings(0.01, 1)
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            results, errors = {}, []
+            threads = []
+            for cache_path, parchment_version in ((first, '2023.01.01'), (second, '2023.02.02')):
+                for name, data in ((mapping_downloader.PARCHMENT_BLACKSTONE_CACHE % 'syn', inputs.blackstone()), (mapping_downloader.PARCHMENT_CACHE % ('syn', parchment_version), inputs.parchment())):
+                    with open(os.path.join(cache_path, name), 'w', encoding='utf-8') as f:
+                        json.dump(data, f)
+
+                def run(session: Session, options: BuildOptions):
+                    try:
+                        results[session.cache_path] = session.build(options, keep_merged=False)
+                    except Exception as e:
+                        errors.append(e)
+
+                options = BuildOptions(mc_version='syn', parchment_version=parchment_version, version='test', offline=True, parallel=True, use_build_cache=False)
+                threads.append(threading.Thread(target=run, args=(Session(cache_path=cache_path), options)))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            for cache_path in (first, second):
+                self.assertEqual(results[cache_path].output, os.path.join(cache_path, 'parchment-syn-test-checked.zip'))
+                self.assertTrue(os.path.isfile(results[cache_path].output))
@@ -0,0 +1,66 @@
+import io
+
+from unittest import TestCase
+
+import mappificator
+
+from providers import parchmentmc
+from util import shards
+from util.hierarchy import ClassHierarchy
+from util.json_stream import JsonStreamWriter
+from util.mappings import Mappings
+from util.synthetic import SyntheticMappings
+
+
+class ShardsTests(TestCase):
+
+    def test_plan_keeps_families_together(self):
+        m = Mappings()
+        for obf, moj in (('a', 'p/Foo'), ('b', 'p/Foo$Inner'), ('c', 'p/Foo$1'), ('d', 'p/Bar'), ('e', 'p/FooBar'), ('f', 'q/Baz')):
+            m.add_class(obf).mapped = moj
+
+        self.assertEqual(shards.plan_shards(m, 0), [['d'], ['a', 'c', 'b'], ['e'], ['f']])
+        self.assertEqual(shards.plan_shards(m, 10 ** 9), [['d', 'a', 'c', 'b', 'e', 'f']])
+
+    def test_extract(self):
+        m = Mappings()
+        a, b = m.add_class('p/A'), m.add_class('p/B')
+        m.add_package('p')
+        m.add_field(a, 'x', 'I')
+        m.add_parameters_from_method(a, m.add_method(a, 'f', '(IJ)V'), True)
+        m.add_method(b, 'g', '()V')
+
+        e = m.extract(['p/A', 'p/C'])
+        self.assertEqual(str(e), 'Mappings {Packages=1, Classes=1, Fields=1, Methods=1, Parameters=2}')
+        self.assertIs(e.classes['p/A'], a)
+        self.assertEqual(str(m), 'Mappings {Packages=1, Classes=2, Fields=1, Methods=2, Parameters=2}')
+
+        m.extract(['p/A'], remove=True)
+        self.assertEqual(str(m), 'Mappings {Packages=1, Classes=1, Fields=0, Methods=1, Parameters=0}')
+
+    def test_sharded_merge_is_identical(self):
+        inputs = SyntheticMappings(0.02, 1)
+
+        def load():
+            obf_to_moj = Mappings()
+            parchmentmc.parse_blackstone(inputs.blackstone(), obf_to_moj, ClassHierarchy())
+            parchment = Mappings()
+            parchmentmc.parse_parchment(inputs.parchment(), parchment)
+            return obf_to_moj, parchment
+
+        def export(classes) -> str:
+            f = io.StringIO()
+            parchmentmc.write_parchment_json((), classes, JsonStreamWriter(f))
+            return f.getvalue()
+
+        obf_to_moj, parchment = load()
+        merged = obf_to_moj.remap()
+        mappificator.create_merged_mappings(merged, parchment)
+        expected = export(c for _, c in sorted(merged.classes.items()))
+
+        obf_to_moj, parchment = load()
+        budget = sum(shards.estimate_size(c, 1) for c in obf_to_moj.classes.values()) // 5
+        self.assertGreater(len(shards.plan_shards(obf_to_moj, budget, 1)), 3)
+        actual = export(mappificator.create_merged_mappings_in_shards(obf_to_moj, (parchment,), budget, True, lambda _: None))
+        self.assertEqual(expected, actual)
+        self.assertEqual(len(obf_to_moj.classes), 0)
@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from providers import parchmentmc
+from util import snapshot
+from util.hierarchy import ClassHierarchy
+from util.mappings import Mappings
+from util.synthetic import SyntheticMappings
+
+
+class SnapshotTests(TestCase):
+
+    def setUp(self):
+        self.mappings, self.hierarchy = Mappings(), ClassHierarchy()
+        parchmentmc.parse_blackstone(SyntheticMappings(0.05, 1).blackstone(), self.mappings, self.hierarchy)
+
+    def test_round_trip(self):
+        mappings, hierarchy = snapshot.decode(snapshot.encode(self.mappings, self.hierarchy))
+        self.assertEqual(mappings.fingerprints(), self.mappings.fingerprints())
+        self.assertEqual(list(mappings.classes), list(self.mappings.classes))  # In the same order
+        for key, method in self.mappings.methods.items():
+            decoded = mappings.methods[key]
+            self.assertEqual((decoded.is_lambda, decoded.is_static), (method.is_lambda, method.is_static))
+            self.assertEqual([getattr(p, 'desc', None) for p in decoded.parameters.values()], [getattr(p, 'desc', None) for p in method.parameters.values()])
+
+        self.assertEqual(hierarchy.names, self.hierarchy.names)
+        self.assertEqual(hierarchy.parents, self.hierarchy.parents)
+        for class_id, name, desc in self.hierarchy.direct_overrides:
+            key = self.hierarchy.names[class_id], name, desc
+            self.assertEqual(hierarchy.overridden_owners(key), self.hierarchy.overridden_owners(key))
+
+    def test_without_hierarchy(self):
+        mappings = Mappings()
+        apple = mappings.add_class('net/Apple')
+        apple.docs.append('An apple')
+        mappings.add_package('net').docs.append('Fruit')
+        decoded, hierarchy = snapshot.decode(snapshot.encode(mappings))
+        self.assertIsNone(hierarchy)
+        self.assertEqual((decoded.classes['net/Apple'].docs, decoded.packages['net'].docs), (['An apple'], ['Fruit']))
+
+    def test_version(self):
+        data = snapshot.encode(Mappings())
+        data[4] += 1
+        self.assertRaisesRegex(ValueError, 'different version', snapshot.decode, bytes(data))
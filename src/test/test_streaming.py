@@ -0,0 +1,89 @@
+import io
+import zipfile
+
+from typing import Iterator, List
+from unittest import TestCase
+
+from parsing import tiny_parser
+from util import streaming
+from util.parser import ParserError
+
+
+class Unseekable(io.RawIOBase):
+    """ Forces zipfile to write data descriptors, as jar tools do """
+
+    def __init__(self, f: io.BytesIO):
+        self.f = f
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        return self.f.write(b)
+
+
+def create_zip(entries: List[tuple], seekable: bool = True) -> bytes:
+    f = io.BytesIO()
+    with zipfile.ZipFile(f if seekable else Unseekable(f), 'w') as z:
+        for name, data, method in entries:
+            z.writestr(zipfile.ZipInfo(name), data, method)
+    return f.getvalue()
+
+
+def chunked(data, size: int) -> Iterator:
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class StreamingTests(TestCase):
+
+    def test_zip_entry(self):
+        text = ('{"classes": [%s]}' % ', '.join('"Class%d"' % i for i in range(5000))).encode('utf-8')
+        for seekable in (True, False):
+            for method in (zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED):
+                if method == zipfile.ZIP_STORED and not seekable:
+                    continue  # Not supported, and not written by any provider
+                data = create_zip([('META-INF/MANIFEST.MF', b'Manifest-Version: 1.0\r\n', zipfile.ZIP_DEFLATED), ('merged.json', text, method)], seekable)
+                for size in (1, 7, 4096):
+                    self.assertEqual(b''.join(streaming.iter_zip_entry(chunked(data, size), 'merged.json')), text)
+
+    def test_zip_entry_errors(self):
+        data = create_zip([('merged.json', b'{}', zipfile.ZIP_DEFLATED)])
+        with self.assertRaises(ValueError):
+            list(streaming.iter_zip_entry(chunked(data, 5), 'parchment.json'))
+
+        corrupt = bytearray(data)
+        corrupt[14] ^= 0xFF  # The CRC in the local header
+        with self.assertRaises(ValueError):
+            list(streaming.iter_zip_entry(chunked(bytes(corrupt), 5), 'merged.json'))
+
+    def test_text(self):
+        data = 'line\r\nwith ünicode\r\n\r\nend'.encode('utf-8')
+        for size in range(1, 8):
+            self.assertEqual(''.join(streaming.iter_text(chunked(data, size))), 'line\nwith ünicode\n\nend')
+
+    def test_background(self):
+        self.assertEqual(list(streaming.iter_background(lambda: chunked(b'abcdef', 2))), [b'ab', b'cd', b'ef'])
+
+        def fail():
+            yield b'ab'
+            raise ValueError('Failed')
+
+        with self.assertRaises(ValueError):
+            list(streaming.iter_background(fail))
+
+    def test_tiny_stream(self):
+        text = 'tiny\t2\t0\tintermediary\tnamed\nc\ta\tnet/Apple\n\tc\tAn apple\n\tm\t(I)V\tb\tplant\n\t\tp\t1\t\tseed\n\t\t\tc\tThe seed\n\tf\tI\tc\tcount'
+        expected = tiny_parser.parse_tiny(text)
+        for size in (1, 3, 10, 1000):
+            parsed = tiny_parser.parse_tiny_stream(chunked(text, size))
+            self.assertEqual(parsed.fingerprints(), expected.fingerprints())
+        self.assertEqual(expected.classes['a'].docs, ['An apple'])
+        self.assertEqual(expected.methods[('a', 'b', '(I)V')].parameters[1].docs, ['The seed'])
+
+    def test_tiny_stream_error_line(self):
+        text = 'tiny\t2\t0\tintermediary\tnamed\nc\ta\tnet/Apple\n\tm\t(I)V\tb\tplant\n\t\t\tc\tThe seed\n'
+        for size in (1, 10, 1000):
+            with self.assertRaises(ParserError) as e:
+                tiny_parser.parse_tiny_stream(chunked(text, size))
+            self.assertEqual((e.exception.parser_error_message, e.exception.target_line_no), ('Expected parameter before parameter comment', 4))  # Counted from the start of the whole input, not the chunk
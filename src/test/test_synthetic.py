@@ -0,0 +1,34 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+from unittest import TestCase
+
+from util.synthetic import SyntheticMappings
+
+SRC_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def digest(inputs: SyntheticMappings) -> str:
+    return hashlib.sha256(json.dumps([inputs.blackstone(), inputs.parchment(), inputs.intermediary(), inputs.yarn(), inputs.crane()], sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class SyntheticTests(TestCase):
+
+    def test_deterministic(self):
+        expected = digest(SyntheticMappings(0.01, 1))
+        self.assertEqual(digest(SyntheticMappings(0.01, 1)), expected)
+        self.assertNotEqual(digest(SyntheticMappings(0.01, 2)), expected)
+        self.assertNotEqual(digest(SyntheticMappings(0.02, 1)), expected)
+
+        # Independent of string hashing, which differs between processes
+        script = 'import sys; sys.path.insert(0, "test"); from test_synthetic import digest, SyntheticMappings; print(digest(SyntheticMappings(0.01, 1)))'
+        for hash_seed in ('1', '2'):
+            output = subprocess.run([sys.executable, '-c', script], cwd=SRC_PATH, env=dict(os.environ, PYTHONHASHSEED=hash_seed), capture_output=True, text=True, check=True)
+            self.assertEqual(output.stdout.strip(), expected)
+
+    def test_scale(self):
+        self.assertEqual(len(SyntheticMappings(0.01, 1).all_classes()), len(SyntheticMappings(0.01, 2).all_classes()))
+        self.assertLess(len(SyntheticMappings(0.01, 1).all_classes()), len(SyntheticMappings(0.02, 1).all_classes()))
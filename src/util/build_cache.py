@@ -0,0 +1,230 @@
+# A cache of build outputs, keyed by everything that affects them: the content of every input file, the options which affect the output, and the source of mappificator itself
+# A build with the same key as a previous build can restore its outputs, instead of loading and merging anything.
+# Parsed providers are cached in the same way, as snapshots, keyed by the content of their input file.
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+from util import mapping_downloader, snapshot
+from util.remote_cache import RemoteCache, record_key
+
+BUILD_CACHE = 'build-cache'  # Relative to the cache path
+PARSED_CACHE = 'parsed-cache'
+ENTRY_FILE = 'entry.json'
+SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # The src/ directory
+
+
+class BuildCache:
+    """
+    Each entry is a directory named by its key, containing the output files of a build, and an entry.json describing them.
+    Entries are written to a temporary directory first, so a partially written entry is never visible.
+    If there is a remote cache, entries missing locally are looked up in it (and copied locally), and stored entries are uploaded to it.
+    """
+
+    path: str
+    remote: Optional[RemoteCache]
+
+    def __init__(self, path: Optional[str] = None, remote: Optional[RemoteCache] = None):
+        self.path = path if path is not None else os.path.join(mapping_downloader.cache_path(), BUILD_CACHE)
+        self.remote = remote
+
+    def key(self, inputs: Dict[str, str], options: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """ Computes the key for a build, from the (absolute) paths of its input files, and its options. Returns the key, and the manifest it was computed from """
+        manifest = {
+            'stamp': source_stamp(),
+            'inputs': dict((name, hash_file(path)) for name, path in sorted(inputs.items())),
+            'options': options
+        }
+        return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest(), manifest
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry_path = os.path.join(self.path, key, ENTRY_FILE)
+        if not os.path.isfile(entry_path):
+            return self.lookup_remote(key)
+        with open(entry_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def lookup_remote(self, key: str) -> Optional[Dict[str, Any]]:
+        """ Copies an entry from the remote cache, if there is one, and it has the entry """
+        if self.remote is None:
+            return None
+        entry = self.remote.get_record(record_key('build', key))
+        if entry is None:
+            return None
+
+        temp_path = os.path.join(self.path, key + '.tmp')
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        for stored in entry['files'].values():
+            if not self.remote.get_file(stored['sha256'], os.path.join(temp_path, stored['name'])):
+                shutil.rmtree(temp_path, ignore_errors=True)
+                return None
+        with open(os.path.join(temp_path, ENTRY_FILE), 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2)
+
+        entry_path = os.path.join(self.path, key)
+        shutil.rmtree(entry_path, ignore_errors=True)
+        os.replace(temp_path, entry_path)
+        return entry
+
+    def store(self, key: str, manifest: Dict[str, Any], files: Dict[str, str]):
+        """ Stores the output files of a build (by role, i.e. 'output' -> path), replacing any existing entry with the same key """
+        temp_path = os.path.join(self.path, key + '.tmp')
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+
+        stored = {}
+        for role, file_path in files.items():
+            name = os.path.basename(file_path)
+            shutil.copyfile(file_path, os.path.join(temp_path, name))
+            stored[role] = {'name': name, 'sha256': mapping_downloader.sha256_file(file_path)}
+
+        entry = {'key': key, 'created': time.time(), 'manifest': manifest, 'files': stored}
+        with open(os.path.join(temp_path, ENTRY_FILE), 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2)
+
+        entry_path = os.path.join(self.path, key)
+        shutil.rmtree(entry_path, ignore_errors=True)
+        os.replace(temp_path, entry_path)
+
+        if self.remote is not None and not self.remote.read_only:
+            # Files are uploaded before the entry, so an entry in the remote cache always has its files
+            for item in stored.values():
+                self.remote.put_file(os.path.join(entry_path, item['name']), item['sha256'])
+            self.remote.put_record(record_key('build', key), entry)
+
+    def restore(self, key: str, entry: Dict[str, Any], files: Dict[str, str]) -> Dict[str, bool]:
+        """ Copies the stored files of an entry to the given paths (by role). Files which are already identical are left untouched. Returns if each file changed. """
+        changed = {}
+        for role, file_path in files.items():
+            stored = entry['files'][role]
+            if os.path.isfile(file_path) and mapping_downloader.sha256_file(file_path) == stored['sha256']:
+                changed[role] = False
+                continue
+            os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+            shutil.copyfile(os.path.join(self.path, key, stored['name']), file_path + '.tmp')
+            os.replace(file_path + '.tmp', file_path)
+            changed[role] = True
+        return changed
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """ All entries, most recently created first, including their size on disk """
+        entries = []
+        if os.path.isdir(self.path):
+            for key in os.listdir(self.path):
+                entry = self.lookup(key)
+                if entry is not None:
+                    entry['size'] = sum(os.path.getsize(os.path.join(self.path, key, name)) for name in os.listdir(os.path.join(self.path, key)))
+                    entries.append(entry)
+        return sorted(entries, key=lambda e: -e['created'])
+
+    def clean(self, stale_only: bool = False) -> int:
+        """ Removes all entries, or only those created by a different version of mappificator. Returns the number removed. """
+        removed = 0
+        if os.path.isdir(self.path):
+            stamp = source_stamp()
+            for key in os.listdir(self.path):
+                entry = None if key.endswith('.tmp') else self.lookup(key)
+                if stale_only and entry is not None and entry['manifest']['stamp'] == stamp:
+                    continue
+                shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
+                removed += entry is not None
+        return removed
+
+
+class ParsedCache:
+    """
+    Parsed providers, as snapshots (see util.snapshot), which are faster to load than parsing the provider's input file again.
+    Each is keyed by the provider, the content of its input file, and the source of mappificator. Like the build cache, a local miss falls back to the remote cache, if there is one.
+    """
+
+    path: str
+    remote: Optional[RemoteCache]
+
+    def __init__(self, path: Optional[str] = None, remote: Optional[RemoteCache] = None):
+        self.path = path if path is not None else os.path.join(mapping_downloader.cache_path(), PARSED_CACHE)
+        self.remote = remote
+
+    def read(self, name: str, source: mapping_downloader.Source, read: Callable[[], Any]) -> Any:
+        """
+        Reads a provider, which is either a Mappings, or a Mappings and ClassHierarchy, via the cache.
+        If the input file is not downloaded yet, it is read (and streamed) as usual, and cached afterwards.
+        """
+        if mapping_downloader.is_cached(source[0]):
+            key = self.key(name, source)
+            cached = self.load(key)
+            if cached is not None:
+                return cached
+        value = read()
+        self.store(self.key(name, source), value)
+        return value
+
+    def clean(self) -> int:
+        """ Removes all snapshots, and returns the number removed. Unlike build outputs, these are cheap to recreate. """
+        removed = 0
+        if os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                os.remove(os.path.join(self.path, name))
+                removed += name.endswith('.snapshot')
+        return removed
+
+    def key(self, name: str, source: mapping_downloader.Source) -> str:
+        return record_key('parsed', source_stamp(), name, hash_file(os.path.join(mapping_downloader.cache_path(), source[0])))
+
+    def load(self, key: str) -> Any:
+        path = os.path.join(self.path, key + '.snapshot')
+        if not os.path.isfile(path):
+            record = self.remote.get_record(record_key('parsed', key)) if self.remote is not None else None
+            if record is None or not self.remote.get_file(record['files']['snapshot']['sha256'], path):
+                return None
+
+        with open(path, 'rb') as f:
+            mappings, hierarchy = snapshot.decode(f.read())
+        return (mappings, hierarchy) if hierarchy is not None else mappings
+
+    def store(self, key: str, value: Any):
+        mappings, hierarchy = value if isinstance(value, tuple) else (value, None)
+        path = os.path.join(self.path, key + '.snapshot')
+        os.makedirs(self.path, exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(snapshot.encode(mappings, hierarchy))
+        os.replace(path + '.tmp', path)
+
+        if self.remote is not None and not self.remote.read_only:
+            digest = self.remote.put_file(path)
+            self.remote.put_record(record_key('parsed', key), {'files': {'snapshot': {'name': key + '.snapshot', 'sha256': digest}}})
+
+
+def source_stamp() -> str:
+    """ A hash of the source of mappificator (excluding tests), so changes to the code invalidate cached outputs """
+    global _source_stamp
+    if _source_stamp is None:
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(SOURCE_ROOT):
+            dirs[:] = sorted(d for d in dirs if d not in ('test', '__pycache__'))
+            for file in sorted(files):
+                if file.endswith('.py'):
+                    path = os.path.join(root, file)
+                    digest.update(os.path.relpath(path, SOURCE_ROOT).replace(os.sep, '/').encode('utf-8') + b'\0')
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+        _source_stamp = digest.hexdigest()
+    return _source_stamp
+
+
+def hash_file(path: str) -> str:
+    """ Hashes a file, reusing the previous hash if the file has not been modified since (i.e. between builds in the same process) """
+    stat = os.stat(path)
+    key = path, stat.st_size, stat.st_mtime_ns
+    if key not in _file_hashes:
+        _file_hashes[key] = mapping_downloader.sha256_file(path)
+    return _file_hashes[key]
+
+
+_source_stamp: Optional[str] = None
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
@@ -0,0 +1,94 @@
+# Offline bundles of cached files
+# A bundle is a single .tar.xz file containing any number of files from the cache, and a manifest of their sha256 hashes.
+# Importing a bundle on another machine pre-seeds its cache, so builds can run with no network access (see --offline)
+
+import fnmatch
+import hashlib
+import io
+import json
+import os
+import tarfile
+import time
+
+from typing import Dict, List, Iterable, Optional
+
+from util import mapping_downloader
+
+MANIFEST = 'bundle.json'
+EXCLUDED_PATTERNS = ('*-checked.*', '*.tmp')  # Parchment exports match the pattern of parchment inputs
+
+
+def cached_inputs(patterns: Optional[Iterable[str]] = None, cache_path: Optional[str] = None) -> List[str]:
+    """
+    Lists files in the cache (relative to it), which match any of the patterns (globs, i.e. 'blackstone-*').
+    By default, matches every downloaded input, but not outputs of mappificator (exports, benchmarks, and the build cache).
+    """
+    cache_path = cache_path if cache_path is not None else mapping_downloader.cache_path()
+    patterns = list(patterns) if patterns else mapping_downloader.INPUT_PATTERNS
+    matches = []
+    for root, _, files in os.walk(cache_path):
+        for file in files:
+            path = os.path.relpath(os.path.join(root, file), cache_path).replace(os.sep, '/')
+            top = path.split('/')[0]  # Directories (i.e. official mappings) are matched by name
+            if any(fnmatch.fnmatchcase(path, pattern) or fnmatch.fnmatchcase(top, pattern) for pattern in patterns) and not any(fnmatch.fnmatchcase(path, pattern) for pattern in EXCLUDED_PATTERNS):
+                matches.append(path)
+    return sorted(matches)
+
+
+def export_bundle(bundle_path: str, files: Iterable[str], cache_path: Optional[str] = None) -> Dict[str, str]:
+    """ Writes the given files (relative to the cache) to a bundle, and returns the manifest of their hashes """
+    cache_path = cache_path if cache_path is not None else mapping_downloader.cache_path()
+    files = sorted(files)
+    manifest = dict((file, mapping_downloader.sha256_file(os.path.join(cache_path, file))) for file in files)
+    manifest_data = json.dumps({'created': time.time(), 'files': manifest}, indent=2).encode('utf-8')
+
+    os.makedirs(os.path.dirname(os.path.abspath(bundle_path)), exist_ok=True)
+    with tarfile.open(bundle_path + '.tmp', 'w:xz') as tar:
+        info = tarfile.TarInfo(MANIFEST)
+        info.size = len(manifest_data)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(manifest_data))
+        for file in files:
+            tar.add(os.path.join(cache_path, file), arcname=file, recursive=False)
+    os.replace(bundle_path + '.tmp', bundle_path)
+    return manifest
+
+
+def import_bundle(bundle_path: str, cache_path: Optional[str] = None) -> List[str]:
+    """
+    Extracts all files in a bundle into the cache, verifying each against the manifest. Returns the files imported.
+    Each file is written to a temporary file first, and only replaces the cached file once verified, so a corrupt bundle never leaves a corrupt cache.
+    """
+    cache_path = cache_path if cache_path is not None else mapping_downloader.cache_path()
+    with tarfile.open(bundle_path, 'r:xz') as tar:
+        manifest_file = tar.extractfile(MANIFEST)
+        if manifest_file is None:
+            raise ValueError('Bundle %s has no manifest' % bundle_path)
+        manifest: Dict[str, str] = json.loads(manifest_file.read().decode('utf-8'))['files']
+
+        imported = []
+        for member in tar:
+            if member.name == MANIFEST:
+                continue
+            if member.name not in manifest:
+                raise ValueError('Bundle %s contains a file not in the manifest: %s' % (bundle_path, member.name))
+            if not member.isfile() or os.path.isabs(member.name) or '..' in member.name.split('/'):
+                raise ValueError('Bundle %s contains an unsafe entry: %s' % (bundle_path, member.name))
+
+            path = os.path.join(cache_path, *member.name.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            digest = hashlib.sha256()
+            with tar.extractfile(member) as source, open(path + '.tmp', 'wb') as f:
+                for chunk in iter(lambda: source.read(1 << 20), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+            if digest.hexdigest() != manifest[member.name]:
+                os.remove(path + '.tmp')
+                raise ValueError('Bundle %s is corrupt: %s does not match its checksum' % (bundle_path, member.name))
+            os.replace(path + '.tmp', path)
+            imported.append(member.name)
+
+    missing = set(manifest) - set(imported)
+    if missing:
+        raise ValueError('Bundle %s is missing files: %s' % (bundle_path, ', '.join(sorted(missing))))
+    return imported
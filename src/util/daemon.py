@@ -0,0 +1,124 @@
+# A warm build server, and a thin client for it
+# The server keeps loaded providers in memory between builds, so a repeated build only pays for the merge and export
+# The protocol is newline delimited JSON over a localhost TCP socket (which, unlike a unix socket, also works on Windows):
+# - The client sends a single request: {"command": "build", "argv": [...]}, {"command": "status"} or {"command": "stop"}
+# - The server responds with any number of {"log": "..."} messages, followed by a single {"result": ...} or {"error": "..."}
+# Any local user can connect to the port, so each request must include a token, which the server writes to a file only readable by the user who started it.
+
+import hmac
+import os
+import secrets
+import socket
+import socketserver
+
+from typing import Callable, Any, Dict, List, Optional
+
+from util import json_backend
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 25650
+
+Handler = Callable[[List[str], Callable[[str], None]], Any]  # (argv, log) -> result
+StatusHandler = Callable[[], Any]
+
+
+class DaemonError(Exception):
+    pass
+
+
+def serve(handle_build: Handler, handle_status: StatusHandler, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, log: Callable[[str], None] = print, token_file: Optional[str] = None):
+    """
+    Runs the server until a stop request is received. Requests are handled one at a time, as builds share (and modify) the server state.
+    The token, and the port the server is listening on (as the port may be 0, to use any free port), are written to the token file, which is removed once the server stops.
+    """
+    token = secrets.token_hex(32)
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def send(message: Dict[str, Any]):
+                self.wfile.write(json_backend.dumps(message).encode('utf-8') + b'\n')
+                self.wfile.flush()
+
+            try:
+                request = json_backend.loads(self.rfile.readline().decode('utf-8'))
+                if not hmac.compare_digest(str(request.get('token', '')), token):
+                    send({'error': 'Unauthorized, the token does not match the one in %s' % token_file})
+                    return
+                command = request.get('command')
+                if command == 'build':
+                    log('Build: %s' % ' '.join(request['argv']))
+                    send({'result': handle_build(request['argv'], lambda message: send({'log': message}))})
+                elif command == 'status':
+                    send({'result': handle_status()})
+                elif command == 'stop':
+                    log('Stopping')
+                    send({'result': 'stopped'})
+                    self.server.stopped = True
+                else:
+                    send({'error': 'Unknown command: %s' % repr(command)})
+            except (SystemExit, Exception) as e:  # argparse exits on invalid arguments, which should not stop the server
+                send({'error': '%s: %s' % (type(e).__name__, e)})
+
+    class Server(socketserver.TCPServer):
+        allow_reuse_address = True
+        stopped = False
+
+    if token_file is None:
+        token_file = default_token_file(port)
+    with Server((host, port), RequestHandler) as server:
+        write_token_file(token_file, server.server_address[1], token)
+        log('Listening on %s:%d' % (host, server.server_address[1]))
+        try:
+            while not server.stopped:
+                server.handle_request()
+        finally:
+            os.remove(token_file)
+
+
+def request(message: Dict[str, Any], host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, log: Callable[[str], None] = print, token_file: Optional[str] = None) -> Any:
+    """ Sends a request to a running server, forwarding any log messages, and returns the result. The server is found through its token file, which records the port it is listening on (so a server started on port 0 can be reached). """
+    if token_file is None:
+        token_file = default_token_file(port)
+    server = read_token_file(token_file)
+    port = server['port']
+    message = dict(message, token=server['token'])
+    try:
+        connection = socket.create_connection((host, port))
+    except OSError as e:
+        raise DaemonError('Unable to connect to daemon at %s:%d, is it running?' % (host, port)) from e
+
+    with connection, connection.makefile('rwb') as stream:
+        stream.write(json_backend.dumps(message).encode('utf-8') + b'\n')
+        stream.flush()
+        for line in stream:
+            response = json_backend.loads(line.decode('utf-8'))
+            if 'log' in response:
+                log(response['log'])
+            elif 'error' in response:
+                raise DaemonError(response['error'])
+            else:
+                return response['result']
+    raise DaemonError('Daemon closed the connection without a response')
+
+
+def default_token_file(port: int) -> str:
+    """ The token file of a server on the given port, in the home directory of the current user """
+    return os.path.join(os.path.expanduser('~'), '.mappificator', 'daemon-%d.json' % port)
+
+
+def write_token_file(path: str, port: int, token: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    handle = os.open(path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)  # Created with the permissions already restricted, so the token is never readable by others
+    with os.fdopen(handle, 'w', encoding='utf-8') as f:
+        f.write(json_backend.dumps({'port': port, 'token': token}))
+    os.replace(path + '.tmp', path)
+
+
+def read_token_file(path: str) -> Dict[str, Any]:
+    """ The port and token of a running server """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json_backend.loads(f.read())
+    except OSError as e:
+        raise DaemonError('Unable to read the daemon token from %s, is it running?' % path) from e
@@ -0,0 +1,141 @@
+# Structural diffs between two mappings, i.e. two parchment versions, or exports for two Minecraft versions
+# Used to review what a version bump changes: which entries were added or removed, which were renamed, and which had their docs changed.
+
+import io
+import zipfile
+
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Any
+
+from parsing import tiny_parser
+from providers import parchmentmc
+from util import json_backend
+from util.json_stream import JsonStreamWriter
+from util.mappings import Mappings
+
+ADDED, REMOVED, RENAMED, DOCS_CHANGED = 'added', 'removed', 'renamed', 'docs changed'
+CATEGORIES = (ADDED, REMOVED, RENAMED, DOCS_CHANGED)
+SYMBOLS = {ADDED: '+', REMOVED: '-', RENAMED: '~', DOCS_CHANGED: '*'}
+
+
+class Change:
+    """ A single change to an entry. For renames, old and new are the mapped names (either of which may be None), and for docs, the docs as text """
+
+    category: str
+    kind: str  # package, class, field, method or parameter
+    key: str  # The entry, in the source namespace, i.e. 'net/minecraft/world/item/ItemStack.is(Lnet/minecraft/world/item/Item;)Z #1'
+    old: Optional[str]
+    new: Optional[str]
+
+    def __init__(self, category: str, kind: str, key: str, old: Optional[str] = None, new: Optional[str] = None):
+        self.category = category
+        self.kind = kind
+        self.key = key
+        self.old = old
+        self.new = new
+
+    def __str__(self):
+        if self.category == RENAMED:
+            return '%s %s %s: %s -> %s' % (SYMBOLS[self.category], self.kind, self.key, self.old, self.new)
+        return '%s %s %s' % (SYMBOLS[self.category], self.kind, self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, Change) and self.to_json() == other.to_json()
+
+    def __repr__(self):
+        return 'Change(%r)' % self.to_json()
+
+    def to_json(self) -> Dict[str, Any]:
+        return {'category': self.category, 'kind': self.kind, 'key': self.key, 'old': self.old, 'new': self.new}
+
+
+def diff(old: Mappings, new: Mappings) -> Iterator[Change]:
+    """
+    Yields the changes from one mappings to another, one class at a time. Entries are joined by their key in the source namespace (i.e. mojmap for parchment), so this takes linear time, besides sorting the names of classes.
+    Changes within an added or removed class (or method) are not yielded, besides the class (or method) itself.
+    """
+    for name in sorted(old.packages.keys() | new.packages.keys()):
+        old_package, new_package = old.packages.get(name), new.packages.get(name)
+        yield from diff_entry('package', name, old_package, new_package)
+
+    for name in sorted(old.classes.keys() | new.classes.keys()):
+        old_class, new_class = old.classes.get(name), new.classes.get(name)
+        yield from diff_entry('class', name, old_class, new_class)
+        if old_class is None or new_class is None:
+            continue
+
+        for key in sorted(old_class.fields.keys() | new_class.fields.keys()):
+            yield from diff_entry('field', '%s.%s:%s' % (name, *key), old_class.fields.get(key), new_class.fields.get(key))
+
+        for key in sorted(old_class.methods.keys() | new_class.methods.keys()):
+            method_key = '%s.%s%s' % (name, *key)
+            old_method, new_method = old_class.methods.get(key), new_class.methods.get(key)
+            yield from diff_entry('method', method_key, old_method, new_method)
+            if old_method is not None and new_method is not None:
+                for index in sorted(old_method.parameters.keys() | new_method.parameters.keys()):
+                    yield from diff_entry('parameter', '%s #%d' % (method_key, index), old_method.parameters.get(index), new_method.parameters.get(index))
+
+
+def diff_entry(kind: str, key: str, old: Any, new: Any) -> List[Change]:
+    if old is None:
+        return [Change(ADDED, kind, key, None, getattr(new, 'mapped', None))]
+    if new is None:
+        return [Change(REMOVED, kind, key, getattr(old, 'mapped', None), None)]
+    changes = []
+    if getattr(old, 'mapped', None) != getattr(new, 'mapped', None):
+        changes.append(Change(RENAMED, kind, key, old.mapped, new.mapped))
+    if old.docs != new.docs:
+        changes.append(Change(DOCS_CHANGED, kind, key, '\n'.join(old.docs), '\n'.join(new.docs)))
+    return changes
+
+
+def write_text(changes: Iterable[Change], f: TextIO) -> Dict[str, int]:
+    """ Writes changes as a line each, followed by a summary. Returns the number of changes in each category. """
+    counts = dict((category, 0) for category in CATEGORIES)
+    for change in changes:
+        counts[change.category] += 1
+        f.write(str(change) + '\n')
+    f.write(summary(counts) + '\n')
+    return counts
+
+
+def write_json(changes: Iterable[Change], f: TextIO) -> Dict[str, int]:
+    """ Writes changes as a JSON object, with a list of changes, and the number in each category. This is written incrementally, so the changes are never all held in memory. """
+    counts = dict((category, 0) for category in CATEGORIES)
+    writer = JsonStreamWriter(f)
+    writer.begin_object()
+    writer.key('changes')
+    writer.begin_array()
+    for change in changes:
+        counts[change.category] += 1
+        writer.value(change.to_json())
+        writer.flush()
+    writer.end_array()
+    writer.key('summary')
+    writer.value(counts)
+    writer.end_object()
+    writer.flush()
+    f.write('\n')
+    return counts
+
+
+def summary(counts: Dict[str, int]) -> str:
+    return '%d changes (%s)' % (sum(counts.values()), ', '.join('%d %s' % (counts[category], category) for category in CATEGORIES))
+
+
+def read_mappings(path: str) -> Mappings:
+    """ Reads mappings to diff, from a parchment JSON file (i.e. an export, or a parchment release), a zip containing one, or a tiny v2 file """
+    if path.endswith('.tiny'):
+        with open(path, encoding='utf-8') as f:
+            return tiny_parser.parse_tiny(f.read())
+
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path) as z:
+            with z.open('parchment.json') as f:
+                text = io.TextIOWrapper(f, encoding='utf-8').read()
+    else:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+
+    mappings = Mappings()
+    parchmentmc.parse_parchment(json_backend.loads(text), mappings)
+    return mappings
@@ -0,0 +1,158 @@
+# Docs (javadoc lines) of a mappings entry, held as a small rope
+# Merging and composing mappings copies docs from several sources into each entry, often with separators. Rather than copying every line each time, a Docs holds lines it owns, and references (views) to the docs of other entries, which are only flattened when exported.
+# Owned lines may also be moved into a DocsStore, a file outside of memory, and are then only read back when they are iterated (i.e. when exported).
+
+import mmap
+import sys
+import tempfile
+import threading
+
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+View = Tuple['Docs', int]  # The first n lines of another docs
+STORED_SIZE = 112  # The approximate size of a stored part in memory (the object, and its offset and length), below which lines are not worth storing
+
+
+class DocsStore:
+    """
+    An append-only file of docs text, which is memory mapped to read it back. The file is temporary, and is removed once the store is closed, or no longer referenced.
+    Reads and appends are locked, as stored docs may be read by concurrent stages (i.e. exports).
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.file = tempfile.TemporaryFile(prefix='docs-', dir=directory)
+        self.size = 0
+        self.mapped: Optional[mmap.mmap] = None
+        self.lock = threading.Lock()
+
+    def __str__(self):
+        return 'DocsStore {Size=%d}' % self.size
+
+    def append(self, text: str) -> Tuple[int, int]:
+        """ Appends text to the store, and returns the offset and length of it """
+        data = text.encode('utf-8')
+        with self.lock:
+            offset = self.size
+            self.file.seek(offset)
+            self.file.write(data)
+            self.size += len(data)
+        return offset, len(data)
+
+    def read(self, offset: int, length: int) -> str:
+        if length == 0:
+            return ''
+        with self.lock:
+            if self.mapped is None or offset + length > len(self.mapped):  # Appended since last mapped
+                self.file.flush()
+                if self.mapped is not None:
+                    self.mapped.close()
+                self.mapped = mmap.mmap(self.file.fileno(), self.size, access=mmap.ACCESS_READ)
+            return self.mapped[offset:offset + length].decode('utf-8')
+
+    def close(self):
+        with self.lock:
+            if self.mapped is not None:
+                self.mapped.close()
+                self.mapped = None
+            self.file.close()
+
+
+class StoredLines:
+    """ Consecutive lines of a docs, which are stored in a docs store, joined by newlines """
+
+    __slots__ = ('store', 'offset', 'length')
+
+    def __init__(self, store: DocsStore, lines: List[str]):
+        self.store = store
+        self.offset, self.length = store.append('\n'.join(lines))
+
+    def lines(self) -> List[str]:
+        return self.store.read(self.offset, self.length).split('\n')
+
+
+class Docs:
+    """
+    An append-only sequence of lines. Each part is either a line (owned by this docs), stored lines (owned by this docs, but kept in a docs store), or a view of the first n lines of another docs.
+    As docs are only ever appended to, a view always sees the lines that were present when it was added, even if the other docs is later appended to.
+    Behaves like a list of lines for iteration, length, truthiness and equality (including against lists).
+    """
+
+    parts: List[Union[str, StoredLines, View]]
+    size: int
+
+    def __init__(self, lines: Iterable[str] = ()):
+        self.parts = list(lines)
+        self.size = len(self.parts)
+
+    def append(self, line: str):
+        self.parts.append(line)
+        self.size += 1
+
+    def __iadd__(self, other: Iterable[str]) -> 'Docs':
+        """ Appends another docs by reference (without copying any lines), or any other iterable of lines by value """
+        if isinstance(other, Docs):
+            if other.size == 1 and isinstance(other.parts[0], str):
+                self.parts.append(other.parts[0])  # A view of a single line is larger than the line itself
+            elif other.size:
+                self.parts.append((other, other.size))
+            else:
+                return self
+            self.size += other.size
+        else:
+            lines = list(other)
+            self.parts += lines
+            self.size += len(lines)
+        return self
+
+    def __iter__(self) -> Iterator[str]:
+        for part in self.parts:
+            if isinstance(part, str):
+                yield part
+            elif isinstance(part, StoredLines):
+                yield from part.lines()
+            else:
+                docs, size = part
+                for i, line in enumerate(docs):
+                    if i == size:
+                        break
+                    yield line
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Docs):  # Identical parts are equal without flattening, as views of equal docs are themselves equal
+            return self.size == other.size and (self.parts == other.parts or list(self) == list(other))
+        if isinstance(other, list):
+            return len(self) == len(other) and list(self) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return 'Docs(%r)' % self.flatten()
+
+    def flatten(self) -> List[str]:
+        """ Copies all lines into a list """
+        return list(self)
+
+    def store(self, store: DocsStore):
+        """ Moves each run of consecutive owned lines into a store, if they are large enough to be worth it. Lines containing a newline are kept in memory, as stored lines are joined by newlines. """
+        parts: List[Union[str, StoredLines, View]] = []
+        run: List[str] = []
+        for part in self.parts + [None]:
+            if isinstance(part, str) and '\n' not in part:
+                run.append(part)
+                continue
+            if run:
+                if sum(sys.getsizeof(line) for line in run) > STORED_SIZE:
+                    parts.append(StoredLines(store, run))
+                else:
+                    parts += run
+                run = []
+            if part is not None:
+                parts.append(part)
+        self.parts = parts
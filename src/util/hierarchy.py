@@ -0,0 +1,172 @@
+# A class hierarchy graph, with a precomputed transitive index of method overrides
+# Built from blackstone metadata, and usable by any stage which needs to walk overrides (i.e. filling in inherited mappings, or propagating names)
+
+from typing import Dict, Tuple, List, Set, Optional, Iterable, Mapping, TypeVar
+
+V = TypeVar('V')
+
+MethodKey = Tuple[str, str, str]  # (class, method, descriptor)
+
+
+class ClassHierarchy:
+    """
+    A graph of classes, where each class is interned to an integer id, with adjacency sets for both parents (supertypes) and children (subtypes).
+    Methods which override other methods are indexed by (class, name, descriptor), and map to the full, transitive set of overridden owners.
+
+    The override index is built lazily, on first query after any modification, and orders owners from the nearest (most derived) to the furthest.
+    Once built, queries like 'the nearest overridden method present in a given mapping set' only need to probe the (typically very small) list of owners.
+    """
+
+    names: List[str]
+    ids: Dict[str, int]
+    parents: List[Set[int]]
+    children: List[Set[int]]
+    direct_overrides: Dict[Tuple[int, str, str], Set[int]]
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self.parents = []
+        self.children = []
+        self.direct_overrides = {}
+
+        self._overrides: Optional[Dict[Tuple[int, str, str], Tuple[int, ...]]] = None
+        self._ancestors: Optional[List[Optional[Set[int]]]] = None
+
+    def __str__(self):
+        return 'ClassHierarchy {Classes=%d, Overrides=%d}' % (len(self.names), len(self.direct_overrides))
+
+    def __contains__(self, key: MethodKey) -> bool:
+        clazz, name, desc = key
+        return clazz in self.ids and (self.ids[clazz], name, desc) in self.direct_overrides
+
+    def intern(self, name: str) -> int:
+        """ Returns the id of the given class, adding it to the graph if not present """
+        if name in self.ids:
+            return self.ids[name]
+
+        class_id = len(self.names)
+        self.names.append(name)
+        self.ids[name] = class_id
+        self.parents.append(set())
+        self.children.append(set())
+        return class_id
+
+    def add_parent(self, clazz: str, parent: str):
+        """ Records that the parent class is a supertype of the class """
+        class_id, parent_id = self.intern(clazz), self.intern(parent)
+        if class_id != parent_id and parent_id not in self.parents[class_id]:
+            self.parents[class_id].add(parent_id)
+            self.children[parent_id].add(class_id)
+            self.invalidate()
+
+    def add_override(self, clazz: str, name: str, desc: str, owners: Iterable[str]):
+        """
+        Records that the method (clazz, name, desc) overrides the method of the same name and descriptor in each of the owners.
+        As any overridden owner must be a supertype, this also records each owner as a parent of the class.
+        """
+        class_id = self.intern(clazz)
+        overridden = self.direct_overrides.setdefault((class_id, name, desc), set())
+        for owner in owners:
+            owner_id = self.intern(owner)
+            if owner_id != class_id:
+                overridden.add(owner_id)
+                self.add_parent(clazz, owner)
+        self.invalidate()
+
+    def invalidate(self):
+        self._overrides = None
+        self._ancestors = None
+
+    # Queries
+
+    def ancestors(self, clazz: str) -> Set[str]:
+        """ All transitive supertypes of a class """
+        if clazz not in self.ids:
+            return set()
+        return set(self.names[i] for i in self._ancestor_ids(self.ids[clazz]))
+
+    def descendants(self, clazz: str) -> Set[str]:
+        """ All transitive subtypes of a class """
+        if clazz not in self.ids:
+            return set()
+        seen: Set[int] = set()
+        queue = [self.ids[clazz]]
+        while queue:
+            for child_id in self.children[queue.pop()]:
+                if child_id not in seen:
+                    seen.add(child_id)
+                    queue.append(child_id)
+        return set(self.names[i] for i in seen)
+
+    def overridden_owners(self, key: MethodKey) -> Tuple[str, ...]:
+        """ All classes declaring a method which the given method overrides, transitively, ordered from nearest to furthest """
+        clazz, name, desc = key
+        if clazz not in self.ids:
+            return ()
+        return tuple(self.names[i] for i in self._override_index().get((self.ids[clazz], name, desc), ()))
+
+    def nearest_override(self, key: MethodKey, methods: Mapping[MethodKey, V]) -> Optional[V]:
+        """
+        Finds the nearest method overridden by the given method, which is present in the provided methods (i.e. Mappings.methods).
+        Returns None if no overridden method is present.
+        """
+        clazz, name, desc = key
+        if clazz not in self.ids:
+            return None
+        for owner_id in self._override_index().get((self.ids[clazz], name, desc), ()):
+            owner_key = self.names[owner_id], name, desc
+            if owner_key in methods:
+                return methods[owner_key]
+        return None
+
+    # Index construction
+
+    def _ancestor_ids(self, class_id: int) -> Set[int]:
+        if self._ancestors is None:
+            self._ancestors = [None] * len(self.names)
+
+        # Iterative post-order traversal, so deep hierarchies don't exceed the recursion limit
+        # Classes which are still being visited are skipped, so a (malformed) cyclic hierarchy will still terminate
+        visiting: Set[int] = set()
+        stack = [(class_id, False)]
+        while stack:
+            top, expanded = stack.pop()
+            if self._ancestors[top] is not None:
+                continue
+            if not expanded:
+                visiting.add(top)
+                stack.append((top, True))
+                stack += ((p, False) for p in self.parents[top] if self._ancestors[p] is None and p not in visiting)
+            else:
+                ancestors = set(self.parents[top])
+                for parent_id in self.parents[top]:
+                    ancestors.update(self._ancestors[parent_id] or ())
+                self._ancestors[top] = ancestors
+                visiting.discard(top)
+        return self._ancestors[class_id]
+
+    def _override_index(self) -> Dict[Tuple[int, str, str], Tuple[int, ...]]:
+        if self._overrides is not None:
+            return self._overrides
+
+        index = {}
+        for key, direct in self.direct_overrides.items():
+            _, name, desc = key
+
+            # Overrides of overrides are also overrides
+            owners: Set[int] = set()
+            queue = list(direct)
+            while queue:
+                owner_id = queue.pop()
+                if owner_id not in owners:
+                    owners.add(owner_id)
+                    queue += self.direct_overrides.get((owner_id, name, desc), ())
+            owners.discard(key[0])
+
+            # Nearest first: a class is always nearer than any of its own ancestors, so sorting by the number of ancestors (descending) is a valid order
+            # This holds even when the parent edges are transitive shortcuts, as is the case when they are inferred from overrides
+            index[key] = tuple(sorted(owners, key=lambda i: (-len(self._ancestor_ids(i)), self.names[i])))
+
+        self._overrides = index
+        return index
@@ -0,0 +1,99 @@
+# Pluggable JSON decoding and encoding
+# Uses the fastest JSON library which is installed (orjson, then ujson), falling back to the standard library json module.
+
+import contextlib
+import contextvars
+import importlib
+import json
+import os
+
+from typing import Any, Callable, Iterator, List, Optional, Union
+
+BACKEND_ENV = 'MAPPIFICATOR_JSON_BACKEND'  # The default backend, if none is selected
+BACKENDS = ('orjson', 'ujson', 'json')  # In order of preference
+
+
+class Backend:
+    """
+    A JSON library. Decoding is equivalent between backends, however encoded output may differ in whitespace and escaping, so anything which must be reproducible (i.e. exports) should not depend on it.
+    """
+
+    name: str
+    loads: Callable[[Union[str, bytes]], Any]
+    dumps: Callable[[Any], str]
+
+    def __init__(self, name: str, loads: Callable[[Union[str, bytes]], Any], dumps: Callable[[Any], str]):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __str__(self):
+        return 'json backend %s' % self.name
+
+
+def create_backend(name: str) -> Optional[Backend]:
+    """ Creates a backend by name, or returns None if its library is not installed """
+    if name not in BACKENDS:
+        raise ValueError('Unknown json backend: %s' % name)
+    if name == 'json':
+        return Backend('json', json.loads, json.dumps)
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        return None
+    if name == 'orjson':
+        return Backend('orjson', module.loads, lambda value: module.dumps(value).decode('utf-8'))
+    return Backend('ujson', module.loads, module.dumps)
+
+
+def available() -> List[str]:
+    return [name for name in BACKENDS if create_backend(name) is not None]
+
+
+def resolve(name: Optional[str] = None) -> Backend:
+    """ A backend by name. If the name is None or 'auto', the fastest installed backend """
+    if name is None or name == 'auto':
+        return next(backend for backend in map(create_backend, BACKENDS) if backend is not None)
+    backend = create_backend(name)
+    if backend is None:
+        raise ValueError('Json backend %s is not installed' % name)
+    return backend
+
+
+def select(name: Optional[str] = None) -> Backend:
+    """ Selects the backend used by loads() and dumps() in this process, wherever none is bound (see using()) """
+    global _backend
+    _backend = resolve(name)
+    return _backend
+
+
+@contextlib.contextmanager
+def using(name: Optional[str] = None) -> Iterator[Backend]:
+    """ Binds a backend to the current context, until exited. Unlike select(), this only affects the current thread (and any it copies its context to). """
+    token = _bound.set(resolve(name))
+    try:
+        yield _bound.get()
+    finally:
+        _bound.reset(token)
+
+
+def current() -> Backend:
+    """ The bound backend, or the selected backend, or if none has been selected, the one named by the environment (or the fastest installed) """
+    bound = _bound.get()
+    if bound is not None:
+        return bound
+    if _backend is None:
+        select(os.environ.get(BACKEND_ENV))
+    return _backend
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    return current().loads(data)
+
+
+def dumps(value: Any) -> str:
+    return current().dumps(value)
+
+
+_backend: Optional[Backend] = None
+_bound: contextvars.ContextVar = contextvars.ContextVar('json_backend', default=None)
@@ -0,0 +1,118 @@
+# An incremental JSON writer, which produces output identical to json.dumps(), without first building the entire document in memory
+# Optionally tees a pretty-printed copy (identical to json.dumps(indent=2)) at the same time, so the document only needs to be walked and encoded once
+
+import json
+
+from typing import Any, List, Optional, TextIO
+
+encode_string = json.encoder.encode_basestring_ascii  # The (C accelerated) string encoder used by json.dumps() with ensure_ascii=True
+
+
+class JsonStreamWriter:
+    """
+    Writes a JSON document via a sequence of calls, i.e. begin_object(), key('name'), value('foo'), end_object()
+    Output is buffered, and written to the underlying stream(s) on flush(), which should be called periodically (i.e. once per top level entry)
+    """
+
+    INDENT = '  '
+
+    compact: TextIO
+    pretty: Optional[TextIO]
+
+    def __init__(self, compact: TextIO, pretty: Optional[TextIO] = None):
+        self.compact = compact
+        self.pretty = pretty
+        self.compact_buffer: List[str] = []
+        self.pretty_buffer: List[str] = []
+        self.counts: List[int] = []  # The number of entries in each open container
+        self.after_key = False
+
+    def begin_object(self):
+        self._begin('{')
+
+    def end_object(self):
+        self._end('}')
+
+    def begin_array(self):
+        self._begin('[')
+
+    def end_array(self):
+        self._end(']')
+
+    def key(self, key: str):
+        self._separator()
+        self._append(encode_string(key) + ': ')
+        self.after_key = True
+
+    def value(self, value: Any):
+        """ Writes a single value. Strings, numbers, booleans and None are encoded directly, anything else is encoded by json.dumps() """
+        self._before_value()
+        if isinstance(value, str):
+            self._append(encode_string(value))
+        elif value is None or isinstance(value, (bool, int, float)):
+            self._append(json.dumps(value))
+        else:
+            self.compact_buffer.append(json.dumps(value))
+            if self.pretty is not None:
+                self.pretty_buffer.append(json.dumps(value, indent=2).replace('\n', '\n' + self.INDENT * len(self.counts)))
+
+    def field(self, key: str, value: Any):
+        """ Writes a key and value, if the value is not None """
+        if value is not None:
+            self.key(key)
+            self.value(value)
+
+    def string_array(self, values: List[str]):
+        """ Writes an array of strings. This is equivalent to, but faster than, writing each value individually """
+        self._before_value()
+        if not values:
+            self._append('[]')
+            return
+        encoded = [encode_string(v) for v in values]
+        self.compact_buffer.append('[' + ', '.join(encoded) + ']')
+        if self.pretty is not None:
+            indent = '\n' + self.INDENT * (len(self.counts) + 1)
+            self.pretty_buffer.append('[' + indent + (',' + indent).join(encoded) + '\n' + self.INDENT * len(self.counts) + ']')
+
+    def flush(self):
+        self.compact.write(''.join(self.compact_buffer))
+        self.compact_buffer.clear()
+        if self.pretty is not None:
+            self.pretty.write(''.join(self.pretty_buffer))
+            self.pretty_buffer.clear()
+
+    def _begin(self, token: str):
+        self._before_value()
+        self._append(token)
+        self.counts.append(0)
+
+    def _end(self, token: str):
+        count = self.counts.pop()
+        self.compact_buffer.append(token)
+        if self.pretty is not None:
+            if count > 0:
+                self.pretty_buffer.append('\n' + self.INDENT * len(self.counts))
+            self.pretty_buffer.append(token)
+
+    def _append(self, encoded: str):
+        self.compact_buffer.append(encoded)
+        if self.pretty is not None:
+            self.pretty_buffer.append(encoded)
+
+    def _before_value(self):
+        if self.after_key:
+            self.after_key = False
+        else:
+            self._separator()
+
+    def _separator(self):
+        # Called before each entry in a container (and before the root value, where there is no container)
+        if not self.counts:
+            return
+        if self.counts[-1] > 0:
+            self.compact_buffer.append(', ')
+            if self.pretty is not None:
+                self.pretty_buffer.append(',')
+        if self.pretty is not None:
+            self.pretty_buffer.append('\n' + self.INDENT * len(self.counts))
+        self.counts[-1] += 1
@@ -1,14 +1,20 @@
 # Simple one-time downloader for various minecraft mappings providers and files
 # Caches all downloaded files locally
 
+import contextlib
+import contextvars
+import hashlib
 import io
-import json
 import os
 import urllib.error
 import urllib.request
 import zipfile
 
-from typing import Tuple, Optional, Any, Dict, AnyStr
+from functools import partial
+from typing import Tuple, Optional, Any, Dict, AnyStr, Iterator, Callable
+
+from util import json_backend, streaming
+from util.remote_cache import RemoteCache, record_key
 
 FABRIC_YARN_URL = 'https://maven.fabricmc.net/net/fabricmc/yarn/{mc_version}+build.{yarn_version}/yarn-{mc_version}+build.{yarn_version}-v2.jar'
 FABRIC_INTERMEDIARY_URL = 'https://raw.githubusercontent.com/FabricMC/intermediary/master/mappings/{mc_version}.tiny'
@@ -27,74 +33,233 @@ OFFICIAL_VERSION_MANIFEST_CACHE = 'official-manifest-%s.json'
 OFFICIAL_MAPPING_CACHE = 'official-%s'
 CORRECTIONS_CACHE = 'corrections-%s.json'
 
-CACHE_PATH = '../build'
+INPUT_PATTERNS = [pattern.replace('%s', '*') for pattern in (FABRIC_YARN_CACHE, FABRIC_INTERMEDIARY_CACHE, PARCHMENT_BLACKSTONE_CACHE, PARCHMENT_CACHE, CRANE_CACHE, OFFICIAL_MANIFEST_CACHE, OFFICIAL_VERSION_MANIFEST_CACHE, OFFICIAL_MAPPING_CACHE, CORRECTIONS_CACHE)]
 
+# The defaults for this process, used wherever no settings are bound (see using())
+CACHE_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'build'))  # The build/ directory of the project, independent of the working directory
+OFFLINE = False  # If set, downloads fail immediately, so anything not already cached is an error
+REMOTE_CACHE: Optional[RemoteCache] = None  # If set, inputs which are not cached are fetched from the remote cache before their url, and inputs which are downloaded are uploaded to it
 
-def load_yarn(mc_version: str, yarn_version: str) -> str:
-    path = FABRIC_YARN_CACHE % (mc_version, yarn_version)
-    if is_cached(path):
-        return load_text(path)
 
-    data = download(FABRIC_YARN_URL.format(mc_version=mc_version, yarn_version=yarn_version))
-    with io.BytesIO(data) as fio:
-        with zipfile.ZipFile(fio, 'r') as tiny_zip:
-            with tiny_zip.open('mappings/mappings.tiny') as f:
-                mappings = as_text(f.read())
+class Settings:
+    """
+    Where inputs are cached, how they are fetched, and the json backend they are decoded with. A build binds its own settings (see using()), to its thread, so concurrent builds do not share them.
+    Worker processes only inherit the state of this process if they are forked, so stages which run in them are given their settings explicitly (see bind()).
+    """
 
-    save_text(path, mappings)
-    return mappings
+    cache_path: str
+    offline: bool
+    remote_cache: Optional[RemoteCache]
+    json_backend: Optional[str]  # By name (see json_backend.BACKENDS). If None, the default of the process is used
 
+    def __init__(self, cache_path: str, offline: bool = False, remote_cache: Optional[RemoteCache] = None, json_backend: Optional[str] = None):
+        self.cache_path = cache_path
+        self.offline = offline
+        self.remote_cache = remote_cache
+        self.json_backend = json_backend
 
-def load_fabric_intermediary(mc_version: str) -> str:
-    path = FABRIC_INTERMEDIARY_CACHE % mc_version
-    if is_cached(path):
-        return load_text(path)
+    def __str__(self):
+        return 'Settings {Cache Path=%s%s%s%s}' % (self.cache_path, ', Offline' if self.offline else '', ', %s' % self.remote_cache if self.remote_cache is not None else '', ', Json Backend=%s' % self.json_backend if self.json_backend is not None else '')
 
-    mappings = as_text(download(FABRIC_INTERMEDIARY_URL.format(mc_version=mc_version)))
-    save_text(path, mappings)
-    return mappings
 
+_settings: contextvars.ContextVar = contextvars.ContextVar('settings', default=None)
 
-def load_blackstone(mc_version: str) -> Dict[str, Any]:
-    path = PARCHMENT_BLACKSTONE_CACHE % mc_version
-    if is_cached(path):
-        return json.loads(load_text(path))
 
-    data = download(PARCHMENT_BLACKSTONE_URL.format(mc_version=mc_version))
-    mappings, *_ = extract_from_zip(data, 'merged.json')
-    save_text(path, mappings)
-    return json.loads(mappings)
+def current_settings() -> Settings:
+    """ The settings bound to the current context, or the defaults of this process """
+    settings = _settings.get()
+    return settings if settings is not None else Settings(CACHE_PATH, OFFLINE, REMOTE_CACHE)
 
 
-def load_parchment(mc_version: str, parchment_version: str) -> Dict[str, Any]:
-    path = PARCHMENT_CACHE % (mc_version, parchment_version)
-    if is_cached(path):
-        return json.loads(load_text(path))
+def cache_path() -> str:
+    return current_settings().cache_path
 
-    data = download(PARCHMENT_URL.format(mc_version=mc_version, parchment_version=parchment_version))
-    mappings, *_ = extract_from_zip(data, 'parchment.json')
-    save_text(path, mappings)
-    return json.loads(mappings)
+
+@contextlib.contextmanager
+def using(settings: Settings) -> Iterator[None]:
+    """ Binds settings to the current context (and any thread stages it starts, see Pipeline), until exited """
+    token = _settings.set(settings)
+    try:
+        with json_backend.using(settings.json_backend) if settings.json_backend is not None else contextlib.nullcontext():
+            yield
+    finally:
+        _settings.reset(token)
+
+
+def bind(function: Callable[..., Any]) -> Callable[..., Any]:
+    """ Binds a function to the current settings, which are passed with it, so it uses them even when called in another process """
+    return partial(call_with, current_settings(), function)
+
+
+def call_with(settings: Settings, function: Callable[..., Any], *args: Any) -> Any:
+    with using(settings):
+        return function(*args)
+
+
+def load_yarn(mc_version: str, yarn_version: str) -> str:
+    return load_text(fetch_yarn(mc_version, yarn_version))
+
+
+def load_fabric_intermediary(mc_version: str) -> str:
+    return load_text(fetch_fabric_intermediary(mc_version))
+
+
+def load_blackstone(mc_version: str) -> Dict[str, Any]:
+    return json_backend.loads(''.join(stream(blackstone_source(mc_version))))
+
+
+def load_parchment(mc_version: str, parchment_version: str) -> Dict[str, Any]:
+    return json_backend.loads(''.join(stream(parchment_source(mc_version, parchment_version))))
 
 
 def load_crane(mc_version: str, crane_version: str) -> str:
-    path = CRANE_CACHE % (mc_version, crane_version)
-    if is_cached(path):
-        return load_text(path)
+    return load_text(fetch_crane(mc_version, crane_version))
+
+
+# Sources
+# Each input file is described by a source: the path it is cached at (relative to the cache), the url it is downloaded from, and the file to extract from the download, if it is a zip
+
+Source = Tuple[str, str, Optional[str]]
+
+
+def yarn_source(mc_version: str, yarn_version: str) -> Source:
+    return FABRIC_YARN_CACHE % (mc_version, yarn_version), FABRIC_YARN_URL.format(mc_version=mc_version, yarn_version=yarn_version), 'mappings/mappings.tiny'
+
+
+def fabric_intermediary_source(mc_version: str) -> Source:
+    return FABRIC_INTERMEDIARY_CACHE % mc_version, FABRIC_INTERMEDIARY_URL.format(mc_version=mc_version), None
+
+
+def blackstone_source(mc_version: str) -> Source:
+    return PARCHMENT_BLACKSTONE_CACHE % mc_version, PARCHMENT_BLACKSTONE_URL.format(mc_version=mc_version), 'merged.json'
+
+
+def parchment_source(mc_version: str, parchment_version: str) -> Source:
+    return PARCHMENT_CACHE % (mc_version, parchment_version), PARCHMENT_URL.format(mc_version=mc_version, parchment_version=parchment_version), 'parchment.json'
+
+
+def crane_source(mc_version: str, crane_version: str) -> Source:
+    return CRANE_CACHE % (mc_version, crane_version), CRANE_URL.format(mc_version=mc_version, crane_version=crane_version), None
 
-    mappings = as_text(download(CRANE_URL.format(mc_version=mc_version, crane_version=crane_version)))
-    save_text(path, mappings)
-    return mappings
+
+# Fetching
+# Each of these ensures a file is present in the cache, downloading it if necessary, and returns the path (relative to the cache)
+# These are separate from loading, so downloads can be done ahead of, or concurrently with, parsing.
+
+def fetch_yarn(mc_version: str, yarn_version: str) -> str:
+    return fetch(yarn_source(mc_version, yarn_version))
+
+
+def fetch_fabric_intermediary(mc_version: str) -> str:
+    return fetch(fabric_intermediary_source(mc_version))
+
+
+def fetch_blackstone(mc_version: str) -> str:
+    return fetch(blackstone_source(mc_version))
+
+
+def fetch_parchment(mc_version: str, parchment_version: str) -> str:
+    return fetch(parchment_source(mc_version, parchment_version))
+
+
+def fetch_crane(mc_version: str, crane_version: str) -> str:
+    return fetch(crane_source(mc_version, crane_version))
+
+
+def fetch(source: Source) -> str:
+    path, url, zip_entry = source
+    if not is_cached(path) and not fetch_remote(source):
+        data = download(url)
+        save_text(path, extract_from_zip(data, zip_entry)[0] if zip_entry is not None else as_text(data))
+        store_remote(source)
+    return path
+
+
+def fetch_remote(source: Source) -> bool:
+    """ Fetches a source from the remote cache, if there is one, and it has the source. Returns if the source is now cached. """
+    remote = current_settings().remote_cache
+    if remote is None:
+        return False
+    record = remote.get_record(remote_key(source))
+    return record is not None and remote.get_file(record['files']['input']['sha256'], os.path.join(cache_path(), source[0]))
+
+
+def store_remote(source: Source):
+    """ Uploads a (cached) source to the remote cache, if there is one """
+    remote = current_settings().remote_cache
+    if remote is not None and not remote.read_only:
+        digest = remote.put_file(os.path.join(cache_path(), source[0]))
+        remote.put_record(remote_key(source), {'files': {'input': {'name': os.path.basename(source[0]), 'sha256': digest}}})
+
+
+def sync_remote(source: Source):
+    """ Fetches a source from the remote cache, if it is not cached, or uploads it, if the remote cache does not have it (i.e. if it was downloaded, or imported from a bundle, before using the remote cache) """
+    remote = current_settings().remote_cache
+    if remote is not None:
+        if not is_cached(source[0]):
+            fetch_remote(source)
+        elif not remote.read_only and remote.get_record(remote_key(source)) is None:
+            store_remote(source)
+
+
+def remote_key(source: Source) -> str:
+    """ Sources are keyed by their url (and the file extracted from it), as released versions are never changed """
+    _, url, zip_entry = source
+    return record_key('input', url, zip_entry or '')
+
+
+# Streaming
+# Alternatives to fetching and then loading, which yield the text of a file as it is downloaded (and saved to the cache), so it can be parsed concurrently.
+
+def stream_yarn(mc_version: str, yarn_version: str) -> Iterator[str]:
+    return stream(yarn_source(mc_version, yarn_version))
+
+
+def stream_fabric_intermediary(mc_version: str) -> Iterator[str]:
+    return stream(fabric_intermediary_source(mc_version))
+
+
+def stream_crane(mc_version: str, crane_version: str) -> Iterator[str]:
+    return stream(crane_source(mc_version, crane_version))
+
+
+def stream(source: Source) -> Iterator[str]:
+    """
+    Yields the text of a source, in chunks. If it is cached (locally, or in the remote cache), this is the entire text at once.
+    Otherwise, it is downloaded and decompressed on a background thread, and each chunk is yielded as soon as it arrives, and saved to the cache once complete.
+    """
+    path, url, zip_entry = source
+    if is_cached(path) or fetch_remote(source):
+        yield load_text(path)
+        return
+
+    def produce() -> Iterator[bytes]:
+        chunks = stream_download(url)
+        return streaming.iter_zip_entry(chunks, zip_entry) if zip_entry is not None else chunks
+
+    file_path = os.path.join(cache_path(), path)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    try:
+        with open(file_path + '.tmp', 'w', encoding='utf-8') as f:
+            for text in streaming.iter_text(streaming.iter_background(produce)):
+                f.write(text)
+                yield text
+    except BaseException:  # Including if the consumer stops early, as then the file is incomplete
+        if os.path.isfile(file_path + '.tmp'):
+            os.remove(file_path + '.tmp')
+        raise
+    os.replace(file_path + '.tmp', file_path)
+    store_remote(source)
 
 
 def load_official(mc_version: str) -> Tuple[str, str]:
     def load_manifest(use_cache: bool = True) -> Tuple[Dict, bool]:
         if is_cached(OFFICIAL_MANIFEST_CACHE) and use_cache:
-            return json.loads(load_text(OFFICIAL_MANIFEST_CACHE)), True
+            return json_backend.loads(load_text(OFFICIAL_MANIFEST_CACHE)), True
         else:
             manifest = as_text(download(OFFICIAL_MANIFEST_URL))
             save_text(OFFICIAL_MANIFEST_CACHE, manifest)
-            return json.loads(manifest), False
+            return json_backend.loads(manifest), False
 
     def find_game_version_manifest_matching(manifest_json_in: Dict, mc_version_in: str) -> Optional[str]:
         for game_version_json in manifest_json_in['versions']:
@@ -111,7 +276,7 @@ def load_official(mc_version: str) -> Tuple[str, str]:
     version_meta_path = OFFICIAL_VERSION_MANIFEST_CACHE % mc_version
     if is_cached(version_meta_path):
         # Load the version manifest, in order to get the mapping urls
-        version_meta_json = json.loads(load_text(version_meta_path))
+        version_meta_json = json_backend.loads(load_text(version_meta_path))
     else:
         # No version manifest, so load the full manifest
         manifest_json, was_cached = load_manifest()
@@ -132,7 +297,7 @@ def load_official(mc_version: str) -> Tuple[str, str]:
         version_manifest = as_text(download(version_manifest_url))
         save_text(version_meta_path, version_manifest)
 
-        version_meta_json = json.loads(version_manifest)
+        version_meta_json = json_backend.loads(version_manifest)
 
     # Identify urls for mappings
     client_url = version_meta_json['downloads']['client_mappings']['url']
@@ -151,7 +316,7 @@ def load_official(mc_version: str) -> Tuple[str, str]:
 def load_corrections(mc_version: str) -> Dict[str, str]:
     path = CORRECTIONS_CACHE % mc_version
     if is_cached(path):
-        return json.loads(load_text(path))
+        return json_backend.loads(load_text(path))
 
     save_text(path, '{}\n')
     return {}
@@ -161,12 +326,12 @@ def load_corrections(mc_version: str) -> Dict[str, str]:
 # Writing / Reading from files, common cache functionality, etc.
 
 def is_cached(file_path: str) -> bool:
-    path = os.path.join(CACHE_PATH, file_path)
+    path = os.path.join(cache_path(), file_path)
     return os.path.isfile(path) or os.path.isdir(path)
 
 
 def load_text(file_path: str) -> str:
-    path = os.path.join(CACHE_PATH, file_path)
+    path = os.path.join(cache_path(), file_path)
     try:
         with open(path, 'r', encoding='utf-8') as f:
             text = f.read()
@@ -176,13 +341,24 @@ def load_text(file_path: str) -> str:
 
 
 def save_text(file_path: str, text: str):
-    path = os.path.join(CACHE_PATH, file_path)
+    path = os.path.join(cache_path(), file_path)
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, 'w', encoding='utf-8') as f:
         f.write(text)
 
 
+def sha256_file(path: str) -> str:
+    """ Hashes a file by its absolute path (not relative to the cache) """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def download(url: str) -> Any:
+    if current_settings().offline:
+        raise Exception('Cannot download %s in offline mode. Import a bundle containing it first.' % url)
     try:
         with urllib.request.urlopen(url) as request:
             res = request.read()
@@ -191,6 +367,18 @@ def download(url: str) -> Any:
         raise Exception('Requested %s' % url) from e
 
 
+def stream_download(url: str) -> Iterator[bytes]:
+    """ Like download(), but yields the response in chunks as they arrive """
+    if current_settings().offline:
+        raise Exception('Cannot download %s in offline mode. Import a bundle containing it first.' % url)
+    try:
+        with urllib.request.urlopen(url) as request:
+            for chunk in iter(lambda: request.read(streaming.CHUNK_SIZE), b''):
+                yield chunk
+    except urllib.error.HTTPError as e:
+        raise Exception('Requested %s' % url) from e
+
+
 def as_text(raw: AnyStr) -> str:
     if isinstance(raw, bytes):
         raw = raw.decode('utf-8')
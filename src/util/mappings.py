@@ -1,6 +1,12 @@
-from typing import Dict, Tuple, Optional, List, Protocol
+import hashlib
+
+from typing import Dict, Tuple, Optional, Protocol, Iterable, Any, Set
 
 from util import utils
+from util.docs import Docs, DocsStore, StoredLines
+from util.memory import MemoryCounter
+
+FINGERPRINT_SIZE = 16  # In bytes
 
 
 class Mappings:
@@ -26,11 +32,11 @@ class Mappings:
 
     class Package:
         name: str
-        docs: List[str]
+        docs: Docs
 
         def __init__(self, name: str):
             self.name = name
-            self.docs = []
+            self.docs = Docs()
 
         def __str__(self):
             return 'package %s' % self.name
@@ -38,7 +44,7 @@ class Mappings:
     class Class:
         name: str
         mapped: Optional[str]
-        docs: List[str]
+        docs: Docs
         fields: Dict[Tuple[str, str], 'Mappings.Field']
         methods: Dict[Tuple[str, str], 'Mappings.Method']
         record: bool
@@ -46,7 +52,7 @@ class Mappings:
         def __init__(self, name: str):
             self.name = name
             self.mapped = None
-            self.docs = []
+            self.docs = Docs()
             self.fields = {}
             self.methods = {}
             self.record = False
@@ -58,13 +64,13 @@ class Mappings:
         name: str
         desc: str
         mapped: Optional[str]
-        docs: List[str]
+        docs: Docs
 
         def __init__(self, name: str, desc: str):
             self.name = name
             self.desc = desc
             self.mapped = None
-            self.docs = []
+            self.docs = Docs()
 
         def __str__(self):
             return 'field %s %s%s' % (self.name, self.desc, ' -> ' + self.mapped if self.mapped else '')
@@ -73,17 +79,19 @@ class Mappings:
         name: str
         desc: str
         mapped: Optional[str]
-        docs: List[str]
+        docs: Docs
         parameters: Dict[int, 'Mappings.Parameter']
         is_lambda: Optional[bool]
+        is_static: Optional[bool]  # Only known for methods added with their parameters, from a descriptor
 
         def __init__(self, name: str, desc: str):
             self.name = name
             self.desc = desc
             self.mapped = None
-            self.docs = []
+            self.docs = Docs()
             self.parameters = {}
             self.is_lambda = None
+            self.is_static = None
 
         def __str__(self):
             return 'method %s %s%s' % (self.name, self.desc, ' -> ' + self.mapped if self.mapped else '')
@@ -92,12 +100,12 @@ class Mappings:
         index: int
         desc: str
         mapped: Optional[str]
-        docs: List[str]
+        docs: Docs
 
         def __init__(self, index: int):
             self.index = index
             self.mapped = None
-            self.docs = []
+            self.docs = Docs()
 
         def __str__(self):
             return 'param %d%s' % (self.index, ' -> ' + self.mapped if self.mapped else '')
@@ -168,6 +176,7 @@ class Mappings:
         self.require_owned_class_and_method(clazz, method)
 
         _, param_types = utils.split_method_descriptor(method.desc)
+        method.is_static = is_static
         param_index = 0 if is_static else 1
         for param_type in param_types:
             param_key = (clazz.name, method.name, method.desc, param_index)
@@ -182,16 +191,18 @@ class Mappings:
 
     # Mapping Transformations
 
-    def remap(self, invert_namespaces: bool = False) -> 'Mappings':
+    def remap(self, invert_namespaces: bool = False, class_mappings: Optional[Dict[str, str]] = None) -> 'Mappings':
         """
         Creates a new Mappings, representing the mapped source set of this Mappings.
         - Packages are dropped
         - Classes are remapped to the mapped namespace and dropped if not present
         - Methods and fields are remapped (including descriptors) to the mapped namespace
         - Parameters are copied but their mappings are dropped
+        Descriptors are remapped with this mappings' own classes, unless class mappings are given (i.e. when this is only part of a larger mappings)
         """
         mappings = Mappings()
-        class_mappings = dict((k, c.mapped) for k, c in self.classes.items() if c.mapped)
+        if class_mappings is None:
+            class_mappings = self.class_mappings()
         for clazz in self.classes.values():
             if clazz.mapped:
                 mapped_class = mappings.add_class(clazz.mapped)
@@ -237,7 +248,7 @@ class Mappings:
 
         # We need to compute a class map from the default source set -> named
         # This is used to remap descriptors, as they are used to query the other mapping set as keys (and then discarded)
-        class_mappings = dict((k, c.mapped) for k, c in self.classes.items() if c.mapped)
+        class_mappings = self.class_mappings()
 
         for clazz in self.classes.values():
             other_class = utils.or_else(other.classes, clazz.mapped)
@@ -291,6 +302,158 @@ class Mappings:
                 if not mapped_method.mapped:
                     mapped_method.mapped = other_method.name
 
+    def class_mappings(self) -> Dict[str, str]:
+        """ A map of class name -> mapped name, for all mapped classes """
+        return dict((k, c.mapped) for k, c in self.classes.items() if c.mapped)
+
+    def extract(self, class_names: Iterable[str], remove: bool = False) -> 'Mappings':
+        """
+        Creates a new Mappings containing only the given classes (if present), and their fields, methods, parameters and packages.
+        The entries are shared, not copied, so the extracted mappings must not be modified unless this mappings is no longer needed.
+        If remove is true, the classes and their members (but not packages, which may be shared by other classes) are removed from this mappings.
+        """
+        mappings = Mappings()
+        for class_name in class_names:
+            clazz = self.classes.pop(class_name, None) if remove else self.classes.get(class_name)
+            if clazz is None:
+                continue
+            mappings.classes[class_name] = clazz
+            if '/' in class_name:
+                package_name = class_name[:class_name.rindex('/')]
+                package = self.packages.get(package_name)
+                if package is not None:
+                    mappings.packages[package_name] = package
+            for (name, desc), field in clazz.fields.items():
+                key = class_name, name, desc
+                mappings.fields[key] = field
+                if remove:
+                    self.fields.pop(key, None)
+            for (name, desc), method in clazz.methods.items():
+                key = class_name, name, desc
+                mappings.methods[key] = method
+                if remove:
+                    self.methods.pop(key, None)
+                for index, parameter in method.parameters.items():
+                    param_key = class_name, name, desc, index
+                    mappings.parameters[param_key] = parameter
+                    if remove:
+                        self.parameters.pop(param_key, None)
+        return mappings
+
+    def store_docs(self, store: DocsStore):
+        """ Moves the text of all docs into a docs store, so it is only read back when exported """
+        for table in (self.packages, self.classes, self.fields, self.methods, self.parameters):
+            for obj in table.values():
+                obj.docs.store(store)
+
+    # Fingerprints
+
+    def fingerprint(self, class_name: str) -> str:
+        """
+        A content hash of a class, covering its mapped name and docs, and the names, descriptors, mapped names and docs of all its fields, methods and parameters.
+        It does not depend on the order entries were added in, so two mappings with the same content have the same fingerprints.
+        Fingerprints are computed on each call, rather than cached, as entries are modified in place (i.e. their mapped names and docs) throughout a build.
+        """
+        return self._class_fingerprint(class_name).hex()
+
+    def root_fingerprint(self) -> str:
+        """ A hash of the fingerprints of all classes (by name). Two mappings have the same root fingerprint if (and, barring collisions, only if) all their classes are identical. Packages are not included. """
+        return self._root_fingerprint(self._class_fingerprints())
+
+    def fingerprints(self) -> Dict[str, str]:
+        """ The fingerprints of all classes, by name, i.e. to be saved alongside a cached artifact """
+        return dict((name, fingerprint.hex()) for name, fingerprint in self._class_fingerprints().items())
+
+    def changed_classes(self, other: 'Mappings') -> Set[str]:
+        """ The names of all classes which are different (or only present) in either this or the other mappings """
+        fingerprints, other_fingerprints = self._class_fingerprints(), other._class_fingerprints()
+        if self._root_fingerprint(fingerprints) == other._root_fingerprint(other_fingerprints):
+            return set()
+        return set(name for name in fingerprints.keys() | other_fingerprints.keys() if fingerprints.get(name) != other_fingerprints.get(name))
+
+    def _class_fingerprints(self) -> Dict[str, bytes]:
+        return dict((name, self._class_fingerprint(name)) for name in sorted(self.classes))
+
+    @staticmethod
+    def _root_fingerprint(fingerprints: Dict[str, bytes]) -> str:
+        digest = hashlib.blake2b(digest_size=FINGERPRINT_SIZE)
+        for name, fingerprint in fingerprints.items():  # In order of name
+            digest.update(name.encode('utf-8') + b'\0' + fingerprint)
+        return digest.hexdigest()
+
+    def _class_fingerprint(self, class_name: str) -> bytes:
+        clazz = self.classes[class_name]
+        digest = hashlib.blake2b(digest_size=FINGERPRINT_SIZE)
+
+        def update(*values: Any):
+            for value in values:
+                digest.update(b'\1' if value is None else str(value).encode('utf-8'))
+                digest.update(b'\0')
+
+        def update_docs(docs: Iterable[str]):
+            update(*docs)
+            digest.update(b'\2')
+
+        update('class', clazz.mapped, clazz.record)
+        update_docs(clazz.docs)
+        for (name, desc), field in sorted(clazz.fields.items()):
+            update('field', name, desc, field.mapped)
+            update_docs(field.docs)
+        for (name, desc), method in sorted(clazz.methods.items()):
+            update('method', name, desc, method.mapped, method.is_lambda, method.is_static)
+            update_docs(method.docs)
+            for index, param in sorted(method.parameters.items()):
+                update('param', index, param.mapped)
+                update_docs(param.docs)
+
+        return digest.digest()
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Approximates the memory used by this mappings, as the deep size (in bytes) of each table, including their keys, entries and names.
+        Docs are reported as a separate table, and each object is only counted once, in the first table it is found in.
+        Also reports the counts of unique, shared, and duplicate strings (see MemoryCounter), and the number of lines and (utf-8) bytes of docs, and how many of those bytes are in a docs store, rather than in memory.
+        """
+        counter = MemoryCounter()
+        docs = {'size': 0, 'lines': 0, 'bytes': 0, 'stored': 0}
+
+        def text(value: Optional[str]) -> int:
+            return counter.add_string(value) if isinstance(value, str) else 0
+
+        def key(value: Tuple) -> int:
+            return counter.add(value) + sum(text(v) for v in value if isinstance(v, str))
+
+        def entry(obj: Any, *values: Optional[str]) -> int:
+            # Only lines owned by each docs are counted, views of other docs are shared (but still count towards lines and bytes)
+            docs['size'] += counter.add(obj.docs) + counter.add(obj.docs.parts) + sum(text(part) if isinstance(part, str) else counter.add(part) for part in obj.docs.parts)
+            docs['lines'] += len(obj.docs)
+            docs['bytes'] += sum(len(line.encode('utf-8')) for line in obj.docs)
+            docs['stored'] += sum(part.length for part in obj.docs.parts if isinstance(part, StoredLines))
+            return counter.add(obj) + sum(text(v) for v in values)
+
+        tables: Dict[str, int] = {
+            'packages': counter.add(self.packages) + sum(text(k) + entry(p, p.name) for k, p in self.packages.items()),
+            'classes': counter.add(self.classes) + sum(text(k) + entry(c, c.name, c.mapped) + counter.add(c.fields) + counter.add(c.methods) + sum(map(key, c.fields.keys())) + sum(map(key, c.methods.keys())) for k, c in self.classes.items()),
+            'fields': counter.add(self.fields) + sum(key(k) + entry(f, f.name, f.desc, f.mapped) for k, f in self.fields.items()),
+            'methods': counter.add(self.methods) + sum(key(k) + entry(m, m.name, m.desc, m.mapped) + counter.add(m.parameters) for k, m in self.methods.items()),
+            'parameters': counter.add(self.parameters) + sum(key(k) + entry(p, getattr(p, 'desc', None), p.mapped) for k, p in self.parameters.items())
+        }
+        tables['docs'] = docs['size']
+        return {
+            'total': sum(tables.values()),
+            'tables': tables,
+            'counts': {
+                'packages': len(self.packages),
+                'classes': len(self.classes),
+                'fields': len(self.fields),
+                'methods': len(self.methods),
+                'parameters': len(self.parameters),
+                'docs': docs['lines']
+            },
+            'strings': counter.string_report(),
+            'docs': {'lines': docs['lines'], 'bytes': docs['bytes'], 'stored': docs['stored']}
+        }
+
     def require_owned_class(self, clazz: 'Mappings.Class'):
         if clazz.name not in self.classes or self.classes[clazz.name] != clazz:
             raise ValueError('Class %s is not owned by mappings')
@@ -305,4 +468,4 @@ class Mappings:
 
 class Mappable(Protocol):
     mapped: Optional[str]
-    docs: List[str]
+    docs: Docs
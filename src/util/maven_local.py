@@ -0,0 +1,95 @@
+# A minimal, pure python replacement for `mvn install:install-file`
+# Installs an artifact into a local maven repository (by default, the user's maven local), with the same layout as maven would use
+
+import hashlib
+import os
+import shutil
+import time
+import xml.etree.ElementTree as ElementTree
+
+from typing import Optional, List
+
+MAVEN_LOCAL_PATH = os.path.join(os.path.expanduser('~'), '.m2', 'repository')
+
+
+def artifact_path(group: str, artifact: str, version: str, packaging: str, classifier: Optional[str] = None, repository: str = MAVEN_LOCAL_PATH) -> str:
+    """ The path to an artifact in the repository, i.e. <repository>/org/example/artifact/1.0/artifact-1.0-classifier.zip """
+    return os.path.join(version_path(group, artifact, version, repository), artifact_name(artifact, version, packaging, classifier))
+
+
+def artifact_name(artifact: str, version: str, packaging: str, classifier: Optional[str] = None) -> str:
+    return '%s-%s%s.%s' % (artifact, version, '-' + classifier if classifier else '', packaging)
+
+
+def version_path(group: str, artifact: str, version: str, repository: str = MAVEN_LOCAL_PATH) -> str:
+    return os.path.join(repository, *group.split('.'), artifact, version)
+
+
+def install(file_path: str, group: str, artifact: str, version: str, packaging: str, classifier: Optional[str] = None, repository: str = MAVEN_LOCAL_PATH) -> str:
+    """
+    Installs a file as an artifact, equivalent to `mvn install:install-file`:
+    - The file is copied into the version directory, along with .sha1 and .md5 checksums
+    - A minimal pom is generated, if one is not already present
+    - The artifact's maven-metadata-local.xml is updated to include the version
+    Returns the path to the installed artifact.
+    """
+    directory = version_path(group, artifact, version, repository)
+    os.makedirs(directory, exist_ok=True)
+
+    installed_path = os.path.join(directory, artifact_name(artifact, version, packaging, classifier))
+    shutil.copyfile(file_path, installed_path)
+    write_checksums(installed_path)
+
+    pom_path = os.path.join(directory, artifact_name(artifact, version, 'pom'))
+    if not os.path.isfile(pom_path):
+        with open(pom_path, 'w', encoding='utf-8') as f:
+            f.write(POM_TEMPLATE.format(group=group, artifact=artifact, version=version))
+        write_checksums(pom_path)
+
+    update_metadata(os.path.join(repository, *group.split('.'), artifact, 'maven-metadata-local.xml'), group, artifact, version)
+    return installed_path
+
+
+def write_checksums(path: str):
+    with open(path, 'rb') as f:
+        data = f.read()
+    for algorithm in ('sha1', 'md5'):
+        with open(path + '.' + algorithm, 'w', encoding='utf-8') as f:
+            f.write(hashlib.new(algorithm, data).hexdigest())
+
+
+def update_metadata(path: str, group: str, artifact: str, version: str):
+    versions: List[str] = []
+    if os.path.isfile(path):
+        root = ElementTree.parse(path).getroot()
+        versions = [v.text for v in root.iterfind('versioning/versions/version') if v.text]
+    if version not in versions:
+        versions.append(version)
+
+    root = ElementTree.Element('metadata')
+    ElementTree.SubElement(root, 'groupId').text = group
+    ElementTree.SubElement(root, 'artifactId').text = artifact
+    versioning = ElementTree.SubElement(root, 'versioning')
+    ElementTree.SubElement(versioning, 'release').text = version
+    versions_element = ElementTree.SubElement(versioning, 'versions')
+    for v in versions:
+        ElementTree.SubElement(versions_element, 'version').text = v
+    ElementTree.SubElement(versioning, 'lastUpdated').text = time.strftime('%Y%m%d%H%M%S', time.gmtime())
+
+    ElementTree.indent(root, '  ')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        ElementTree.ElementTree(root).write(f, encoding='UTF-8', xml_declaration=True)
+        f.write(b'\n')
+
+
+POM_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<project xsi:schemaLocation="http://maven.apache.org/POM/4.0.0 http://maven.apache.org/xsd/maven-4.0.0.xsd" xmlns="http://maven.apache.org/POM/4.0.0"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <modelVersion>4.0.0</modelVersion>
+  <groupId>{group}</groupId>
+  <artifactId>{artifact}</artifactId>
+  <version>{version}</version>
+  <description>POM was created by mappificator</description>
+</project>
+'''
@@ -0,0 +1,72 @@
+# Approximate memory accounting, used to find which provider (and which part of it) uses the most memory in a build
+
+import sys
+
+from typing import Any, Dict, List, Set
+
+INSTANCE_OVERHEAD = 24  # Since Python 3.11, instance attributes are stored inline, which sys.getsizeof() does not include. This, plus a pointer per attribute, approximates them.
+
+
+class MemoryCounter:
+    """
+    Accumulates the deep size of objects, counting each object only once, no matter how many times it is referenced.
+    Strings are also tracked by identity, to count how many are shared (referenced more than once), and how many are duplicates (equal to, but a separate object from, another string).
+    """
+
+    seen: Set[int]
+    references: Dict[int, int]
+    values: Dict[str, Set[int]]
+    size: int
+
+    def __init__(self):
+        self.seen = set()
+        self.references = {}
+        self.values = {}
+        self.size = 0
+
+    def add(self, obj: Any) -> int:
+        """ Adds the shallow size of an object, if it has not been added already, and returns the size added """
+        key = id(obj)
+        if key in self.seen:
+            return 0
+        self.seen.add(key)
+        size = sys.getsizeof(obj)
+        annotations = getattr(type(obj), '__annotations__', None)
+        if annotations is not None and not isinstance(obj, (dict, list, tuple, str)):
+            size += INSTANCE_OVERHEAD + 8 * len(annotations)
+        self.size += size
+        return size
+
+    def add_string(self, value: str) -> int:
+        key = id(value)
+        self.references[key] = self.references.get(key, 0) + 1
+        self.values.setdefault(value, set()).add(key)
+        return self.add(value)
+
+    def string_report(self) -> Dict[str, int]:
+        duplicates = [(value, len(ids) - 1) for value, ids in self.values.items() if len(ids) > 1]
+        return {
+            'unique': sum(1 for count in self.references.values() if count == 1),
+            'shared': sum(1 for count in self.references.values() if count > 1),
+            'duplicates': sum(count for _, count in duplicates),
+            'duplicate_bytes': sum(sys.getsizeof(value) * count for value, count in duplicates)
+        }
+
+
+def format_report(name: str, report: Dict[str, Any]) -> List[str]:
+    """ Formats a Mappings.memory_report() as lines of text """
+    lines = ['Memory of %s: %s' % (name, format_bytes(report['total']))]
+    for table, size in report['tables'].items():
+        lines.append('  %-12s %10s  %d %s' % (table, format_bytes(size), report['counts'][table], 'lines' if table == 'docs' else 'entries'))
+    strings = report['strings']
+    lines.append('  strings      %d unique, %d shared, %d duplicates (%s)' % (strings['unique'], strings['shared'], strings['duplicates'], format_bytes(strings['duplicate_bytes'])))
+    lines.append('  docs         %d lines, %s of text%s' % (report['docs']['lines'], format_bytes(report['docs']['bytes']), ' (%s stored on disk)' % format_bytes(report['docs']['stored']) if report['docs']['stored'] else ''))
+    return lines
+
+
+def format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return '%d %s' % (size, unit) if unit == 'B' else '%.1f %s' % (size, unit)
+        size /= 1024
+    return '%.1f GB' % size
@@ -15,10 +15,11 @@ class Parser:
     SYMBOLS = set('/-_$()[]<>.,;')
     IDENTIFIER = NUMERIC | ALPHA | SYMBOLS
 
-    def __init__(self, text: str):
+    def __init__(self, text: str, line_offset: int = 0):
         self.text = text
         self.length = len(self.text)
         self.pointer = 0
+        self.line_offset = line_offset  # The number of lines before this text, if it is part of a larger input, for error reporting
 
     def expect(self, expected: str, error: bool = True) -> bool:
         """
@@ -84,6 +85,13 @@ class Parser:
             self.advance(length)
         return seq
 
+    def skip_line(self):
+        """ Skips the rest of the current line, including the newline. This is much faster than accepting it, for skipping large parts of the text. """
+        index = self.text.find('\n', self.pointer)
+        if index == -1:
+            self.error('Expected \'\\n\', got end of input')
+        self.pointer = index + 1
+
     def accept_method_descriptor(self) -> Tuple[str, List[str], str]:
         """ Scans a java method descriptor. Returns the return type, parameter types, and the entire descriptor """
         self.expect('(')
@@ -164,7 +172,7 @@ class ParserError(RuntimeError):
 
         self.parser_error_message = message
         self.target_line = line
-        self.target_line_no = 1 + line_no
+        self.target_line_no = 1 + line_no + parser.line_offset
         self.target_col = p
 
         super(ParserError, self).__init__('\n'.join([
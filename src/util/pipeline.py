@@ -0,0 +1,139 @@
+# A small dependency graph executor for the stages of a build
+# Each stage declares the named values it consumes and produces, and stages run as soon as their inputs are available.
+# Intermediate values are released as soon as their last consumer has finished.
+
+import concurrent.futures
+import contextvars
+
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Dict, Tuple, Optional, Set, List, Iterable
+
+from util.profiler import Profiler
+
+MAIN = 'main'  # Runs on the calling thread. Used for stages which modify shared state, or are not picklable
+THREAD = 'thread'  # Runs on a thread pool, in a copy of the caller's context (see contextvars). Used for I/O bound stages, i.e. downloads
+PROCESS = 'process'  # Runs on a process pool. Used for CPU bound stages, i.e. parsing. The function, inputs and outputs must be picklable, and the function must not depend on the state of this process, as workers may be spawned rather than forked
+
+
+class Stage:
+    name: str
+    function: Callable[..., Any]
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    after: Tuple[str, ...]
+    kind: str
+
+    def __init__(self, name: str, function: Callable[..., Any], inputs: Iterable[str] = (), outputs: Iterable[str] = (), after: Iterable[str] = (), kind: str = MAIN):
+        self.name = name
+        self.function = function
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.after = tuple(after)
+        self.kind = kind
+
+    def __str__(self):
+        return 'stage %s (%s) -> (%s)' % (self.name, ', '.join(self.inputs), ', '.join(self.outputs))
+
+    def requires(self) -> Tuple[str, ...]:
+        return self.inputs + self.after
+
+
+class Pipeline:
+    """
+    A set of stages. Each stage is called with the values of its inputs (in order), and returns the value of its single output, or a tuple of values if it has several.
+    Stages may also depend on values that they don't consume (after), which only affects ordering.
+    """
+
+    stages: List[Stage]
+
+    def __init__(self):
+        self.stages = []
+
+    def add(self, name: str, function: Callable[..., Any], inputs: Iterable[str] = (), outputs: Iterable[str] = (), after: Iterable[str] = (), kind: str = MAIN) -> Stage:
+        stage = Stage(name, function, inputs, outputs, after, kind)
+        self.stages.append(stage)
+        return stage
+
+    def validate(self, initial: Iterable[str]) -> List[Stage]:
+        """ Checks every value is produced exactly once, and returns the stages in a valid (dependency) order """
+        producers: Dict[str, Optional[Stage]] = dict((name, None) for name in initial)
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError('Value %s is produced more than once' % output)
+                producers[output] = stage
+
+        ordered: List[Stage] = []
+        available = set(k for k, v in producers.items() if v is None)
+        remaining = list(self.stages)
+        while remaining:
+            ready = [stage for stage in remaining if all(value in available for value in stage.requires())]
+            if not ready:
+                missing = set(value for stage in remaining for value in stage.requires() if value not in producers)
+                raise ValueError('Missing values: %s' % ', '.join(sorted(missing)) if missing else 'Cycle between stages: %s' % ', '.join(s.name for s in remaining))
+            for stage in ready:
+                ordered.append(stage)
+                available.update(stage.outputs)
+                remaining.remove(stage)
+        return ordered
+
+    def run(self, initial: Optional[Dict[str, Any]] = None, keep: Iterable[str] = (), jobs: int = 1, profiler: Optional[Profiler] = None, mp_context: Optional[BaseContext] = None) -> Dict[str, Any]:
+        """
+        Runs all stages, and returns the values named by keep. All other values are released as soon as they have no remaining consumers.
+        With one job, stages run sequentially on the calling thread, in dependency order, and are each profiled (if a profiler is given)
+        With more than one job, independent stages run concurrently on thread and process pools. Stages are only logged, not profiled, as measurements would overlap.
+        The process pool uses the given multiprocessing context, or the default start method of the platform.
+        """
+        values = dict(initial or {})
+        keep = set(keep)
+        ordered = self.validate(values.keys())
+        consumers: Dict[str, int] = {}
+        for stage in ordered:
+            for value in stage.requires():
+                consumers[value] = consumers.get(value, 0) + 1
+        if profiler is None:
+            profiler = Profiler()
+
+        def complete(stage: Stage, result: Any):
+            if len(stage.outputs) == 1:
+                values[stage.outputs[0]] = result
+            elif stage.outputs:
+                values.update(zip(stage.outputs, result))
+            for value in stage.outputs:
+                if consumers.get(value, 0) == 0 and value not in keep:
+                    values.pop(value, None)  # Nothing consumes this value
+            for value in stage.requires():
+                consumers[value] -= 1
+                if consumers[value] == 0 and value not in keep:
+                    values.pop(value, None)
+
+        if jobs <= 1:
+            for stage in ordered:
+                with profiler.stage(stage.name) as handle:
+                    result = stage.function(*(values[value] for value in stage.inputs))
+                    complete(stage, result)
+                    for value in stage.outputs:
+                        if value in values:
+                            handle.record(value, values[value])
+        else:
+            with concurrent.futures.ThreadPoolExecutor(jobs) as threads, concurrent.futures.ProcessPoolExecutor(jobs, mp_context=mp_context) as processes:
+                pending: Dict[concurrent.futures.Future, Stage] = {}
+                started: Set[Stage] = set()
+                while len(started) < len(ordered) or pending:
+                    for stage in ordered:
+                        if stage not in started and all(value in values for value in stage.requires()):
+                            started.add(stage)
+                            profiler.log(stage.name)
+                            args = [values[value] for value in stage.inputs]
+                            if stage.kind == MAIN:
+                                complete(stage, stage.function(*args))
+                            elif stage.kind == THREAD:
+                                pending[threads.submit(contextvars.copy_context().run, stage.function, *args)] = stage
+                            else:
+                                pending[processes.submit(stage.function, *args)] = stage
+                    if pending:
+                        done, _ = concurrent.futures.wait(pending.keys(), return_when=concurrent.futures.FIRST_COMPLETED)
+                        for future in done:
+                            complete(pending.pop(future), future.result())
+
+        return dict((k, v) for k, v in values.items() if k in keep)
@@ -0,0 +1,125 @@
+# Per-stage profiling of a mappificator run
+# Records wall time, cpu time, peak memory and mapping counts for each stage, and writes them as a JSON report
+
+import contextlib
+import cProfile
+import json
+import os
+import re
+import time
+import tracemalloc
+
+from typing import Dict, List, Any, Optional, Callable, Iterator
+
+from util.mappings import Mappings
+
+
+class Profiler:
+    """
+    Wraps each stage of a run. When disabled, stages are only logged, and nothing is measured.
+    When enabled, each stage records:
+    - Wall time and CPU time (of this process)
+    - Peak traced memory (via tracemalloc), and the change in traced memory over the stage
+    - Counts of each mappings table, for any mappings recorded in the stage
+    Optionally, a cProfile dump (.pstats) is written for each stage.
+
+    Note that tracemalloc has a significant overhead, so profiled runs are slower than normal runs. Tracing is stopped by close(), if this profiler started it, so it does not slow down later runs in the same process (i.e. a daemon, or batch worker).
+    """
+
+    class Stage:
+        name: str
+        counts: Dict[str, Dict[str, int]]
+
+        def __init__(self, name: str):
+            self.name = name
+            self.counts = {}
+
+        def record(self, label: str, mappings: Any):
+            """ Records the size of a mappings produced by this stage. Any other values are ignored """
+            if not isinstance(mappings, Mappings):
+                return
+            self.counts[label] = {
+                'packages': len(mappings.packages),
+                'classes': len(mappings.classes),
+                'fields': len(mappings.fields),
+                'methods': len(mappings.methods),
+                'parameters': len(mappings.parameters)
+            }
+
+    enabled: bool
+    stats_dir: Optional[str]
+    log: Callable[[str], None]
+    stages: List[Dict[str, Any]]
+    started_tracing: bool
+
+    def __init__(self, enabled: bool = False, stats_dir: Optional[str] = None, log: Callable[[str], None] = print):
+        self.enabled = enabled or stats_dir is not None
+        self.stats_dir = stats_dir
+        self.log = log
+        self.stages = []
+        self.started_tracing = False
+
+    def close(self):
+        """ Stops tracing memory, if this profiler started it. Stages may still be reported afterwards. """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator['Profiler.Stage']:
+        self.log(name)
+        stage = Profiler.Stage(name)
+        if not self.enabled:
+            yield stage
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        tracemalloc.reset_peak()
+        start_memory, _ = tracemalloc.get_traced_memory()
+
+        profile = cProfile.Profile() if self.stats_dir is not None else None
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield stage
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+            end_memory, peak_memory = tracemalloc.get_traced_memory()
+
+            self.stages.append({
+                'name': name,
+                'wall_time': wall,
+                'cpu_time': cpu,
+                'peak_memory': peak_memory,
+                'memory_delta': end_memory - start_memory,
+                'counts': stage.counts
+            })
+
+            if profile is not None:
+                os.makedirs(self.stats_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.stats_dir, '%02d-%s.pstats' % (len(self.stages), slug(name))))
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'stages': self.stages,
+            'total': {
+                'wall_time': sum(s['wall_time'] for s in self.stages),
+                'cpu_time': sum(s['cpu_time'] for s in self.stages),
+                'peak_memory': max((s['peak_memory'] for s in self.stages), default=0)
+            }
+        }
+
+    def write_report(self, path: str, **metadata: Any):
+        """ Writes the report as JSON, including any additional metadata (i.e. the versions used) """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({**metadata, **self.report()}, f, indent=2)
+
+
+def slug(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
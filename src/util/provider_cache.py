@@ -0,0 +1,59 @@
+# An in-memory cache of loaded providers, so repeated builds can share them
+
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class ProviderCache:
+    """
+    Memoizes loaded (parsed) providers, keyed by a tuple of the provider name and the versions used to load it, i.e. ('blackstone', '1.20.1')
+    Entries are evicted least recently used first, once there are more than the capacity. A capacity of None never evicts.
+
+    Cached providers are shared between builds, so a build must never modify a cached provider in a way that would affect another build.
+    """
+
+    capacity: Optional[int]
+    entries: 'OrderedDict[Tuple, Any]'
+    hits: int
+    misses: int
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key: Tuple) -> bool:
+        return key in self.entries
+
+    def __str__(self):
+        return 'ProviderCache {Entries=%d, Hits=%d, Misses=%d}' % (len(self.entries), self.hits, self.misses)
+
+    def get(self, key: Tuple, load: Callable[[], T]) -> T:
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        value = load()
+        self.put(key, value)
+        return value
+
+    def put(self, key: Tuple, value: Any):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if self.capacity is not None:
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def evict(self, key: Tuple):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,173 @@
+# A cache shared between machines (i.e. CI nodes), on a plain HTTP server, so each input is only downloaded, and each provider and build only done, once
+# Files are stored by the sha256 of their content, at <url>/cas/<sha256>. Records of what was produced (i.e. a build entry) are stored at <url>/ac/<key>, as JSON, and refer to their files by content hash.
+
+import hashlib
+import http.server
+import json
+import os
+import re
+import tempfile
+import urllib.error
+import urllib.request
+
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 25651
+DEFAULT_TIMEOUT = 30
+
+PATH_PATTERN: re.Pattern = re.compile(r'^/(ac|cas)/([0-9a-f]{64})$')
+
+
+class RemoteCache:
+    """
+    A client for a remote cache. The cache is only an optimization, so any error (besides a missing file) is logged once, and the cache is then unused for the rest of the process, rather than failing the build.
+    Files are verified against their hash when downloaded, and written atomically, so a partial or corrupt download is never used.
+    """
+
+    url: str
+    read_only: bool
+    timeout: float
+    available: bool
+    log: Callable[[str], None]
+
+    def __init__(self, url: str, read_only: bool = False, timeout: float = DEFAULT_TIMEOUT, log: Callable[[str], None] = print):
+        self.url = url.rstrip('/')
+        self.read_only = read_only
+        self.timeout = timeout
+        self.available = True
+        self.log = log
+
+    def __str__(self):
+        return 'RemoteCache {Url=%s%s}' % (self.url, ', Read Only' if self.read_only else '')
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['log'] = print  # The log may be bound to a daemon client, so is not sent to worker processes
+        return state
+
+    def get_record(self, key: str) -> Optional[Dict[str, Any]]:
+        data = self._request('GET', '/ac/' + key)
+        return json.loads(data.decode('utf-8')) if data is not None else None
+
+    def put_record(self, key: str, record: Dict[str, Any]):
+        if not self.read_only:
+            self._request('PUT', '/ac/' + key, json.dumps(record, sort_keys=True).encode('utf-8'))
+
+    def get_file(self, digest: str, path: str) -> bool:
+        """ Downloads a file by its hash, to a path. Returns if it was present and valid. """
+        data = self._request('GET', '/cas/' + digest)
+        if data is None:
+            return False
+        if hashlib.sha256(data).hexdigest() != digest:
+            self.log('Remote cache file %s is corrupt, ignoring it' % digest[:12])
+            return False
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')  # Unique, as the same file may be fetched by several workers at once
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return True
+
+    def put_file(self, path: str, digest: Optional[str] = None) -> str:
+        """ Uploads a file, unless the cache already has it, and returns its hash """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if digest is None:
+            digest = hashlib.sha256(data).hexdigest()
+        if not self.read_only and self._request('HEAD', '/cas/' + digest) is None:
+            self._request('PUT', '/cas/' + digest, data)
+        return digest
+
+    def _request(self, method: str, path: str, data: Optional[bytes] = None) -> Optional[bytes]:
+        """ Returns the body of a response, or None if the file is missing, or the cache is unavailable """
+        if not self.available:
+            return None
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers={'Content-Type': 'application/octet-stream'} if data is not None else {})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            self.log('Remote cache %s %s failed with %d %s, continuing without it' % (method, self.url + path, e.code, e.reason))
+        except OSError as e:  # Including connection errors and timeouts
+            self.log('Remote cache at %s is unavailable (%s), continuing without it' % (self.url, e))
+        self.available = False
+        return None
+
+
+def record_key(*parts: str) -> str:
+    """ The key of a record, from anything which identifies what was produced, i.e. ('input', url) """
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+def serve(directory: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, log: Callable[[str], None] = print):
+    """ Runs a reference cache server, storing files in a directory, until interrupted """
+    with create_server(directory, host, port) as server:
+        log('Serving remote cache from %s on %s:%d' % (directory, *server.server_address[:2]))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def create_server(directory: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> http.server.ThreadingHTTPServer:
+    """
+    Creates a reference cache server, which handles GET, HEAD and PUT of /ac/<key> and /cas/<sha256>, and nothing else. Files sent to /cas/ must match their hash.
+    Use port 0 to pick any free port (i.e. in tests), which is then server.server_address[1].
+    """
+
+    class RequestHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_file(True)
+
+        def do_HEAD(self):
+            self.send_file(False)
+
+        def do_PUT(self):
+            file_path = self.file_path()
+            if file_path is None:
+                return
+            data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path.startswith('/cas/') and hashlib.sha256(data).hexdigest() != os.path.basename(file_path):
+                self.send_error(400, 'Content does not match its hash')
+                return
+            temp_path = '%s.%d.tmp' % (file_path, id(self))  # Concurrent uploads of the same file each write their own temporary file
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, file_path)
+            self.send_response(201)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def send_file(self, body: bool):
+            file_path = self.file_path()
+            if file_path is None:
+                return
+            if not os.path.isfile(file_path):
+                self.send_error(404)
+                return
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            if body:
+                self.wfile.write(data)
+
+        def file_path(self) -> Optional[str]:
+            match = PATH_PATTERN.match(self.path)
+            if match is None:
+                self.send_error(404)
+                return None
+            return os.path.join(directory, match.group(1), match.group(2))
+
+        def log_message(self, *args):
+            pass
+
+    for kind in ('ac', 'cas'):
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+    return http.server.ThreadingHTTPServer((host, port), RequestHandler)
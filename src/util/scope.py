@@ -0,0 +1,54 @@
+# Scoped builds, which only include a selection of packages or classes
+# Scopes are applied while parsing each provider, so entries outside the scope are never created, and the rest of the build only ever sees the selection.
+
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+
+class Scope:
+    """
+    A selection of packages and classes. A class is included if it is selected, is an inner class of a selected class, or is in a selected package (or any of its subpackages).
+    Selecting an inner class selects its outermost class, and so all of its inner classes. Parameters are named for each outermost class at once (to avoid conflicts between them), so a class is only named the same as in a full build alongside the rest of its family.
+    Names may be given with either '.' or '/' as separators, i.e. 'net.minecraft.world.item' or 'net/minecraft/world/item'
+    """
+
+    packages: Tuple[str, ...]
+    classes: FrozenSet[str]
+
+    def __init__(self, packages: Iterable[str] = (), classes: Iterable[str] = ()):
+        self.packages = tuple(sorted(set(p.replace('.', '/').strip('/') for p in packages)))
+        self.classes = frozenset(c.replace('.', '/').split('$')[0] for c in classes)
+
+    def __str__(self):
+        return 'Scope {Packages=%d, Classes=%d}' % (len(self.packages), len(self.classes))
+
+    def includes(self, class_name: str) -> bool:
+        if class_name in self.classes:
+            return True
+        index = class_name.find('$')
+        while index != -1:  # Inner classes of selected classes
+            if class_name[:index] in self.classes:
+                return True
+            index = class_name.find('$', index + 1)
+        return self.includes_package(class_name[:class_name.rfind('/')]) if '/' in class_name and self.packages else False
+
+    def includes_package(self, package: str) -> bool:
+        """ If a package is selected, or is a subpackage of a selected package. Packages which only contain selected classes are not included. """
+        return any(package == p or package.startswith(p + '/') for p in self.packages)
+
+    def key(self) -> Tuple:
+        """ A key for this scope, used to separate scoped providers from unscoped ones when caching them """
+        return 'scope', self.packages, tuple(sorted(self.classes))
+
+    @staticmethod
+    def of_classes(class_names: Iterable[str]) -> 'Scope':
+        """ A scope of exactly the given classes, used to scope providers which are not named by mojmap """
+        scope = Scope()
+        scope.classes = frozenset(class_names)
+        return scope
+
+
+def create_scope(packages: Optional[Iterable[str]], classes: Optional[Iterable[str]]) -> Optional['Scope']:
+    """ The scope of a build, from the --only-packages and --only-classes options, or None if neither is given """
+    if packages is None and classes is None:
+        return None
+    return Scope(packages or (), classes or ())
@@ -0,0 +1,206 @@
+# An index for searching names across any number of mappings (i.e. obfuscated, mojmap, intermediary and yarn names), by prefix, substring, or approximately
+# Used to find what an obfuscated or partial name corresponds to, without scanning every mapping set.
+
+import bisect
+import collections
+import heapq
+import itertools
+
+from typing import Dict, List, Optional, Set, Iterator, Tuple
+
+from util.mappings import Mappings
+
+CLASS, FIELD, METHOD, PARAMETER = 'class', 'field', 'method', 'parameter'
+
+
+class Entry:
+    """ A single name in a namespace. The mapping is the name of the same entry in the other namespace of the mappings it was found in, if it has one """
+
+    kind: str
+    namespace: str
+    name: str
+    mapping: Optional[str]
+    owner: Optional[str]  # The class (for members), or class and method (for parameters), in the source namespace
+    desc: Optional[str]
+
+    def __init__(self, kind: str, namespace: str, name: str, mapping: Optional[str] = None, owner: Optional[str] = None, desc: Optional[str] = None):
+        self.kind = kind
+        self.namespace = namespace
+        self.name = name
+        self.mapping = mapping
+        self.owner = owner
+        self.desc = desc
+
+    def __str__(self):
+        return '%s %s (%s)%s%s%s' % (self.kind, self.name, self.namespace, ' ' + self.desc if self.desc else '', ' in ' + self.owner if self.owner else '', ' <-> ' + self.mapping if self.mapping else '')
+
+
+class SearchIndex:
+    """
+    Names are indexed case-insensitively, and classes are indexed by both their full and simple (i.e. 'ItemStack') names.
+    - Prefix queries use a sorted array of the distinct names, and a binary search.
+    - Substring queries (of at least three characters) intersect the postings of each trigram of the query, and then check each candidate.
+    - Fuzzy queries rank names by the number of trigrams they share with the query, so they match despite typos, or different word orders.
+
+    The sorted names and trigram postings (of names in order of length) are built lazily, on the first query after any names are added.
+    """
+
+    entries: List[Entry]
+    postings: Dict[str, List[int]]  # Lowercase name -> entries
+
+    def __init__(self):
+        self.entries = []
+        self.postings = {}
+
+        self._names: Optional[List[str]] = None
+        self._names_by_length_: Optional[List[str]] = None
+        self._trigrams: Optional[Dict[str, List[int]]] = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        return 'SearchIndex {Entries=%d, Names=%d}' % (len(self.entries), len(self.postings))
+
+    def add(self, mappings: Mappings, namespace: str, source_namespace: Optional[str] = None):
+        """
+        Indexes the mapped names of a mappings, in the given namespace, and its source names as well, if a source namespace is given.
+        Without a source namespace, names which are mapped to themselves (i.e. the classes of parchment, which only adds docs and parameters) are not new names, so are skipped.
+        """
+        def named(entry) -> bool:
+            return entry.mapped and (source_namespace or entry.mapped != entry.name)
+
+        for clazz in mappings.classes.values():
+            if named(clazz):
+                self.add_entry(Entry(CLASS, namespace, clazz.mapped, clazz.name if source_namespace else None))
+            if source_namespace:
+                self.add_entry(Entry(CLASS, source_namespace, clazz.name, clazz.mapped))
+
+            for field in clazz.fields.values():
+                if named(field):
+                    self.add_entry(Entry(FIELD, namespace, field.mapped, field.name if source_namespace else None, clazz.name, field.desc))
+                if source_namespace:
+                    self.add_entry(Entry(FIELD, source_namespace, field.name, field.mapped, clazz.name, field.desc))
+
+            for method in clazz.methods.values():
+                if named(method):
+                    self.add_entry(Entry(METHOD, namespace, method.mapped, method.name if source_namespace else None, clazz.name, method.desc))
+                if source_namespace:
+                    self.add_entry(Entry(METHOD, source_namespace, method.name, method.mapped, clazz.name, method.desc))
+
+                for param in method.parameters.values():
+                    if param.mapped:
+                        self.add_entry(Entry(PARAMETER, namespace, param.mapped, None, '%s.%s #%d' % (clazz.name, method.name, param.index), method.desc))
+
+    def add_entry(self, entry: Entry):
+        index = len(self.entries)
+        self.entries.append(entry)
+        self.postings.setdefault(entry.name.lower(), []).append(index)
+        if entry.kind == CLASS and '/' in entry.name:
+            self.postings.setdefault(entry.name[entry.name.rindex('/') + 1:].lower(), []).append(index)
+        self._names = self._names_by_length_ = self._trigrams = None
+
+    # Queries
+
+    def prefix(self, query: str, limit: int = 20) -> List[Entry]:
+        """ Entries whose name starts with the query, shortest names first """
+        names = self._sorted_names()
+        query = query.lower()
+        if not query:
+            return []
+        matches = []
+        for i in range(bisect.bisect_left(names, query), len(names)):
+            if not names[i].startswith(query):
+                break
+            matches.append(names[i])
+        return self._collect(sorted(matches, key=len), limit)
+
+    def substring(self, query: str, limit: int = 20) -> List[Entry]:
+        """ Entries whose name contains the query, shortest names first. Queries shorter than three characters are matched as prefixes. """
+        query = query.lower()
+        if len(query) < 3:
+            return self.prefix(query, limit)
+
+        # Every match contains every trigram of the query, so only the rarest trigram's postings need to be checked. These are in order of length, so the shortest matches are found first.
+        names, trigrams = self._names_by_length(), self._trigram_index()
+        rarest = min((trigrams.get(trigram, ()) for trigram in split_trigrams(query, False)), key=len)
+        return self._collect((names[i] for i in rarest if query in names[i]), limit)
+
+    def fuzzy(self, query: str, limit: int = 20) -> List[Entry]:
+        """ Entries whose names share the most trigrams with the query, relative to their length """
+        names, trigrams = self._names_by_length(), self._trigram_index()
+        query_trigrams = split_trigrams(query.lower())
+        scores = collections.Counter(itertools.chain.from_iterable(trigrams.get(trigram, ()) for trigram in query_trigrams))
+
+        def similarity(item: Tuple[int, int]) -> float:
+            i, shared = item  # Jaccard similarity, as the number of trigrams in a name is its length + 1, with padding
+            return shared / (len(query_trigrams) + len(names[i]) + 1 - shared)
+
+        ranked = heapq.nlargest(limit, scores.items(), key=similarity)
+        return self._collect((names[i] for i, _ in ranked), limit)
+
+    def search(self, query: str, limit: int = 20) -> List[Entry]:
+        """ Exact and prefix matches first, then substring matches, then fuzzy matches, without duplicates """
+        results: List[Entry] = []
+        seen: Set[int] = set()
+        for method in (self.prefix, self.substring, self.fuzzy):
+            for entry in method(query, limit):
+                if id(entry) not in seen and len(results) < limit:
+                    seen.add(id(entry))
+                    results.append(entry)
+            if len(results) >= limit:
+                break
+        return results
+
+    # Index construction
+
+    def build(self):
+        """ Builds the sorted names and trigram postings ahead of the first query """
+        self._trigram_index()
+
+    def _collect(self, names: Iterator[str], limit: int) -> List[Entry]:
+        """ The entries of each name, in order, up to the limit. Classes are indexed by two names, so may be found twice. """
+        results = []
+        seen: Set[int] = set()
+        for name in names:
+            for i in self.postings[name]:
+                if i not in seen:
+                    seen.add(i)
+                    results.append(self.entries[i])
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    def _sorted_names(self) -> List[str]:
+        if self._names is None:
+            self._names = sorted(self.postings.keys())
+        return self._names
+
+    def _names_by_length(self) -> List[str]:
+        if self._names_by_length_ is None:
+            self._names_by_length_ = sorted(self._sorted_names(), key=len)  # Stable, so names of the same length are still sorted
+        return self._names_by_length_
+
+    def _trigram_index(self) -> Dict[str, List[int]]:
+        if self._trigrams is None:
+            index: Dict[str, List[int]] = {}
+            for i, name in enumerate(self._names_by_length()):
+                for trigram in split_trigrams(name):
+                    index.setdefault(trigram, []).append(i)
+            self._trigrams = index
+        return self._trigrams
+
+
+def split_trigrams(name: str, padded: bool = True) -> Set[str]:
+    """ The distinct trigrams of a name. Names are padded so short names (i.e. obfuscated names), and the start and end of a name have trigrams too, but substrings are not. """
+    if padded:
+        name = '  %s ' % name
+    return set(name[i:i + 3] for i in range(len(name) - 2))
+
+
+def format_results(results: List[Entry]) -> List[Tuple[str, ...]]:
+    """ Rows of a table of results, including a header """
+    rows = [('Kind', 'Namespace', 'Name', 'Mapping', 'Owner', 'Descriptor')]
+    for entry in results:
+        rows.append((entry.kind, entry.namespace, entry.name, entry.mapping or '', entry.owner or '', entry.desc or ''))
+    return rows
@@ -0,0 +1,45 @@
+# Splits a build into shards of root class families, so mappings can be merged and exported one shard at a time, with a bounded amount of memory
+
+from typing import Dict, List
+
+from util.mappings import Mappings
+
+# Approximate memory used by each entry of a merged mappings (including keys, docs and names), in bytes. Measured with tracemalloc on synthetic inputs.
+CLASS_BYTES = 1000
+FIELD_BYTES = 300
+METHOD_BYTES = 600
+PARAMETER_BYTES = 400
+SOURCE_ENTRY_BYTES = 100  # Each source is extracted per shard, which shares entries, but not the tables that index them
+
+
+def estimate_size(clazz: Mappings.Class, source_count: int = 0) -> int:
+    """ Estimates the memory used to merge a (obf -> moj) class, in bytes """
+    parameters = sum(len(method.parameters) for method in clazz.methods.values())
+    entries = 1 + len(clazz.fields) + len(clazz.methods) + parameters
+    return CLASS_BYTES + FIELD_BYTES * len(clazz.fields) + METHOD_BYTES * len(clazz.methods) + PARAMETER_BYTES * parameters + SOURCE_ENTRY_BYTES * source_count * entries
+
+
+def plan_shards(obf_to_moj: Mappings, budget: int, source_count: int = 0) -> List[List[str]]:
+    """
+    Splits the classes of an obf -> moj mappings into shards, each estimated to use at most budget bytes when merged.
+    A root class and all its inner and anonymous classes (by mapped name) are always in the same shard, as parameter names are resolved across them.
+    Shards are returned in order, as lists of obf class names, sorted by mapped name. As no class name contains a character which sorts before '$', the mapped names of each shard form a contiguous range of all sorted mapped names.
+    A family larger than the budget gets a shard of its own.
+    """
+    families: Dict[str, List[Mappings.Class]] = {}
+    for clazz in sorted((c for c in obf_to_moj.classes.values() if c.mapped), key=lambda c: c.mapped):
+        families.setdefault(clazz.mapped.split('$')[0], []).append(clazz)
+
+    shards: List[List[str]] = []
+    shard: List[str] = []
+    shard_size = 0
+    for family in families.values():
+        family_size = sum(estimate_size(clazz, source_count) for clazz in family)
+        if shard and shard_size + family_size > budget:
+            shards.append(shard)
+            shard, shard_size = [], 0
+        shard += [clazz.name for clazz in family]
+        shard_size += family_size
+    if shard:
+        shards.append(shard)
+    return shards
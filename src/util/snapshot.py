@@ -0,0 +1,221 @@
+# Snapshots of parsed providers (mappings, and optionally a class hierarchy), in a flat binary format which is much faster to decode than parsing the provider's input file again
+# Used by the parsed provider cache (see util.build_cache.ParsedCache), which stores one snapshot per provider, locally and in the remote cache.
+
+import struct
+import sys
+
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from util.docs import Docs
+from util.hierarchy import ClassHierarchy
+from util.mappings import Mappings
+
+MAGIC = b'MSNP'
+FORMAT_VERSION = 4
+NONE = 0xFFFFFFFF  # A missing string (i.e. an unmapped name)
+UNKNOWN = 2  # A missing flag (i.e. if it is not known whether a method is a lambda)
+
+# The sections of a snapshot, in order. Besides the string data, each is an array of unsigned 32-bit little endian integers, as snapshots may be shared between machines (via the remote cache).
+# Sections are listed with the number of integers in each record. Entries are stored in order, and the children of each entry (i.e. the fields and methods of a class) follow those of the previous entry, so a snapshot is decoded in a single pass.
+SECTIONS = (
+    ('strings', 0),  # UTF-8 data of all strings
+    ('string_offsets', 1),  # The start of each string, and the end of the last
+    ('doc_lines', 1),  # String ids of the lines of each docs
+    ('packages', 2),  # name, docs count
+    ('classes', 6),  # name, mapped, docs count, record, fields count, methods count
+    ('fields', 4),  # name, desc, mapped, docs count
+    ('methods', 7),  # name, desc, mapped, docs count, is lambda (0, 1, or UNKNOWN), is static (likewise), parameters count
+    ('parameters', 4),  # index, mapped, docs count, desc (only present for parameters added from a method descriptor)
+    ('hierarchy_classes', 2),  # name, parents count. Indexed by class id
+    ('hierarchy_parents', 1),  # Class ids of parents
+    ('overrides', 4),  # class id, name, desc, direct owners count
+    ('override_owners', 1),  # Class ids of direct overridden owners
+)
+RECORD_SIZES = dict(SECTIONS)
+HEADER = struct.Struct('<4sII' + 'Q' * len(SECTIONS))  # Magic, version, has hierarchy, then the size (in bytes) of each section
+
+
+class SnapshotWriter:
+    sections: Dict[str, array]
+    string_ids: Dict[str, int]
+    strings: bytearray
+
+    def __init__(self):
+        self.sections = dict((name, array('I')) for name, _ in SECTIONS[1:])
+        self.string_ids = {}
+        self.strings = bytearray()
+
+    def string(self, value: Optional[str]) -> int:
+        if value is None:
+            return NONE
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = self.string_ids[value] = len(self.string_ids)
+            self.sections['string_offsets'].append(len(self.strings))
+            self.strings += value.encode('utf-8')
+        return string_id
+
+    def docs(self, docs: Docs) -> int:
+        lines = [self.string(line) for line in docs]
+        self.sections['doc_lines'].extend(lines)
+        return len(lines)
+
+    def add_mappings(self, mappings: Mappings):
+        packages, classes, fields, methods, parameters = (self.sections[name] for name in ('packages', 'classes', 'fields', 'methods', 'parameters'))
+        for name, package in mappings.packages.items():
+            packages.extend((self.string(name), self.docs(package.docs)))
+
+        for name, clazz in mappings.classes.items():
+            classes.extend((self.string(name), self.string(clazz.mapped), self.docs(clazz.docs), int(clazz.record), len(clazz.fields), len(clazz.methods)))
+            for (field_name, desc), field in clazz.fields.items():
+                fields.extend((self.string(field_name), self.string(desc), self.string(field.mapped), self.docs(field.docs)))
+            for (method_name, desc), method in clazz.methods.items():
+                methods.extend((self.string(method_name), self.string(desc), self.string(method.mapped), self.docs(method.docs), flag(method.is_lambda), flag(method.is_static), len(method.parameters)))
+                for index, param in method.parameters.items():
+                    parameters.extend((index, self.string(param.mapped), self.docs(param.docs), self.string(getattr(param, 'desc', None))))
+
+    def add_hierarchy(self, hierarchy: ClassHierarchy):
+        classes, parents = self.sections['hierarchy_classes'], self.sections['hierarchy_parents']
+        for class_id, name in enumerate(hierarchy.names):
+            classes.extend((self.string(name), len(hierarchy.parents[class_id])))
+            parents.extend(sorted(hierarchy.parents[class_id]))
+
+        overrides, owners = self.sections['overrides'], self.sections['override_owners']
+        for (class_id, name, desc), owner_ids in hierarchy.direct_overrides.items():
+            overrides.extend((class_id, self.string(name), self.string(desc), len(owner_ids)))
+            owners.extend(sorted(owner_ids))
+
+    def encode(self, has_hierarchy: bool) -> bytearray:
+        self.sections['string_offsets'].append(len(self.strings))
+        data = bytearray(HEADER.size)
+        sizes = []
+        for name, _ in SECTIONS:
+            if name == 'strings':
+                section = self.strings
+            else:
+                section = self.sections[name]
+                if sys.byteorder == 'big':
+                    section = array('I', section)
+                    section.byteswap()
+                section = section.tobytes()
+            sizes.append(len(section))
+            data += section
+        HEADER.pack_into(data, 0, MAGIC, FORMAT_VERSION, int(has_hierarchy), *sizes)
+        return data
+
+
+class SnapshotReader:
+    sections: Dict[str, array]
+    positions: Dict[str, int]
+    strings: List[str]
+    has_hierarchy: bool
+
+    def __init__(self, data: bytes):
+        magic, version, has_hierarchy, *sizes = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('Not a snapshot, or a snapshot of a different version')
+
+        self.sections = {}
+        offset = HEADER.size
+        for (name, _), size in zip(SECTIONS, sizes):
+            section = data[offset:offset + size]
+            offset += size
+            if name == 'strings':
+                strings = section
+            else:
+                self.sections[name] = array('I', section)
+                if sys.byteorder == 'big':
+                    self.sections[name].byteswap()
+
+        offsets = self.sections['string_offsets']
+        self.strings = [str(strings[offsets[i]:offsets[i + 1]], 'utf-8') for i in range(len(offsets) - 1)]
+        self.positions = dict((name, 0) for name, _ in SECTIONS)
+        self.has_hierarchy = bool(has_hierarchy)
+
+    def count(self, section: str) -> int:
+        return len(self.sections[section]) // RECORD_SIZES[section]
+
+    def read(self, section: str, count: int = 1) -> array:
+        """ The next records of a section """
+        start = self.positions[section]
+        end = self.positions[section] = start + count * RECORD_SIZES[section]
+        return self.sections[section][start:end]
+
+    def string(self, string_id: int) -> Optional[str]:
+        return None if string_id == NONE else self.strings[string_id]
+
+    def docs(self, count: int) -> List[str]:
+        return [self.strings[i] for i in self.read('doc_lines', count)]
+
+    def read_mappings(self) -> Mappings:
+        mappings = Mappings()
+        for _ in range(self.count('packages')):
+            name, docs = self.read('packages')
+            package = mappings.add_package(self.strings[name])
+            if docs:
+                package.docs += self.docs(docs)
+
+        for _ in range(self.count('classes')):
+            name, mapped, docs, record, field_count, method_count = self.read('classes')
+            clazz = mappings.add_class(self.strings[name])
+            clazz.mapped, clazz.record = self.string(mapped), bool(record)
+            if docs:
+                clazz.docs += self.docs(docs)
+            for _ in range(field_count):
+                name, desc, mapped, docs = self.read('fields')
+                field = mappings.add_field(clazz, self.strings[name], self.strings[desc])
+                field.mapped = self.string(mapped)
+                if docs:
+                    field.docs += self.docs(docs)
+            for _ in range(method_count):
+                name, desc, mapped, docs, is_lambda, is_static, parameter_count = self.read('methods')
+                method = mappings.add_method(clazz, self.strings[name], self.strings[desc])
+                method.mapped, method.is_lambda, method.is_static = self.string(mapped), unflag(is_lambda), unflag(is_static)
+                if docs:
+                    method.docs += self.docs(docs)
+                for _ in range(parameter_count):
+                    index, mapped, docs, desc = self.read('parameters')
+                    param = mappings.add_parameter(clazz, method, index)
+                    param.mapped = self.string(mapped)
+                    if docs:
+                        param.docs += self.docs(docs)
+                    if desc != NONE:
+                        param.desc = self.strings[desc]
+        return mappings
+
+    def read_hierarchy(self) -> ClassHierarchy:
+        hierarchy = ClassHierarchy()
+        classes = [self.read('hierarchy_classes') for _ in range(self.count('hierarchy_classes'))]
+        for name, _ in classes:
+            hierarchy.intern(self.strings[name])  # First, so each class keeps its id
+        for class_id, (_, parent_count) in enumerate(classes):
+            for parent_id in self.read('hierarchy_parents', parent_count):
+                hierarchy.add_parent(hierarchy.names[class_id], hierarchy.names[parent_id])
+        for _ in range(self.count('overrides')):
+            class_id, name, desc, owner_count = self.read('overrides')
+            hierarchy.add_override(hierarchy.names[class_id], self.strings[name], self.strings[desc], [hierarchy.names[i] for i in self.read('override_owners', owner_count)])
+        return hierarchy
+
+
+def encode(mappings: Mappings, hierarchy: Optional[ClassHierarchy] = None) -> bytearray:
+    writer = SnapshotWriter()
+    writer.add_mappings(mappings)
+    if hierarchy is not None:
+        writer.add_hierarchy(hierarchy)
+    return writer.encode(hierarchy is not None)
+
+
+def decode(data: bytes) -> Tuple[Mappings, Optional[ClassHierarchy]]:
+    """ Decodes a snapshot into mappings, and the class hierarchy, if the snapshot has one """
+    reader = SnapshotReader(data)
+    mappings = reader.read_mappings()
+    return mappings, reader.read_hierarchy() if reader.has_hierarchy else None
+
+
+def flag(value: Optional[bool]) -> int:
+    return UNKNOWN if value is None else int(value)
+
+
+def unflag(value: int) -> Optional[bool]:
+    return None if value == UNKNOWN else bool(value)
@@ -0,0 +1,181 @@
+# Streaming downloads, where bytes are decompressed and decoded as they arrive from the network
+# Used when an input is not cached, so it can be parsed while it is still being downloaded, rather than after a full download and extraction.
+
+import codecs
+import contextvars
+import queue
+import struct
+import threading
+import zlib
+
+from typing import Iterable, Iterator, Optional, Callable
+
+CHUNK_SIZE = 1 << 16
+QUEUE_SIZE = 256  # Chunks which may be downloaded ahead of the consumer
+
+LOCAL_HEADER = b'PK\x03\x04'
+DATA_DESCRIPTOR = b'PK\x07\x08'
+ZIP64_EXTRA = 0x0001
+FLAG_DATA_DESCRIPTOR = 0x08
+STORED, DEFLATED = 0, 8
+
+
+def iter_zip_entry(chunks: Iterable[bytes], name: str) -> Iterator[bytes]:
+    """
+    Decompresses a single entry of a zip file, from its bytes as they arrive, by reading the local file headers in order (rather than the central directory at the end of the file).
+    Supports stored and deflated entries, including those with data descriptors (as written by jar tools). The CRC of the entry is verified once it is complete.
+    """
+    reader = ChunkReader(iter(chunks))
+    while True:
+        signature = reader.read(4, False)
+        if signature != LOCAL_HEADER:
+            raise ValueError('Entry %s not found in zip' % name)  # Reached the central directory, or the end of the file
+
+        flags, method, crc, compressed_size, uncompressed_size, name_length, extra_length = struct.unpack('<2xHH4xIIIHH', reader.read(26))
+        entry_name = reader.read(name_length).decode('utf-8')
+        extra = reader.read(extra_length)
+        zip64 = compressed_size == 0xFFFFFFFF or uncompressed_size == 0xFFFFFFFF
+        if compressed_size == 0xFFFFFFFF:
+            compressed_size = read_zip64_compressed_size(extra, uncompressed_size == 0xFFFFFFFF)
+
+        target = entry_name == name
+        checksum = 0
+        if method == DEFLATED:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            while not decompressor.eof:
+                data = reader.read_some()
+                if not data:
+                    raise ValueError('Unexpected end of zip in entry %s' % entry_name)
+                output = decompressor.decompress(data)
+                reader.unread(decompressor.unused_data)
+                if target and output:
+                    checksum = zlib.crc32(output, checksum)
+                    yield output
+        elif method == STORED and not flags & FLAG_DATA_DESCRIPTOR:
+            remaining = compressed_size
+            while remaining > 0:
+                data = reader.read_some(remaining)
+                if not data:
+                    raise ValueError('Unexpected end of zip in entry %s' % entry_name)
+                remaining -= len(data)
+                if target:
+                    checksum = zlib.crc32(data, checksum)
+                    yield data
+        else:
+            raise ValueError('Unsupported zip entry %s (method %d)' % (entry_name, method))
+
+        if flags & FLAG_DATA_DESCRIPTOR:
+            descriptor = reader.read(4)
+            if descriptor == DATA_DESCRIPTOR:  # The signature is optional
+                descriptor = reader.read(4)
+            crc = struct.unpack('<I', descriptor)[0]
+            reader.read(16 if zip64 else 8)  # Sizes
+
+        if target:
+            if checksum != crc:
+                raise ValueError('Entry %s of zip does not match its checksum' % name)
+            return
+
+
+def read_zip64_compressed_size(extra: bytes, has_uncompressed_size: bool) -> int:
+    index = 0
+    while index + 4 <= len(extra):
+        header, size = struct.unpack('<HH', extra[index:index + 4])
+        if header == ZIP64_EXTRA:
+            offset = index + (12 if has_uncompressed_size else 4)  # The compressed size follows the uncompressed size, if present
+            return struct.unpack('<Q', extra[offset:offset + 8])[0]
+        index += 4 + size
+    raise ValueError('Missing zip64 extra field')
+
+
+def iter_text(chunks: Iterable[bytes]) -> Iterator[str]:
+    """ Decodes utf-8 text as it arrives, normalizing line endings, including those split between chunks """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        pending = ''
+        if text.endswith('\r'):
+            text, pending = text[:-1], '\r'
+        if text:
+            yield text.replace('\r\n', '\n')
+    text = pending + decoder.decode(b'', True)
+    if text:
+        yield text.replace('\r\n', '\n')
+
+
+def iter_background(produce: Callable[[], Iterable[bytes]]) -> Iterator[bytes]:
+    """
+    Runs a producer (i.e. a download and decompression) on a background thread, and yields its chunks on the calling thread, so it can be consumed (i.e. parsed) concurrently.
+    Errors in the producer are raised on the calling thread. If the consumer stops early, the producer is stopped as well.
+    The producer runs in a copy of the calling thread's context, so it sees the same settings (see mapping_downloader.using()).
+    """
+    chunks: queue.Queue = queue.Queue(QUEUE_SIZE)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run():
+        try:
+            for chunk in produce():
+                if not put(chunk):
+                    return
+            put(done)
+        except BaseException as e:
+            put(e)
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(run,), name='stream', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+class ChunkReader:
+    """ Reads bytes from an iterator of chunks, in either exact or arbitrary amounts """
+
+    chunks: Iterator[bytes]
+    buffer: bytes
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self.chunks = chunks
+        self.buffer = b''
+
+    def read(self, size: int, exact: bool = True) -> bytes:
+        while len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                if exact:
+                    raise ValueError('Unexpected end of zip')
+                break
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def read_some(self, limit: Optional[int] = None) -> bytes:
+        """ Reads whatever is buffered, or the next chunk, up to the limit. Returns empty bytes at the end """
+        if not self.buffer:
+            self.buffer = next(self.chunks, b'')
+        size = len(self.buffer) if limit is None else min(limit, len(self.buffer))
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def unread(self, data: bytes):
+        if data:
+            self.buffer = data + self.buffer
@@ -0,0 +1,275 @@
+# A deterministic generator for synthetic mapping inputs
+# Produces blackstone, parchment, intermediary (tiny v1), yarn (tiny v2) and crane (tiny v2) inputs which are consistent with each other,
+# at an adjustable scale relative to the size of Minecraft. Used for benchmarking without needing network access, or the real inputs.
+
+import random
+
+from typing import Dict, List, Any, Tuple, Optional, Callable
+
+from util import utils
+
+MINECRAFT_CLASS_COUNT = 8000  # Approximate number of classes (including inner and anonymous classes) in a modern Minecraft version
+
+PACKAGES = ('advancements', 'client/gui', 'client/renderer', 'commands', 'core', 'data', 'nbt', 'network/protocol', 'server/level', 'sounds', 'stats', 'util', 'world/entity', 'world/item', 'world/level/block', 'world/level/chunk', 'world/phys')
+WORDS = ('block', 'entity', 'level', 'item', 'stack', 'pos', 'state', 'chunk', 'render', 'buffer', 'tag', 'data', 'sound', 'player', 'server', 'client', 'value', 'random', 'source', 'target', 'type', 'builder', 'context', 'event', 'handler', 'manager', 'vec', 'box', 'shape', 'model', 'texture', 'color', 'light', 'biome', 'feature', 'recipe', 'container', 'menu', 'screen', 'widget')
+PRIMITIVES = ('I', 'J', 'Z', 'F', 'D', 'B', 'S', 'C')
+
+
+class SyntheticClass:
+    obf: str
+    moj: str
+    intermediary: str
+    yarn: str
+    parent: Optional['SyntheticClass']
+    fields: List[Tuple[str, str, str, str, str]]  # (obf, moj, intermediary, yarn, moj desc)
+    methods: List['SyntheticMethod']
+    inner: List['SyntheticClass']
+
+    def __init__(self, obf: str, moj: str, intermediary: str, yarn: str):
+        self.obf = obf
+        self.moj = moj
+        self.intermediary = intermediary
+        self.yarn = yarn
+        self.parent = None
+        self.fields = []
+        self.methods = []
+        self.inner = []
+
+
+class SyntheticMethod:
+    obf: str
+    moj: str
+    intermediary: str
+    yarn: str
+    desc: str  # moj descriptor
+    is_static: bool
+    is_lambda: bool
+    overrides: Optional[SyntheticClass]
+    params: List[str]
+    docs: List[str]
+
+    def __init__(self, obf: str, moj: str, intermediary: str, yarn: str, desc: str, is_static: bool, is_lambda: bool):
+        self.obf = obf
+        self.moj = moj
+        self.intermediary = intermediary
+        self.yarn = yarn
+        self.desc = desc
+        self.is_static = is_static
+        self.is_lambda = is_lambda
+        self.overrides = None
+        self.params = []
+        self.docs = []
+
+
+class SyntheticMappings:
+    """
+    A generated source set, and all derived inputs. Everything is generated from a single seed, so the output is stable between runs and machines.
+    """
+
+    classes: List[SyntheticClass]
+
+    def __init__(self, scale: float = 1.0, seed: int = 0):
+        self.scale = scale
+        self.seed = seed
+        self.classes = []
+        self.inputs: Dict[str, Any] = {}
+        self.generate(random.Random(seed), max(1, round(MINECRAFT_CLASS_COUNT * scale)))
+
+    def all_classes(self) -> List[SyntheticClass]:
+        return [c for root in self.classes for c in [root] + root.inner]
+
+    def generate(self, rng: random.Random, count: int):
+        obf_names = iter(obf_name(i) for i in range(count * 2))
+        index = 0
+
+        def new_class(moj: str) -> SyntheticClass:
+            nonlocal index
+            index += 1
+            yarn = moj.replace('net/minecraft/', 'net/minecraft/y_')
+            return SyntheticClass(next(obf_names), moj, 'net/minecraft/class_%d' % index, yarn)
+
+        while index < count:
+            package = rng.choice(PACKAGES)
+            root = new_class('net/minecraft/%s/%s%d' % (package, camel(rng, 2, upper=True), index))
+            self.classes.append(root)
+            for i in range(rng.choice((0, 0, 0, 1, 1, 2))):  # Inner classes
+                root.inner.append(new_class('%s$%s' % (root.moj, camel(rng, 1, upper=True))))
+            for i in range(rng.choice((0, 0, 1))):  # Anonymous classes
+                root.inner.append(new_class('%s$%d' % (root.moj, i + 1)))
+
+        all_classes = self.all_classes()
+        member_index = 0
+        for clazz in all_classes:
+            obf_members = iter(obf_name(i) for i in range(64))
+            if rng.random() < 0.3:
+                clazz.parent = rng.choice(all_classes)
+                if clazz.parent is clazz:
+                    clazz.parent = None
+
+            for _ in range(rng.randint(0, 8)):
+                member_index += 1
+                name = camel(rng, 2)
+                clazz.fields.append((next(obf_members), name, 'field_%d' % member_index, 'y_' + name, random_type(rng, all_classes)))
+
+            for _ in range(rng.randint(1, 12)):
+                member_index += 1
+                name = camel(rng, 2)
+                params = [random_type(rng, all_classes) for _ in range(rng.randint(0, 4))]
+                desc = '(%s)%s' % (''.join(params), rng.choice(('V', 'V', 'Z', 'I')) if rng.random() < 0.8 else random_type(rng, all_classes))
+                method = SyntheticMethod(next(obf_members), name, 'method_%d' % member_index, 'y_' + name, desc, rng.random() < 0.2, False)
+                method.params = [camel(rng, 1) for _ in params]
+                if rng.random() < 0.3:
+                    method.docs = ['Returns the %s of the %s.' % (rng.choice(WORDS), rng.choice(WORDS)) for _ in range(rng.randint(1, 3))]
+                if clazz.parent is not None and rng.random() < 0.2:
+                    method.overrides = clazz.parent
+                clazz.methods.append(method)
+
+                if rng.random() < 0.15:  # Lambda, named after the owning method
+                    member_index += 1
+                    lambda_params = [random_type(rng, all_classes) for _ in range(rng.randint(1, 3))]
+                    lambda_method = SyntheticMethod(next(obf_members), 'lambda$%s$%d' % (name, member_index), 'method_%d' % member_index, 'lambda$%s$%d' % (name, member_index), '(%s)V' % ''.join(lambda_params), True, True)
+                    lambda_method.params = [camel(rng, 1) for _ in lambda_params]
+                    clazz.methods.append(lambda_method)
+
+    # Inputs
+    # Each is generated on first use and then cached, as rendering is not free, and inputs are not modified by parsing
+
+    def cached(self, key: str, generate: Callable[[], Any]) -> Any:
+        if key not in self.inputs:
+            self.inputs[key] = generate()
+        return self.inputs[key]
+
+    def blackstone(self) -> Dict[str, Any]:
+        return self.cached('blackstone', self.generate_blackstone)
+
+    def generate_blackstone(self) -> Dict[str, Any]:
+        obf_classes = dict((c.moj, c.obf) for c in self.all_classes())
+
+        def b_class(clazz: SyntheticClass) -> Dict[str, Any]:
+            return {
+                'name': {'obf': clazz.obf, 'moj': clazz.moj},
+                'security': 1,
+                'inner': [b_class(c) for c in clazz.inner],
+                'fields': [{
+                    'name': {'obf': obf, 'moj': moj},
+                    'descriptor': {'obf': utils.remap_descriptor(desc, obf_classes), 'moj': desc},
+                    'security': 2
+                } for obf, moj, _, _, desc in clazz.fields],
+                'methods': [b_method(clazz, m) for m in clazz.methods]
+            }
+
+        def b_method(clazz: SyntheticClass, method: SyntheticMethod) -> Dict[str, Any]:
+            data = {
+                'name': {'obf': method.obf, 'moj': method.moj},
+                'descriptor': {'obf': utils.remap_method_descriptor(method.desc, obf_classes), 'moj': method.desc},
+                'security': (utils.ACC_STATIC if method.is_static else 0) | (utils.ACC_SYNTHETIC if method.is_lambda else 0) | 1,
+                'lambda': method.is_lambda
+            }
+            if method.overrides is not None:
+                data['overrides'] = [{
+                    'owner': {'obf': method.overrides.obf, 'moj': method.overrides.moj},
+                    'name': data['name'],
+                    'descriptor': data['descriptor']
+                }]
+            return data
+
+        return {'version': '1.0.0', 'classes': [b_class(c) for c in self.classes]}
+
+    def parchment(self) -> Dict[str, Any]:
+        return self.cached('parchment', self.generate_parchment)
+
+    def generate_parchment(self) -> Dict[str, Any]:
+        return {
+            'version': '1.0.0',
+            'classes': [{
+                'name': c.moj,
+                'methods': [{
+                    'name': m.moj,
+                    'descriptor': m.desc,
+                    'javadoc': m.docs,
+                    'parameters': [{
+                        'index': index,
+                        'name': name
+                    } for index, name in parameter_indexes(m)]
+                } for m in c.methods if not m.is_lambda]
+            } for c in self.all_classes()]
+        }
+
+    def intermediary(self) -> str:
+        return self.cached('intermediary', self.generate_intermediary)
+
+    def generate_intermediary(self) -> str:
+        """ Tiny v1, obf -> intermediary """
+        obf_classes = dict((c.moj, c.obf) for c in self.all_classes())
+        lines = ['v1\tofficial\tintermediary']
+        for c in self.all_classes():
+            lines.append('CLASS\t%s\t%s' % (c.obf, c.intermediary))
+            for obf, _, intermediary, _, desc in c.fields:
+                lines.append('FIELD\t%s\t%s\t%s\t%s' % (c.obf, utils.remap_descriptor(desc, obf_classes), obf, intermediary))
+            for m in c.methods:
+                if m.overrides is None:  # intermediary does not include inherited methods
+                    lines.append('METHOD\t%s\t%s\t%s\t%s' % (c.obf, utils.remap_method_descriptor(m.desc, obf_classes), m.obf, m.intermediary))
+        return '\n'.join(lines) + '\n'
+
+    def yarn(self) -> str:
+        return self.cached('yarn', self.generate_yarn)
+
+    def generate_yarn(self) -> str:
+        """ Tiny v2, intermediary -> yarn, with parameters and comments """
+        intermediary_classes = dict((c.moj, c.intermediary) for c in self.all_classes())
+        lines = ['tiny\t2\t0\tintermediary\tnamed']
+        for c in self.all_classes():
+            lines.append('c\t%s\t%s' % (c.intermediary, c.yarn))
+            for _, _, intermediary, yarn, desc in c.fields:
+                lines.append('\tf\t%s\t%s\t%s' % (utils.remap_descriptor(desc, intermediary_classes), intermediary, yarn))
+            for m in c.methods:
+                lines.append('\tm\t%s\t%s\t%s' % (utils.remap_method_descriptor(m.desc, intermediary_classes), m.intermediary, m.yarn))
+                lines += ['\t\tc\t%s' % doc for doc in m.docs]
+                lines += ['\t\tp\t%d\t\ty_%s' % (index, name) for index, name in parameter_indexes(m)]
+        return '\n'.join(lines) + '\n'
+
+    def crane(self) -> str:
+        return self.cached('crane', self.generate_crane)
+
+    def generate_crane(self) -> str:
+        """ Tiny v2, moj -> moj, with parameters and comments only """
+        lines = ['tiny\t2\t0\tnamed\tnamed']
+        for c in self.all_classes():
+            lines.append('c\t%s\t%s' % (c.moj, c.moj))
+            for m in c.methods:
+                if m.docs or m.params:
+                    lines.append('\tm\t%s\t%s\t%s' % (m.desc, m.moj, m.moj))
+                    lines += ['\t\tc\tCrane: %s' % doc for doc in m.docs]
+                    lines += ['\t\tp\t%d\t\tc_%s' % (index, name) for index, name in parameter_indexes(m)]
+        return '\n'.join(lines) + '\n'
+
+
+def parameter_indexes(method: SyntheticMethod) -> List[Tuple[int, str]]:
+    _, param_types = utils.split_method_descriptor(method.desc)
+    index = 0 if method.is_static else 1
+    params = []
+    for param_type, name in zip(param_types, method.params):
+        params.append((index, name))
+        index += 2 if param_type in ('J', 'D') else 1
+    return params
+
+
+def obf_name(index: int) -> str:
+    """ Proguard style names: a, b, ..., z, aa, ab, ... """
+    name = ''
+    index += 1
+    while index > 0:
+        index, r = divmod(index - 1, 26)
+        name = chr(ord('a') + r) + name
+    return name
+
+
+def camel(rng: random.Random, words: int, upper: bool = False) -> str:
+    name = ''.join(w.capitalize() for w in (rng.choice(WORDS) for _ in range(words)))
+    return name if upper else name[0].lower() + name[1:]
+
+
+def random_type(rng: random.Random, classes: List[SyntheticClass]) -> str:
+    if rng.random() < 0.5:
+        return rng.choice(PRIMITIVES)
+    return '%sL%s;' % ('[' if rng.random() < 0.1 else '', rng.choice(classes).moj)